@@ -1,11 +1,31 @@
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
 from pathlib import Path
-import os
+import sys
 
 # 获取项目根目录（上级目录）
 BASE_DIR = Path(__file__).parent.parent
+sys.path.append(str(BASE_DIR))
+
+from utils.data_store import FEEDBACK_LABELED_PATH
+from utils.dataset_registry import registry
+from utils.exports import csv_bytes, dataset_version, download_data, lazy_csv_export, lazy_export, lazy_zip_export
+from utils.feedback_index import load_or_build as load_or_build_feedback_index
+from utils.feedback_labels import OTHER_GROUP
+from utils.feedback_rollup import FREQUENCIES, LabelCube
+from utils.feedback_search import load_or_update as load_or_update_search_index
+from utils.feedback_views import VIEW_COLUMNS, VIEWS
+from utils.html_table import render_table
+from utils.image_cache import thumbnail
+from utils.lazy_imports import lazy_import
+from utils.profiling import debug_panel, finish_run, mark, record_error, start_run
+from utils.snapshot import load_snapshot as build_or_load_snapshot, snapshot_version
+
+# numpy / pandas / plotly 用到时才导入
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+go = lazy_import('plotly.graph_objects')
+
+start_run('pages/2_用户画像与需求洞察')
 
 # 页面配置
 st.set_page_config(
@@ -15,40 +35,59 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# 数据加载函数
-@st.cache_data
-def load_image_labels():
-    """加载图片标签数据"""
-    weekday_path = BASE_DIR / "data" / "图片内容分布" / "工作日标签.csv"
-    weekend_path = BASE_DIR / "data" / "图片内容分布" / "周末标签.csv"
-    
-    df_weekday = pd.read_csv(weekday_path)
-    df_weekend = pd.read_csv(weekend_path)
-    
-    df_weekday['time_period'] = 'weekday'
-    df_weekend['time_period'] = 'weekend'
-    
-    return df_weekday, df_weekend
+# 数据加载函数（version 为 snapshot_version()，随快照及源文件变化）
+@st.cache_data(max_entries=1)
+def load_snapshot(version):
+    """加载预先聚合好的统计快照（图片标签分布、反馈标签计数）"""
+    return build_or_load_snapshot()
+
+@st.cache_data(max_entries=len(FREQUENCIES))
+def load_feedback_trend(freq, version):
+    """按日/周/月汇总的各问题类型反馈数（只读快照中的标签 × 天矩阵）"""
+    return LabelCube(load_snapshot(version)['feedback']['label_days']).groups(freq)
+
+# 趋势图上标注的版本：反馈数占比不低于该值的版本
+RELEASE_MIN_SHARE = 0.03
+
+# 反馈筛选：倒排索引与展示用的列（version 随源文件变化；对象较大，所有会话共享一份）
+FILTER_DISPLAY_COLUMNS = ['feedback_date', 'version', 'brand', 'device_model', 'feedback_type', 'label', 'feedback_content']
+FEEDBACK_COLUMNS = FILTER_DISPLAY_COLUMNS + [column for column in VIEW_COLUMNS if column not in FILTER_DISPLAY_COLUMNS]
+FILTER_MAX_ROWS = 1000
 
-@st.cache_data
-def load_feedback_data():
-    """加载用户反馈数据"""
-    feedback_path = BASE_DIR / "data" / "用户反馈" / "用户反馈数据_已打标_8000条_20并发.csv"
-    df = pd.read_csv(feedback_path)
-    return df
+@st.cache_resource(max_entries=1)
+def load_feedback_index(version):
+    return load_or_build_feedback_index(FEEDBACK_LABELED_PATH)
+
+@st.cache_resource(max_entries=1)
+def load_feedback_search_index(version):
+    return load_or_update_search_index(FEEDBACK_LABELED_PATH)
+
+# 反馈明细表由进程级注册表加载（见 utils/dataset_registry.py），所有会话共享一份，文件变化时自动重新加载
+def load_feedback_rows():
+    return registry.frame(FEEDBACK_LABELED_PATH, columns=FEEDBACK_COLUMNS)
+
+def load_feedback_view(name, version):
+    """发音朗读、产品建议明细：已打标反馈按标签分组取出的视图（见 utils/feedback_views.py）"""
+    return registry.derived(f'view:{name}', FEEDBACK_LABELED_PATH,
+                            lambda: VIEWS[name].select(load_feedback_rows(), load_feedback_index(version)))
 
 # 加载数据
 try:
-    df_weekday, df_weekend = load_image_labels()
-    df_feedback = load_feedback_data()
+    snapshot_key = snapshot_version()
+    snapshot = load_snapshot(snapshot_key)
+    image_stats = snapshot['images']
+    feedback_snapshot = snapshot['feedback']
+    mark('数据加载', 'load')
     
     # ===== 第一部分：用户画像与使用场景 =====
     st.markdown("#### 用户画像与使用场景")
     
     # 1.1 数据来源说明（简化为一行）
     st.markdown("<div style='margin: 20px 0;'></div>", unsafe_allow_html=True)
-    total_samples = len(df_weekday) + len(df_weekend)
-    st.info(f"📊 **数据来源**：分析了 **{total_samples}张** 用户拍照图片（工作日 {len(df_weekday)}张 + 周末 {len(df_weekend)}张），通过AI模型对图片进行 **3个维度** 的标注：**年级水平、内容类型、材料来源**")
+    weekday_total = image_stats['weekday_total']
+    weekend_total = image_stats['weekend_total']
+    total_samples = weekday_total + weekend_total
+    st.info(f"📊 **数据来源**：分析了 **{total_samples}张** 用户拍照图片（工作日 {weekday_total}张 + 周末 {weekend_total}张），通过AI模型对图片进行 **3个维度** 的标注：**年级水平、内容类型、材料来源**")
     
     # 1.2 标注标准说明（可展开收起）
     with st.expander("📋 查看标注标准定义（团队对齐）", expanded=False):
@@ -121,7 +160,7 @@ try:
         with col1:
             st.markdown("##### 1️⃣ 阅读理解（有问题的练习题）")
             try:
-                st.image(str(BASE_DIR / "data" / "示例图片" / "拍照翻译列表 (105)-1.jpg"), 
+                st.image(thumbnail(BASE_DIR / "data" / "示例图片" / "拍照翻译列表 (105)-1.jpg"), 
                         use_container_width=True)
             except:
                 st.warning("图片加载失败")
@@ -133,7 +172,7 @@ try:
         with col2:
             st.markdown("##### 2️⃣ 阅读文章（纯文本，无问题）")
             try:
-                st.image(str(BASE_DIR / "data" / "示例图片" / "拍照翻译列表 (22)-2.jpg"), 
+                st.image(thumbnail(BASE_DIR / "data" / "示例图片" / "拍照翻译列表 (22)-2.jpg"), 
                         use_container_width=True)
             except:
                 st.warning("图片加载失败")
@@ -149,7 +188,7 @@ try:
         with col3:
             st.markdown("##### 3️⃣ 完形填空")
             try:
-                st.image(str(BASE_DIR / "data" / "示例图片" / "拍照翻译列表 (104)-1.jpg"), 
+                st.image(thumbnail(BASE_DIR / "data" / "示例图片" / "拍照翻译列表 (104)-1.jpg"), 
                         use_container_width=True)
             except:
                 st.warning("图片加载失败")
@@ -161,7 +200,7 @@ try:
         with col4:
             st.markdown("##### 4️⃣ 语法练习")
             try:
-                st.image(str(BASE_DIR / "data" / "示例图片" / "拍照翻译列表 (112).jpg"), 
+                st.image(thumbnail(BASE_DIR / "data" / "示例图片" / "拍照翻译列表 (112).jpg"), 
                         use_container_width=True)
             except:
                 st.warning("图片加载失败")
@@ -177,7 +216,7 @@ try:
         with col5:
             st.markdown("##### 5️⃣ 词汇练习")
             try:
-                st.image(str(BASE_DIR / "data" / "示例图片" / "拍照翻译列表 (20)-2.jpg"), 
+                st.image(thumbnail(BASE_DIR / "data" / "示例图片" / "拍照翻译列表 (20)-2.jpg"), 
                         use_container_width=True)
             except:
                 st.warning("图片加载失败")
@@ -189,7 +228,7 @@ try:
         with col6:
             st.markdown("##### 6️⃣ 对话文本")
             try:
-                st.image(str(BASE_DIR / "data" / "示例图片" / "拍照翻译列表 (10)-1.jpg"), 
+                st.image(thumbnail(BASE_DIR / "data" / "示例图片" / "拍照翻译列表 (10)-1.jpg"), 
                         use_container_width=True)
             except:
                 st.warning("图片加载失败")
@@ -207,7 +246,7 @@ try:
         with col7:
             st.markdown("##### 7️⃣ 练习/作业材料（48.1%）")
             try:
-                st.image(str(BASE_DIR / "data" / "示例图片" / "拍照翻译列表 (105)-1.jpg"), 
+                st.image(thumbnail(BASE_DIR / "data" / "示例图片" / "拍照翻译列表 (105)-1.jpg"), 
                         use_container_width=True)
             except:
                 st.warning("图片加载失败")
@@ -219,7 +258,7 @@ try:
         with col8:
             st.markdown("##### 8️⃣ 正式教材（17.7%）")
             try:
-                st.image(str(BASE_DIR / "data" / "示例图片" / "拍照翻译列表 (110).jpg"), 
+                st.image(thumbnail(BASE_DIR / "data" / "示例图片" / "拍照翻译列表 (110).jpg"), 
                         use_container_width=True)
             except:
                 st.warning("图片加载失败")
@@ -235,7 +274,7 @@ try:
         with col9:
             st.markdown("##### 9️⃣ 试卷（7.3%，周末高频）")
             try:
-                st.image(str(BASE_DIR / "data" / "示例图片" / "拍照翻译列表 (12)-3.jpg"), 
+                st.image(thumbnail(BASE_DIR / "data" / "示例图片" / "拍照翻译列表 (12)-3.jpg"), 
                         use_container_width=True)
             except:
                 st.warning("图片加载失败")
@@ -247,7 +286,7 @@ try:
         with col10:
             st.markdown("##### 🔟 屏幕截图（6.9%）")
             try:
-                st.image(str(BASE_DIR / "data" / "示例图片" / "拍照翻译列表 (106)-2.jpg"), 
+                st.image(thumbnail(BASE_DIR / "data" / "示例图片" / "拍照翻译列表 (106)-2.jpg"), 
                         use_container_width=True)
             except:
                 st.warning("图片加载失败")
@@ -256,13 +295,12 @@ try:
             **特征**：手机或电脑屏幕截图
             """)
     
+    mark('标注标准与示例图片', 'render')
+    
     # 1.4 核心发现
     st.markdown("<div style='margin: 30px 0 20px 0;'></div>", unsafe_allow_html=True)
     st.markdown("#### 核心发现")
     
-    # 统计核心数据（在核心发现前面计算）
-    df_all = pd.concat([df_weekday, df_weekend])
-    total_samples = len(df_all)
     
     # 发现1：核心用户群清晰 - 初中生占60%
     st.markdown("<div style='margin: 30px 0;'></div>", unsafe_allow_html=True)
@@ -270,12 +308,12 @@ try:
     
     with col_text1:
         # 统计年级分布
-        grade_counts = df_all['grade_level'].value_counts()
+        grade_counts = image_stats['grade_counts']
         
-        grade_7_9_pct = (grade_counts.get('grade_7_9', 0) / len(df_all) * 100)
-        grade_4_6_pct = (grade_counts.get('grade_4_6', 0) / len(df_all) * 100)
-        grade_10_12_pct = (grade_counts.get('grade_10_12', 0) / len(df_all) * 100)
-        grade_1_3_pct = (grade_counts.get('grade_1_3', 0) / len(df_all) * 100)
+        grade_7_9_pct = (grade_counts.get('grade_7_9', 0) / total_samples * 100)
+        grade_4_6_pct = (grade_counts.get('grade_4_6', 0) / total_samples * 100)
+        grade_10_12_pct = (grade_counts.get('grade_10_12', 0) / total_samples * 100)
+        grade_1_3_pct = (grade_counts.get('grade_1_3', 0) / total_samples * 100)
         
         st.markdown(f"""
         <div style="background: linear-gradient(135deg, #f5f7fa 0%, #c3cfe2 100%); 
@@ -345,7 +383,9 @@ try:
             )]
         )
         
+        mark('发现1：年级分布', 'figure')
         st.plotly_chart(fig1, use_container_width=True)
+    mark('发现1：年级分布', 'render')
     
     # 发现2：核心场景是阅读理解 - 占比30%
     st.markdown("<div style='margin: 30px 0;'></div>", unsafe_allow_html=True)
@@ -353,8 +393,8 @@ try:
     
     with col_text2:
         # 统计内容类型分布
-        content_counts = df_all['content_type'].value_counts()
-        total = len(df_all)
+        content_counts = pd.Series(image_stats['content_counts'])
+        total = total_samples
         
         reading_comp_pct = (content_counts.get('reading_comprehension', 0) / total * 100)
         reading_pass_pct = (content_counts.get('reading_passage', 0) / total * 100)
@@ -431,7 +471,9 @@ try:
             xaxis=dict(range=[0, max(values) * 1.2])
         )
         
+        mark('发现2：内容类型', 'figure')
         st.plotly_chart(fig2, use_container_width=True)
+    mark('发现2：内容类型', 'render')
     
     # 发现3：周末场景差异显著 - 试卷占比激增5倍
     st.markdown("<div style='margin: 30px 0;'></div>", unsafe_allow_html=True)
@@ -439,11 +481,8 @@ try:
     
     with col_text3:
         # 统计工作日和周末的材料来源（合并练习册和作业本）
-        weekday_material = df_weekday['material_source'].value_counts()
-        weekend_material = df_weekend['material_source'].value_counts()
-        
-        weekday_total = len(df_weekday)
-        weekend_total = len(df_weekend)
+        weekday_material = image_stats['weekday_material']
+        weekend_material = image_stats['weekend_material']
         
         # 练习/作业材料（合并）
         weekday_practice = ((weekday_material.get('workbook', 0) + weekday_material.get('homework_book', 0)) / weekday_total * 100)
@@ -458,8 +497,8 @@ try:
         weekend_exam = (weekend_material.get('exam_paper', 0) / weekend_total * 100)
         
         # 写作作业
-        weekday_writing = (df_weekday[df_weekday['content_type'] == 'writing_assignment'].shape[0] / weekday_total * 100)
-        weekend_writing = (df_weekend[df_weekend['content_type'] == 'writing_assignment'].shape[0] / weekend_total * 100)
+        weekday_writing = (image_stats['weekday_writing'] / weekday_total * 100)
+        weekend_writing = (image_stats['weekend_writing'] / weekend_total * 100)
         
         exam_increase = weekend_exam / weekday_exam if weekday_exam > 0 else 0
         
@@ -555,7 +594,9 @@ try:
             yaxis=dict(range=[0, max(max(weekday_values), max(weekend_values)) * 1.3])
         )
         
+        mark('发现3：工作日与周末', 'figure')
         st.plotly_chart(fig3, use_container_width=True)
+    mark('发现3：工作日与周末', 'render')
     
     # ===== 第二部分：用户反馈分析 =====
     st.markdown("<div style='margin: 60px 0 20px 0;'></div>", unsafe_allow_html=True)
@@ -566,8 +607,8 @@ try:
     st.markdown("##### 📋 用户反馈问题分布（8000条AI打标数据）")
     
     # 统计反馈标签
-    label_counts = df_feedback['label'].value_counts()
-    total_feedback = len(df_feedback)
+    total_feedback = feedback_snapshot['total']
+    group_totals = feedback_snapshot['group_counts']
     
     # 准备表格数据
     feedback_stats = {
@@ -577,92 +618,43 @@ try:
         '评级': []
     }
     
-    # 定义标签分组
-    translation_quality_labels = ['翻译不准确', '翻译不完整', '翻译语言错误']
-    pronunciation_labels = ['发音不准确', '朗读不自然', '朗读功能优化', '朗读卡顿重复', 
-                           '朗读速度问题', '缺少中文朗读', '发音朗读问题', 'Audio_Issues']
-    suggestion_labels = ['翻译语言扩展', '功能需求', '其他功能需求', '单词本收藏', 
-                        '句子分析', '历史记录', 'Feature_Requests']
-    
-    # 翻译质量问题
-    quality_count = sum([label_counts.get(label, 0) for label in translation_quality_labels])
-    feedback_stats['问题类型'].append('翻译质量问题')
-    feedback_stats['反馈数量'].append(f'{quality_count:,}')
-    feedback_stats['占比'].append(f'{quality_count/total_feedback*100:.2f}%')
-    feedback_stats['评级'].append('🔴 核心痛点')
-    
-    # 无法分类
-    unclassified_count = label_counts.get('无法分类', 0)
-    feedback_stats['问题类型'].append('其他/无法分类')
-    feedback_stats['反馈数量'].append(f'{unclassified_count:,}')
-    feedback_stats['占比'].append(f'{unclassified_count/total_feedback*100:.2f}%')
-    feedback_stats['评级'].append('⚪ 正常反馈')
-    
-    # 满意反馈（标签是"满意表扬"）
-    satisfied_count = label_counts.get('满意表扬', 0)
-    feedback_stats['问题类型'].append('满意反馈')
-    feedback_stats['反馈数量'].append(f'{satisfied_count:,}')
-    feedback_stats['占比'].append(f'{satisfied_count/total_feedback*100:.2f}%')
-    feedback_stats['评级'].append('🟢 正面评价')
-    
-    # 发音朗读问题
-    pronunciation_count = sum([label_counts.get(label, 0) for label in pronunciation_labels])
-    feedback_stats['问题类型'].append('发音朗读问题')
-    feedback_stats['反馈数量'].append(f'{pronunciation_count:,}')
-    feedback_stats['占比'].append(f'{pronunciation_count/total_feedback*100:.2f}%')
-    feedback_stats['评级'].append('🟡 次要痛点')
-    
-    # 产品建议
-    suggestion_count = sum([label_counts.get(label, 0) for label in suggestion_labels])
-    feedback_stats['问题类型'].append('产品建议')
-    feedback_stats['反馈数量'].append(f'{suggestion_count:,}')
-    feedback_stats['占比'].append(f'{suggestion_count/total_feedback*100:.2f}%')
-    feedback_stats['评级'].append('🔵 功能需求')
-    
-    # 其他问题（OCR识别、界面交互、速度等）
-    other_count = total_feedback - (quality_count + unclassified_count + satisfied_count + pronunciation_count + suggestion_count)
-    feedback_stats['问题类型'].append('其他问题')
-    feedback_stats['反馈数量'].append(f'{other_count:,}')
-    feedback_stats['占比'].append(f'{other_count/total_feedback*100:.2f}%')
-    feedback_stats['评级'].append('⚪ 其他')
-    
-    # 创建DataFrame
-    df_feedback_stats = pd.DataFrame(feedback_stats)
-    
-    # 使用HTML表格实现居中和高亮
-    html_table = '<table style="width:100%; border-collapse: collapse; text-align: center; table-layout: fixed;">'
-    html_table += '<thead><tr style="background-color: #f0f2f6;">'
-    col_widths = ['25%', '20%', '20%', '35%']
-    for i, col in enumerate(df_feedback_stats.columns):
-        html_table += f'<th style="padding: 12px; border: 1px solid #ddd; width: {col_widths[i]}; font-weight: 600;">{col}</th>'
-    html_table += '</tr></thead><tbody>'
-    
-    for idx, row in df_feedback_stats.iterrows():
-        # 翻译质量问题行高亮
-        if row['问题类型'] == '翻译质量问题':
-            html_table += '<tr style="background-color: #ffebee;">'
-        else:
-            html_table += '<tr>'
-        
-        for col_idx, col in enumerate(df_feedback_stats.columns):
-            value = row[col]
-            # 占比列加粗
-            if col == '占比' and row['问题类型'] == '翻译质量问题':
-                html_table += f'<td style="padding: 10px; border: 1px solid #ddd; font-weight: 700;">{value}</td>'
-            else:
-                html_table += f'<td style="padding: 10px; border: 1px solid #ddd;">{value}</td>'
-        html_table += '</tr>'
-    
-    html_table += '</tbody></table>'
+    # 各分组的评级（其他问题包括OCR识别、界面交互、速度等）
+    group_ratings = {
+        '翻译质量问题': '🔴 核心痛点',
+        '其他/无法分类': '⚪ 正常反馈',
+        '满意反馈': '🟢 正面评价',
+        '发音朗读问题': '🟡 次要痛点',
+        '产品建议': '🔵 功能需求',
+        OTHER_GROUP: '⚪ 其他'
+    }
+    
+    for group, rating in group_ratings.items():
+        count = group_totals[group]
+        feedback_stats['问题类型'].append(group)
+        feedback_stats['反馈数量'].append(f'{count:,}')
+        feedback_stats['占比'].append(f'{count/total_feedback*100:.2f}%')
+        feedback_stats['评级'].append(rating)
+    
+    # 使用HTML表格实现居中和高亮（翻译质量问题行高亮、占比列加粗）
+    mark('反馈问题分布表', 'aggregate')
+    html_table = render_table(
+        feedback_stats,
+        widths=['25%', '20%', '20%', '35%'],
+        highlight={'column': '问题类型', 'value': '翻译质量问题', 'style': 'background-color: #ffebee;'},
+        bold={'columns': ['占比'], 'where': ('问题类型', '翻译质量问题')},
+        header_style='font-weight: 600;'
+    )
     st.markdown(html_table, unsafe_allow_html=True)
+    mark('反馈问题分布表', 'render')
     
     # 2.2 发音朗读问题详细数据
     st.markdown("<div style='margin: 40px 0 20px 0;'></div>", unsafe_allow_html=True)
     st.markdown("##### 🔊 发音朗读问题详细数据")
     
-    # 加载发音朗读详细数据
-    pronunciation_detail_path = BASE_DIR / "data" / "用户反馈" / "发音朗读问题详细数据.csv"
-    df_pronunciation = pd.read_csv(pronunciation_detail_path)
+    # 加载发音朗读详细数据（已打标反馈的视图，随数据版本缓存）
+    feedback_version = dataset_version(FEEDBACK_LABELED_PATH)
+    df_pronunciation = load_feedback_view('pronunciation', feedback_version)
+    mark('发音朗读问题明细', 'load')
     
     # 显示统计信息
     st.info(f"📊 共 {len(df_pronunciation)} 条反馈，占总反馈的 {len(df_pronunciation)/total_feedback*100:.2f}%")
@@ -688,22 +680,23 @@ try:
         height=500
     )
     
-    # 提供下载按钮
-    csv_pronunciation = df_pronunciation.to_csv(index=False, encoding='utf-8-sig')
+    # 提供下载按钮（数据量大时点击才生成 CSV）
     st.download_button(
         label="📥 下载全部发音朗读问题数据",
-        data=csv_pronunciation.encode('utf-8-sig'),
+        data=download_data(lazy_export(('feedback_view', 'pronunciation', feedback_version),
+                                       lambda: csv_bytes(df_pronunciation)), len(df_pronunciation)),
         file_name="发音朗读问题详细数据.csv",
         mime="text/csv"
     )
+    mark('发音朗读问题明细', 'render')
     
     # 2.3 产品建议详细数据
     st.markdown("<div style='margin: 40px 0 20px 0;'></div>", unsafe_allow_html=True)
     st.markdown("##### 💡 产品建议详细数据")
     
     # 加载产品建议详细数据
-    suggestion_detail_path = BASE_DIR / "data" / "用户反馈" / "产品建议详细数据.csv"
-    df_suggestion = pd.read_csv(suggestion_detail_path)
+    df_suggestion = load_feedback_view('suggestion', feedback_version)
+    mark('产品建议明细', 'load')
     
     # 显示统计信息
     st.info(f"📊 共 {len(df_suggestion)} 条反馈，占总反馈的 {len(df_suggestion)/total_feedback*100:.2f}%")
@@ -729,15 +722,114 @@ try:
         height=500
     )
     
-    # 提供下载按钮
-    csv_suggestion = df_suggestion.to_csv(index=False, encoding='utf-8-sig')
+    # 提供下载按钮（数据量大时点击才生成 CSV）
     st.download_button(
         label="📥 下载全部产品建议数据",
-        data=csv_suggestion.encode('utf-8-sig'),
+        data=download_data(lazy_export(('feedback_view', 'suggestion', feedback_version),
+                                       lambda: csv_bytes(df_suggestion)), len(df_suggestion)),
         file_name="产品建议详细数据.csv",
         mime="text/csv"
     )
 
+    # 两份明细打包下载（从已打标反馈逐块筛选、写入 ZIP）
+    st.download_button(
+        label="📦 打包下载发音朗读与产品建议数据（ZIP）",
+        data=download_data(lazy_zip_export([VIEWS['pronunciation'].zip_entry(), VIEWS['suggestion'].zip_entry()],
+                                           filter_key='label_group'), len(df_pronunciation) + len(df_suggestion)),
+        file_name="用户反馈明细.zip",
+        mime="application/zip"
+    )
+    mark('产品建议明细', 'render')
+
+    # 2.4 反馈筛选与搜索（倒排索引位图求交见 utils/feedback_index.py，全文检索见 utils/feedback_search.py）
+    st.markdown("<div style='margin: 40px 0 20px 0;'></div>", unsafe_allow_html=True)
+    st.markdown("##### 🔎 反馈筛选与搜索")
+    search_query = st.text_input("关键词搜索（多个关键词用空格分隔，结果按相关度排序）", key="feedback_search_query")
+
+    feedback_index = load_feedback_index(feedback_version)
+    filter_fields = [
+        ('brand', '品牌'), ('version', '版本'), ('device_model', '机型'), ('app_name', '应用'),
+        ('feedback_type', '反馈类型'), ('label', '问题标签'), ('feedback_month', '月份'),
+    ]
+    filters = {}
+    filter_cols = st.columns(4)
+    for i, (column, title) in enumerate(filter_fields):
+        options = feedback_index.values(column)
+        if column == 'feedback_month':
+            options = sorted(options)
+        with filter_cols[i % 4]:
+            filters[column] = st.multiselect(title, options, key=f"feedback_filter_{column}")
+
+    matched_rows = feedback_index.query(filters)
+    if search_query.strip():
+        feedback_rows = load_feedback_rows()
+        search_rows, _scores = load_feedback_search_index(feedback_version).search(
+            search_query, feedback_rows['feedback_content'].to_numpy())
+        matched_rows = search_rows[np.isin(search_rows, matched_rows)]
+    st.info(f"📊 符合条件的反馈 {len(matched_rows)} 条，占总反馈的 {len(matched_rows)/feedback_index.n_rows*100:.2f}%")
+
+    df_filtered = load_feedback_rows()[FILTER_DISPLAY_COLUMNS].iloc[matched_rows]
+    mark('反馈筛选', 'aggregate')
+    display_filtered = df_filtered.head(FILTER_MAX_ROWS).rename(columns={
+        'feedback_date': '反馈时间', 'version': '版本', 'brand': '品牌', 'device_model': '机型',
+        'feedback_type': '反馈类型', 'label': '问题标签', 'feedback_content': '反馈内容',
+    })
+    if len(df_filtered) > FILTER_MAX_ROWS:
+        st.markdown(f"**显示前 {FILTER_MAX_ROWS} 条，完整结果请下载：**")
+    st.dataframe(display_filtered, use_container_width=True, height=400)
+
+    filter_key = (search_query.strip(),) + tuple((column, tuple(values)) for column, values in filters.items() if values)
+    st.download_button(
+        label="📥 下载筛选结果",
+        data=download_data(lazy_csv_export(('feedback_filter', feedback_version, filter_key), lambda: df_filtered),
+                           len(df_filtered)),
+        file_name="用户反馈筛选结果.csv",
+        mime="text/csv"
+    )
+    mark('反馈筛选', 'render')
+
+    # 2.5 反馈问题趋势（周、月由逐日矩阵汇总得到，见 utils/feedback_rollup.py）
+    st.markdown("<div style='margin: 40px 0 20px 0;'></div>", unsafe_allow_html=True)
+    st.markdown("##### 📈 反馈问题趋势")
+    trend_cols = st.columns([1, 3])
+    with trend_cols[0]:
+        trend_freq = st.radio("粒度", list(FREQUENCIES), index=1, format_func=FREQUENCIES.get,
+                              horizontal=True, key="feedback_trend_freq")
+    trend = load_feedback_trend(trend_freq, snapshot_key)
+    mark('反馈趋势', 'aggregate')
+    with trend_cols[1]:
+        trend_groups = st.multiselect("问题类型", list(trend.columns), default=['翻译质量问题'],
+                                      key="feedback_trend_groups")
+    show_releases = st.checkbox("标注主要版本（该版本首次出现反馈的日期）", value=True, key="feedback_trend_releases")
+
+    fig_trend = go.Figure()
+    for group in trend_groups:
+        fig_trend.add_trace(go.Scatter(x=trend.index, y=trend[group], mode='lines+markers', name=group))
+    if show_releases:
+        for version, count in feedback_snapshot['version_counts'].items():
+            if count / total_feedback < RELEASE_MIN_SHARE:
+                continue
+            release_day = feedback_snapshot['version_first_seen'][version]
+            fig_trend.add_vline(x=release_day, line_dash='dot', line_color='#95a5a6')
+            fig_trend.add_annotation(x=release_day, y=1, yref='paper', text=version, showarrow=False,
+                                     textangle=-90, xanchor='left', yanchor='top', font=dict(size=10, color='#7f8c8d'))
+    fig_trend.update_layout(
+        height=400,
+        margin=dict(t=20, b=20, l=20, r=20),
+        xaxis_title='',
+        yaxis_title=f'每{FREQUENCIES[trend_freq]}反馈数',
+        legend=dict(orientation='h', y=1.08),
+        hovermode='x unified'
+    )
+    mark('反馈趋势', 'figure')
+    st.plotly_chart(fig_trend, use_container_width=True)
+    mark('反馈趋势', 'render')
+
 except Exception as e:
+    record_error(e)
     st.error(f"数据加载失败：{str(e)}")
     st.info("请确保数据文件路径正确")
+
+
+# 本次执行的段落耗时写到指标文件（见 utils/profiling.py）；?debug=1 时侧边栏显示最慢的段落
+debug_panel(finish_run())
@@ -5,9 +5,16 @@
 
 import streamlit as st
 from pathlib import Path
+import sys
 
 # 获取项目根目录（上级目录）
 BASE_DIR = Path(__file__).parent.parent
+sys.path.append(str(BASE_DIR))
+
+from utils.image_cache import thumbnail
+from utils.profiling import debug_panel, finish_run, mark, start_run
+
+start_run('pages/3_竞品功能对比与借鉴')
 
 # 页面配置
 st.set_page_config(
@@ -26,6 +33,7 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 st.markdown("---")
+mark('翻译工具趋势')
 
 # ===== 核心发现 =====
 st.markdown("#### 📊 核心发现")
@@ -61,7 +69,7 @@ col_a, col_b, col_c = st.columns([1, 1, 1])
 with col_a:
     st.markdown("**有道词典 - 重点单词标记**")
     try:
-        st.image(str(BASE_DIR / "图片" / "有道翻译-重点单词标记_副本.jpg"), 
+        st.image(thumbnail(BASE_DIR / "图片" / "有道翻译-重点单词标记_副本.jpg"), 
                 use_container_width=True)
     except:
         st.info("📷 图片加载失败")
@@ -69,7 +77,7 @@ with col_a:
 with col_b:
     st.markdown("**夸克扫描王 - 段落涂抹翻译**")
     try:
-        st.image(str(BASE_DIR / "图片" / "夸克扫描王-段落涂抹翻译_副本.jpg"), 
+        st.image(thumbnail(BASE_DIR / "图片" / "夸克扫描王-段落涂抹翻译_副本.jpg"), 
                 use_container_width=True)
     except:
         st.info("📷 图片加载失败")
@@ -77,13 +85,15 @@ with col_b:
 with col_c:
     st.markdown("**有道词典 - 快速收藏单词及句子**")
     try:
-        st.image(str(BASE_DIR / "图片" / "有道翻译-快速收藏单词及句子_副本.jpg"), 
+        st.image(thumbnail(BASE_DIR / "图片" / "有道翻译-快速收藏单词及句子_副本.jpg"), 
                 use_container_width=True)
     except:
         st.info("📷 图片加载失败")
 
 st.markdown("<div style='margin: 40px 0;'></div>", unsafe_allow_html=True)
 
+mark('核心发现1：从翻译工具到学习服务')
+
 # ===== 核心发现2：AI能力融入 =====
 st.markdown("##### 🤖 AI能力融入")
 st.markdown("")
@@ -117,7 +127,7 @@ col_a, col_b, col_c = st.columns([1, 1, 1])
 with col_a:
     st.markdown("**百度翻译 - 语法分析**")
     try:
-        st.image(str(BASE_DIR / "图片" / "百度-语法分析_副本.jpg"), 
+        st.image(thumbnail(BASE_DIR / "图片" / "百度-语法分析_副本.jpg"), 
                 use_container_width=True)
     except:
         st.info("📷 图片加载失败")
@@ -125,7 +135,7 @@ with col_a:
 with col_b:
     st.markdown("**作业帮 - AI对话辅导**")
     try:
-        st.image(str(BASE_DIR / "图片" / "作业帮-对话辅导-语法分析_副本.jpg"), 
+        st.image(thumbnail(BASE_DIR / "图片" / "作业帮-对话辅导-语法分析_副本.jpg"), 
                 use_container_width=True)
     except:
         st.info("📷 图片加载失败")
@@ -133,13 +143,15 @@ with col_b:
 with col_c:
     st.markdown("**快对 - 问小对（段落）**")
     try:
-        st.image(str(BASE_DIR / "图片" / "点击问小对-段落.jpg"), 
+        st.image(thumbnail(BASE_DIR / "图片" / "点击问小对-段落.jpg"), 
                 use_container_width=True)
     except:
         st.info("📷 图片加载失败")
 
 st.markdown("<div style='margin: 60px 0;'></div>", unsafe_allow_html=True)
 
+mark('核心发现2：AI能力融入')
+
 # ===== 下个季度规划 =====
 st.markdown("#### 🎯 下个季度规划")
 st.markdown("")
@@ -221,3 +233,9 @@ with col3:
         </div>
     </div>
     """, unsafe_allow_html=True)
+
+mark('下个季度规划')
+
+
+# 本次执行的段落耗时写到指标文件（见 utils/profiling.py）；?debug=1 时侧边栏显示最慢的段落
+debug_panel(finish_run())
@@ -0,0 +1,3 @@
+"""
+离线数据处理任务（打标、去重、聚类、增量入库等），产出 data/ 下供页面读取的数据
+"""
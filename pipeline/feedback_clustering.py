@@ -0,0 +1,391 @@
+"""
+用户反馈无监督聚类（发现新的标签类别）
+
+对反馈内容的字符 2-gram、3-gram 做特征哈希，得到稀疏 TF-IDF 向量（每行 L2 归一化），
+再用 mini-batch k-means（余弦相似度）聚类，输出每个簇的规模、高权重 n-gram、
+已有标签分布和代表反馈，用于从「无法分类」等反馈中找出手工标签分组没有覆盖的类别。
+
+全程分块流式读取数据：
+    1. 统计文档频率（IDF）
+    2. 逐批更新簇中心，共 epochs 轮
+    3. 为每条反馈分配簇，汇总簇信息
+内存占用只与块大小、哈希维度和簇数有关（默认约 60 MB 的簇中心），与总行数无关。
+
+输出（data/.checkpoints/ 下）：
+    feedback_clusters.csv             每簇一行：cluster, size, share, cohesion, top_terms, top_labels, examples
+    feedback_cluster_assignments.csv  每条反馈一行：feedback_id, cluster, similarity（内容过短的为 -1）
+
+运行：
+    python -m pipeline.feedback_clustering                       # 全部已打标反馈
+    python -m pipeline.feedback_clustering --labels 无法分类 -k 20   # 只聚类无法分类的反馈
+"""
+
+import re
+from pathlib import Path
+
+from utils.data_store import DATA_DIR, FEEDBACK_LABELED_PATH, CSV_ENCODING, dataset_columns, iter_chunks
+from utils.feedback_search import normalize
+from utils.lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+CLUSTERS_PATH = DATA_DIR / ".checkpoints" / "feedback_clusters.csv"
+ASSIGNMENTS_PATH = DATA_DIR / ".checkpoints" / "feedback_cluster_assignments.csv"
+
+N_CLUSTERS = 30
+HASH_BITS = 19           # 特征维度 2^19
+EPOCHS = 2
+CHUNKSIZE = 50_000       # 每次从文件读取的行数
+BATCH_SIZE = 2_048       # 每次更新簇中心的行数
+INIT_SIZE = 10_000       # k-means++ 初始化所用的行数
+TOP_TERMS = 8
+EXAMPLES = 5
+SEED = 20250501
+
+_CHAR_BITS = 21
+_NON_TERM = re.compile(r'[\W_]+')
+_GOLDEN = 0x9E3779B97F4A7C15
+
+
+def _ngram_keys(texts):
+    """每个文本的 2-gram、3-gram 编码及所属文档号（忽略空白和标点）"""
+    texts = normalize(texts).str.replace(_NON_TERM, '', regex=True)
+    lengths = texts.str.len().to_numpy(dtype=np.int64)
+    codes = np.frombuffer(''.join(texts.tolist()).encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+    docs = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+    if len(codes) < 2:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    # 2-gram 编码小于 2^42，3-gram 首字码位不为 0，编码不小于 2^42，两者不会混淆
+    bigram = docs[:-1] == docs[1:]
+    trigram = docs[:-2] == docs[2:]
+    keys = np.concatenate([
+        (codes[:-1][bigram] << _CHAR_BITS) | codes[1:][bigram],
+        (codes[:-2][trigram] << (2 * _CHAR_BITS)) | (codes[1:-1][trigram] << _CHAR_BITS) | codes[2:][trigram],
+    ])
+    return keys, np.concatenate([docs[:-1][bigram], docs[:-2][trigram]])
+
+
+def _hash_features(keys, hash_bits=HASH_BITS):
+    return ((keys.astype(np.uint64) * np.uint64(_GOLDEN)) >> np.uint64(64 - hash_bits)).astype(np.int64)
+
+
+def decode_key(key):
+    """n-gram 编码还原为字符串"""
+    key = int(key)
+    mask = (1 << _CHAR_BITS) - 1
+    chars = [(key >> (2 * _CHAR_BITS)) & mask, (key >> _CHAR_BITS) & mask, key & mask]
+    return ''.join(chr(code) for code in chars if code)
+
+
+class Vectorizer:
+    """哈希字符 n-gram 的 TF-IDF 向量化（次线性词频，行 L2 归一化）"""
+
+    def __init__(self, hash_bits=HASH_BITS):
+        self.hash_bits = hash_bits
+        self.n_features = 1 << hash_bits
+        self.df = np.zeros(self.n_features, dtype=np.int64)
+        # 每个哈希桶第一次出现的 n-gram，用于展示簇的高权重词
+        self.feature_keys = np.zeros(self.n_features, dtype=np.int64)
+        self.n_docs = 0
+        self.idf = None
+
+    def _pairs(self, texts):
+        keys, docs = _ngram_keys(texts)
+        features = _hash_features(keys, self.hash_bits)
+        pairs, first, counts = np.unique(docs * self.n_features + features, return_index=True, return_counts=True)
+        return pairs, counts, keys[first]
+
+    def partial_fit(self, texts):
+        """累加一块文本的文档频率"""
+        pairs, _counts, keys = self._pairs(texts)
+        features = pairs % self.n_features
+        self.df += np.bincount(features, minlength=self.n_features)
+        unnamed = self.feature_keys[features] == 0
+        self.feature_keys[features[unnamed]] = keys[unnamed]
+        self.n_docs += len(texts)
+        return self
+
+    def finalize(self):
+        self.idf = (np.log((1 + self.n_docs) / (1 + self.df)) + 1).astype(np.float32)
+        return self
+
+    def transform(self, texts):
+        """返回 (rows, indptr, indices, data)：rows 为有特征的文本在 texts 中的位置，其余三项为 CSR 矩阵"""
+        pairs, counts, _keys = self._pairs(texts)
+        docs, indices = pairs // self.n_features, pairs % self.n_features
+        data = (1 + np.log(counts)).astype(np.float32) * self.idf[indices]
+        rows, starts = np.unique(docs, return_index=True)
+        indptr = np.r_[starts, len(docs)]
+        norms = np.sqrt(np.add.reduceat(data * data, starts)) if len(starts) else np.zeros(0, dtype=np.float32)
+        data /= np.repeat(norms, np.diff(indptr))
+        return rows, indptr, indices, data
+
+    def term(self, feature):
+        return decode_key(self.feature_keys[feature])
+
+
+def _similarities(indptr, indices, data, centers):
+    """稀疏行与各簇中心（已归一化，形如 (特征数, k)）的余弦相似度"""
+    products = data[:, None] * centers[indices]
+    return np.add.reduceat(products, indptr[:-1], axis=0)
+
+
+def _batches(indptr, indices, data, batch_size=BATCH_SIZE):
+    """按行切分 CSR 矩阵"""
+    n_rows = len(indptr) - 1
+    for begin in range(0, n_rows, batch_size):
+        end = min(begin + batch_size, n_rows)
+        lo, hi = indptr[begin], indptr[end]
+        yield begin, indptr[begin:end + 1] - lo, indices[lo:hi], data[lo:hi]
+
+
+class MiniBatchKMeans:
+    """稀疏输入的球面 mini-batch k-means（Sculley, 2010）
+
+    每个簇中心是分到该簇的全部样本的累计均值，按批增量更新，
+    分配时对簇中心归一化后取余弦相似度最大的簇。
+
+    簇中心存为 scale[j] * vectors[:, j]，并维护 vectors 各列的模长平方：
+    每批只需改写本批出现过的特征行，不必缩放、遍历整个 (特征数, k) 矩阵。
+    """
+
+    RESCALE_BELOW = 1e-4
+
+    def __init__(self, n_clusters, n_features, seed=SEED):
+        self.n_clusters = n_clusters
+        self.n_features = n_features
+        self.rng = np.random.default_rng(seed)
+        self.vectors = None
+        self.counts = np.zeros(n_clusters, dtype=np.float64)
+
+    def init(self, indptr, indices, data):
+        """k-means++ 初始化：依次按与已选中心的距离平方加权抽样"""
+        n_rows = len(indptr) - 1
+        k = min(self.n_clusters, n_rows)
+        self.n_clusters = k
+        self.counts = np.zeros(k, dtype=np.float64)
+        self.scale = np.ones(k, dtype=np.float64)
+        self.vectors = np.zeros((self.n_features, k), dtype=np.float32)
+        best = np.full(n_rows, -np.inf, dtype=np.float32)
+        chosen = self.rng.integers(n_rows)
+        for j in range(k):
+            lo, hi = indptr[chosen], indptr[chosen + 1]
+            self.vectors[indices[lo:hi], j] = data[lo:hi]
+            if j == k - 1:
+                break
+            best = np.maximum(best, _similarities(indptr, indices, data, self.vectors[:, j:j + 1])[:, 0])
+            # 单位向量间距离平方 = 2 - 2 * 余弦相似度
+            weights = np.maximum(2 - 2 * best.astype(np.float64), 0)
+            total = weights.sum()
+            chosen = self.rng.choice(n_rows, p=weights / total) if total > 0 else self.rng.integers(n_rows)
+        self.squared_norms = (self.vectors.astype(np.float64) ** 2).sum(axis=0)
+        return self
+
+    @property
+    def fitted(self):
+        return self.vectors is not None
+
+    def _norms(self):
+        norms = np.sqrt(np.maximum(self.squared_norms, 0))
+        return np.where(norms > 0, norms, 1)
+
+    def normalized_centers(self):
+        return self.vectors / self._norms().astype(np.float32)
+
+    def predict(self, indptr, indices, data, centers=None):
+        """返回 (簇号, 相似度)；centers 为 normalized_centers() 的结果，不传时按当前中心计算"""
+        if centers is None:
+            # 余弦相似度与 scale 无关，只需除以 vectors 的模长
+            similarities = _similarities(indptr, indices, data, self.vectors) / self._norms().astype(np.float32)
+        else:
+            similarities = _similarities(indptr, indices, data, centers)
+        labels = similarities.argmax(axis=1)
+        return labels, similarities[np.arange(len(labels)), labels]
+
+    def partial_fit(self, indptr, indices, data):
+        labels, _ = self.predict(indptr, indices, data)
+        batch_counts = np.bincount(labels, minlength=self.n_clusters).astype(np.float64)
+        touched = batch_counts > 0
+        new_counts = self.counts + batch_counts
+
+        # 首次分到样本的簇，中心直接取本批均值（丢弃初始化时的种子向量）
+        for j in np.flatnonzero(touched & (self.counts == 0)):
+            self.vectors[:, j] = 0
+            self.squared_norms[j] = 0
+            self.scale[j] = 1
+        # 新中心 = (旧中心 * 旧计数 + 本批样本和) / 新计数
+        self.scale[touched] *= self.counts[touched] / new_counts[touched]
+        self.scale[touched & (self.counts == 0)] = 1
+
+        features, local = np.unique(indices, return_inverse=True)
+        sums = np.zeros((len(features), self.n_clusters), dtype=np.float32)
+        np.add.at(sums, (local, np.repeat(labels, np.diff(indptr))), data)
+        step = np.where(touched, 1 / (np.where(touched, new_counts, 1) * self.scale), 0).astype(np.float32)
+        old = self.vectors[features]
+        new = old + sums * step
+        self.squared_norms += (new.astype(np.float64) ** 2 - old.astype(np.float64) ** 2).sum(axis=0)
+        self.vectors[features] = new
+        self.counts = new_counts
+
+        # scale 随计数增长逐渐变小，过小时并回 vectors，避免 step 过大损失精度
+        for j in np.flatnonzero(self.scale < self.RESCALE_BELOW):
+            self.vectors[:, j] *= np.float32(self.scale[j])
+            self.squared_norms[j] = float((self.vectors[:, j].astype(np.float64) ** 2).sum())
+            self.scale[j] = 1
+        return self
+
+
+def _read_texts(source_path, labels=None, chunksize=CHUNKSIZE, with_ids=False):
+    """分块读取反馈内容，labels 不为空时只保留这些标签的反馈
+
+    with_ids 时同时读取 feedback_id 和 label（未打标的数据 label 为空）。
+    """
+    has_label = 'label' in dataset_columns(source_path)
+    if labels and not has_label:
+        raise ValueError(f'{source_path} 没有 label 列，不能按标签筛选')
+    columns = ['feedback_content']
+    if with_ids:
+        columns = ['feedback_id'] + columns
+    if has_label and (with_ids or labels):
+        columns.append('label')
+    for chunk in iter_chunks(source_path, columns=columns, chunksize=chunksize):
+        if labels:
+            chunk = chunk[chunk['label'].isin(labels)]
+        if 'label' not in chunk:
+            chunk = chunk.assign(label='')
+        yield chunk.reset_index(drop=True)
+
+
+def cluster_feedback(source_path=FEEDBACK_LABELED_PATH, n_clusters=N_CLUSTERS, labels=None,
+                     epochs=EPOCHS, hash_bits=HASH_BITS, chunksize=CHUNKSIZE,
+                     assignments_path=ASSIGNMENTS_PATH, progress=None):
+    """聚类并写出逐条分配结果，返回簇摘要 DataFrame"""
+    report = progress or (lambda message: None)
+
+    vectorizer = Vectorizer(hash_bits)
+    for chunk in _read_texts(source_path, labels, chunksize):
+        vectorizer.partial_fit(chunk['feedback_content'])
+    vectorizer.finalize()
+    report(f'文档频率：{vectorizer.n_docs} 条反馈')
+
+    model = MiniBatchKMeans(n_clusters, vectorizer.n_features)
+    for epoch in range(epochs):
+        for chunk in _read_texts(source_path, labels, chunksize):
+            _rows, indptr, indices, data = vectorizer.transform(chunk['feedback_content'])
+            if len(indptr) < 2:
+                continue
+            if not model.fitted:
+                model.init(*_head_rows(indptr, indices, data, INIT_SIZE))
+            for _begin, *batch in _batches(indptr, indices, data):
+                model.partial_fit(*batch)
+        report(f'第 {epoch + 1}/{epochs} 轮完成')
+    if not model.fitted:
+        raise ValueError('没有可聚类的反馈内容')
+
+    centers = model.normalized_centers()
+    k = model.n_clusters
+    sizes = np.zeros(k, dtype=np.int64)
+    similarity_sums = np.zeros(k)
+    label_counts = [dict() for _ in range(k)]
+    examples = [[] for _ in range(k)]
+    total = 0
+
+    assignments_path = Path(assignments_path)
+    assignments_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = assignments_path.with_suffix('.csv.tmp')
+    header = True
+    for chunk in _read_texts(source_path, labels, chunksize, with_ids=True):
+        rows, indptr, indices, data = vectorizer.transform(chunk['feedback_content'])
+        cluster = np.full(len(chunk), -1, dtype=np.int64)
+        similarity = np.zeros(len(chunk), dtype=np.float32)
+        for begin, *batch in _batches(indptr, indices, data):
+            batch_labels, batch_similarity = model.predict(*batch, centers=centers)
+            positions = rows[begin:begin + len(batch_labels)]
+            cluster[positions], similarity[positions] = batch_labels, batch_similarity
+
+        assigned = cluster >= 0
+        sizes += np.bincount(cluster[assigned], minlength=k)
+        similarity_sums += np.bincount(cluster[assigned], weights=similarity[assigned], minlength=k)
+        total += len(chunk)
+        chunk_labels = chunk['label'][assigned].astype('string').fillna('')
+        counts = chunk.loc[assigned].groupby([cluster[assigned], chunk_labels]).size()
+        for (j, label), count in counts.items():
+            label_counts[j][label] = label_counts[j].get(label, 0) + int(count)
+        _update_examples(examples, chunk['feedback_content'], cluster, similarity)
+
+        pd.DataFrame({'feedback_id': chunk['feedback_id'], 'cluster': cluster, 'similarity': similarity.round(4)}) \
+            .to_csv(tmp_path, mode='w' if header else 'a', header=header, index=False, encoding=CSV_ENCODING)
+        header = False
+    tmp_path.replace(assignments_path)
+
+    records = []
+    for j in range(k):
+        top_features = np.argsort(-centers[:, j])[:TOP_TERMS]
+        labels_text = '，'.join(f'{label or "(空)"} {count / max(sizes[j], 1):.0%}' for label, count in
+                               sorted(label_counts[j].items(), key=lambda item: -item[1])[:3])
+        records.append({
+            'cluster': j,
+            'size': int(sizes[j]),
+            'share': round(sizes[j] / max(total, 1), 4),
+            'cohesion': round(similarity_sums[j] / max(sizes[j], 1), 4),
+            'top_terms': ' '.join(vectorizer.term(f) for f in top_features if centers[f, j] > 0),
+            'top_labels': labels_text,
+            'examples': ' | '.join(text for _similarity, text in examples[j]),
+        })
+    return pd.DataFrame(records).sort_values('size', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def _head_rows(indptr, indices, data, n_rows):
+    n_rows = min(n_rows, len(indptr) - 1)
+    end = indptr[n_rows]
+    return indptr[:n_rows + 1], indices[:end], data[:end]
+
+
+def _update_examples(examples, texts, cluster, similarity, n_examples=EXAMPLES):
+    """为每个簇保留与簇中心最相似、内容互不相同的 n_examples 条反馈"""
+    order = np.lexsort((-similarity, cluster))
+    sorted_cluster = order[cluster[order] >= 0]
+    texts = texts.to_numpy()
+    for j in np.unique(cluster[sorted_cluster]):
+        candidates = sorted_cluster[cluster[sorted_cluster] == j][:n_examples * 4]
+        merged = examples[j] + [(float(similarity[i]), str(texts[i]).strip()) for i in candidates]
+        merged.sort(key=lambda item: -item[0])
+        kept, seen = [], set()
+        for item in merged:
+            if item[1] and item[1] not in seen:
+                seen.add(item[1])
+                kept.append(item)
+            if len(kept) == n_examples:
+                break
+        examples[j] = kept
+
+
+def write_clusters(summary, path=CLUSTERS_PATH):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.csv.tmp')
+    summary.to_csv(tmp_path, index=False, encoding=CSV_ENCODING)
+    tmp_path.replace(path)
+    return path
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='用户反馈无监督聚类')
+    parser.add_argument('--source', default=str(FEEDBACK_LABELED_PATH))
+    parser.add_argument('-k', '--clusters', type=int, default=N_CLUSTERS)
+    parser.add_argument('--labels', nargs='*', help='只聚类这些标签的反馈，如 无法分类')
+    parser.add_argument('--epochs', type=int, default=EPOCHS)
+    parser.add_argument('--output', default=str(CLUSTERS_PATH))
+    parser.add_argument('--assignments', default=str(ASSIGNMENTS_PATH))
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    summary = cluster_feedback(args.source, n_clusters=args.clusters, labels=args.labels, epochs=args.epochs,
+                               assignments_path=args.assignments, progress=print)
+    print(f'写出 {write_clusters(summary, args.output)}，{time.perf_counter() - started:.1f}s')
+    with pd.option_context('display.max_colwidth', 60, 'display.width', 200):
+        print(summary[['cluster', 'size', 'share', 'top_terms', 'top_labels']].head(20).to_string(index=False))
@@ -0,0 +1,241 @@
+"""
+用户反馈去重与垃圾内容识别（打标前）
+
+- 垃圾内容：空内容、单字重复、片段重复、键盘乱打、链接/口令等规则识别，不送模型，
+  沿用模型给已打标垃圾内容最多的标签（默认无法分类）。
+  表情、连续重复的片段先折叠，键盘乱打的分句先去掉，只按剩下的正文判断，
+  正常反馈末尾跟一串表情或乱打的字不会被当成垃圾内容
+- 近似重复：对反馈内容的字符 3-gram 计算 MinHash 签名，LSH 分桶找候选对，
+  候选对按连通分量确定代表行（最早出现的一条），每行再与代表行直接比较，签名相似度达到阈值才归入该簇，
+  每簇只有代表行送模型打标，
+  写出已打标文件时簇内其他行沿用代表行的结果，标签计数仍按原始行数统计
+
+输出映射文件（data/.checkpoints/feedback_dedupe.csv）：
+    feedback_id, canonical_id（代表行的 feedback_id）, cluster_size, spam_reason
+
+运行：
+    python -m pipeline.feedback_dedupe
+    python -m pipeline.feedback_labeling --dedupe      # 打标时按映射只处理代表行
+"""
+
+import re
+import unicodedata
+import zlib
+from pathlib import Path
+
+from utils.data_store import DATA_DIR, FEEDBACK_SAMPLE_PATH, CSV_ENCODING, read_dataset
+from utils.feedback_search import normalize
+from utils.lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+DEDUPE_PATH = DATA_DIR / ".checkpoints" / "feedback_dedupe.csv"
+MAPPING_COLUMNS = ['feedback_id', 'canonical_id', 'cluster_size', 'spam_reason']
+
+SHINGLE_SIZE = 3
+NUM_PERM = 128
+BANDS = 16         # 每个 band 8 行，相似度约 0.7 以上的对大概率落入同一桶
+SIMILARITY_THRESHOLD = 0.85
+BATCH_SIZE = 50_000
+SEED = 20250501
+
+_CHAR_BITS = 21
+_SHORT_LATIN = re.compile(r'(?<=[一-鿿])[a-zA-Z0-9]{1,2}(?=[一-鿿])')
+# 连续出现 3 次及以上的片段（1～30 个字）折叠为 1 次
+_REPEATED_RUN = re.compile(r'(.{1,30}?)\1{2,}', re.DOTALL)
+_CJK = re.compile(r'[一-鿿]')
+_WHITESPACE = re.compile(r'\s+')
+_CLAUSE = re.compile(r'[^，,。.！!？?；;、\s]+')
+# 表情与符号：其他符号、修饰符号、代理项、私用区、格式字符（零宽连接符等）
+_FILLER_CATEGORIES = {'So', 'Sk', 'Cs', 'Co', 'Cf'}
+_LINK = re.compile(r'https?://|[a-z0-9-]+\.(?:com|cn|net)\b|[￥¥$][A-Za-z0-9]{8,}[￥¥$]', re.IGNORECASE)
+
+
+def _collapse_runs(text):
+    previous = None
+    # 折叠后可能露出新的重复，重复到不再变化
+    while text != previous:
+        previous, text = text, _REPEATED_RUN.sub(r'\1', text)
+    return text
+
+
+def collapse_filler(text):
+    """去掉表情和符号，空白合并为一个空格，连续重复的片段只保留一次"""
+    text = ''.join(char for char in text if unicodedata.category(char) not in _FILLER_CATEGORIES
+                   and char not in '\ufe0e\ufe0f')
+    return _collapse_runs(_WHITESPACE.sub(' ', text).strip())
+
+
+def _clean_clauses(text):
+    """没有汉字夹杂单个字母/数字的分句"""
+    return [clause for clause in _CLAUSE.findall(text) if not _SHORT_LATIN.search(clause)]
+
+
+def spam_reason(text):
+    """垃圾内容的原因；正常内容返回空字符串"""
+    if not isinstance(text, str) or not text.strip():
+        return '空内容'
+    core = collapse_filler(text)
+    if len(text) >= 10 and len({char for char in core if char.isalnum()}) < 2 and not _CJK.search(core):
+        # 折叠后只剩一个数字或字母（或只有表情），如「666666」；「好好好」「卡卡卡」仍送模型（近似重复只送一条）
+        return '单字重复'
+    # 片段之间的标点不一致时（「太快了，太快了太快了，」）去掉标点再折叠
+    words = _collapse_runs(''.join(char for char in core if not unicodedata.category(char).startswith(('P', 'Z'))))
+    encoded = words.encode('utf-8')
+    if len(words) >= 30 and len(zlib.compress(encoded)) / len(encoded) < 0.25:
+        return '片段重复'
+    short_latin = len(_SHORT_LATIN.findall(core))
+    if len(core) >= 40 and short_latin >= 5 and short_latin / len(core) >= 0.04:
+        # 汉字之间夹杂大量单个字母/数字，如「v他v给v」；乱打之外还有成句的正文时不算
+        if sum(len(clause) for clause in _clean_clauses(core)) < 6:
+            return '键盘乱打'
+    if _LINK.search(text):
+        return '链接/口令'
+    return ''
+
+
+def _shingle_keys(texts):
+    """所有文本的 3-gram 编码及所属文档（按文档顺序排列）；不足 3 个字的文本整体作为一个 shingle"""
+    texts = normalize(texts).str.replace(r'\s+', '', regex=True)
+    lengths = texts.str.len().to_numpy(dtype=np.int64)
+    padded = [text if len(text) >= SHINGLE_SIZE else text.ljust(SHINGLE_SIZE, '\x00') for text in texts.tolist()]
+    lengths = np.maximum(lengths, SHINGLE_SIZE)
+    codes = np.frombuffer(''.join(padded).encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+    starts = np.r_[0, np.cumsum(lengths)[:-1]]
+    counts = lengths - SHINGLE_SIZE + 1
+    # 每个文档的第 i 个 shingle 起始于 starts + i
+    positions = np.repeat(starts - np.r_[0, np.cumsum(counts)[:-1]], counts) + np.arange(counts.sum())
+    keys = (codes[positions] << (2 * _CHAR_BITS)) | (codes[positions + 1] << _CHAR_BITS) | codes[positions + 2]
+    return keys.astype(np.uint64), np.r_[0, np.cumsum(counts)[:-1]]
+
+
+def minhash_signatures(texts, num_perm=NUM_PERM, seed=SEED):
+    """MinHash 签名，(文档数, num_perm) 的 uint32"""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+    texts = list(texts)
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint32)
+    for begin in range(0, len(texts), BATCH_SIZE):
+        keys, doc_starts = _shingle_keys(texts[begin:begin + BATCH_SIZE])
+        for i in range(num_perm):
+            # 乘加取高 32 位作为哈希（uint64 溢出即取模 2^64）
+            hashed = ((keys * a[i] + b[i]) >> np.uint64(32)).astype(np.uint32)
+            signatures[begin:begin + len(doc_starts), i] = np.minimum.reduceat(hashed, doc_starts)
+    return signatures
+
+
+def _band_keys(band):
+    key = np.zeros(len(band), dtype=np.uint64)
+    for column in band.T:
+        key = (key ^ column.astype(np.uint64)) * np.uint64(0x100000001B3)
+    return key
+
+
+def _connected_components(n, left, right):
+    """无向图连通分量：返回每个节点所在分量的最小节点号"""
+    labels = np.arange(n)
+    while True:
+        smaller = np.minimum(labels[left], labels[right])
+        updated = labels.copy()
+        np.minimum.at(updated, left, smaller)
+        np.minimum.at(updated, right, smaller)
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def cluster_near_duplicates(signatures, bands=BANDS, threshold=SIMILARITY_THRESHOLD):
+    """LSH 分桶 + 签名相似度确认，返回每行所属簇的代表行号（簇内最小行号）
+
+    连通分量只用来确定代表行；每行再与代表行直接比较，相似度不到阈值的行自成一簇，
+    不会因为 A≈B、B≈C 就把不相似的 A、C 并在一起。
+    """
+    n, num_perm = signatures.shape
+    rows_per_band = num_perm // bands
+    lefts, rights = [], []
+    for band_index in range(bands):
+        band = signatures[:, band_index * rows_per_band:(band_index + 1) * rows_per_band]
+        keys = _band_keys(band)
+        order = np.argsort(keys, kind='stable')
+        same = keys[order][1:] == keys[order][:-1]
+        left, right = order[:-1][same], order[1:][same]
+        keep = _similarity(signatures, left, right) >= threshold
+        lefts.append(left[keep])
+        rights.append(right[keep])
+    left, right = np.concatenate(lefts), np.concatenate(rights)
+    if not len(left):
+        return np.arange(n)
+    canonical = _connected_components(n, left, right)
+    rows = np.flatnonzero(canonical != np.arange(n))
+    confirmed = _similarity(signatures, rows, canonical[rows]) >= threshold
+    canonical[rows[~confirmed]] = rows[~confirmed]
+    return canonical
+
+
+def _similarity(signatures, left, right):
+    return (signatures[left] == signatures[right]).mean(axis=1)
+
+
+def dedupe_feedback(source_path=FEEDBACK_SAMPLE_PATH):
+    """计算去重映射，返回 DataFrame（列见 MAPPING_COLUMNS）"""
+    df = read_dataset(source_path, columns=['feedback_id', 'feedback_content'])
+    reasons = df['feedback_content'].map(spam_reason).to_numpy()
+    normal = np.flatnonzero(reasons == '')
+
+    canonical_row = np.arange(len(df))
+    if len(normal):
+        signatures = minhash_signatures(df['feedback_content'].to_numpy()[normal])
+        canonical_row[normal] = normal[cluster_near_duplicates(signatures)]
+
+    ids = df['feedback_id'].to_numpy()
+    cluster_size = np.bincount(canonical_row, minlength=len(df))[canonical_row]
+    return pd.DataFrame({
+        'feedback_id': ids,
+        'canonical_id': ids[canonical_row],
+        'cluster_size': cluster_size,
+        'spam_reason': reasons,
+    })
+
+
+def write_mapping(mapping, path=DEDUPE_PATH):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.csv.tmp')
+    mapping.to_csv(tmp_path, index=False, encoding=CSV_ENCODING)
+    tmp_path.replace(path)
+    return path
+
+
+def load_mapping(path=DEDUPE_PATH):
+    """读取映射，返回 {feedback_id: (canonical_id, spam_reason)}"""
+    mapping = pd.read_csv(path, encoding=CSV_ENCODING, keep_default_na=False)
+    return dict(zip(mapping['feedback_id'].tolist(),
+                    zip(mapping['canonical_id'].tolist(), mapping['spam_reason'].tolist())))
+
+
+def describe(mapping):
+    total = len(mapping)
+    spam = int((mapping['spam_reason'] != '').sum())
+    representatives = int(((mapping['canonical_id'] == mapping['feedback_id']) & (mapping['spam_reason'] == '')).sum())
+    duplicates = total - spam - representatives
+    lines = [f'共 {total} 条：垃圾内容 {spam} 条，近似重复 {duplicates} 条，需打标 {representatives} 条'
+             f'（节省 {(spam + duplicates) / max(total, 1):.1%} 的模型调用）']
+    for reason, count in mapping.loc[mapping['spam_reason'] != '', 'spam_reason'].value_counts().items():
+        lines.append(f'  {reason}：{count}')
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='用户反馈去重与垃圾内容识别')
+    parser.add_argument('--source', default=str(FEEDBACK_SAMPLE_PATH))
+    parser.add_argument('--output', default=str(DEDUPE_PATH))
+    args = parser.parse_args()
+
+    result = dedupe_feedback(args.source)
+    print(describe(result))
+    print(f'写出 {write_mapping(result, args.output)}')
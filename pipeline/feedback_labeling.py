@@ -0,0 +1,219 @@
+"""
+用户反馈打标
+
+读取抽样反馈（用户反馈数据_抽样8000条.csv），逐条调用模型得到 label / scene，
+写出已打标文件（用户反馈数据_已打标_8000条_20并发.csv）。
+
+- 并发：自适应并发上限，初始 20
+- 限速：令牌桶
+- 重试：指数退避
+- 标签库：结果逐条写入 utils/label_store.py 的标签库（按 feedback_id + 内容哈希），
+  重启或导入新的原始反馈时只处理没有标签或内容变化的反馈
+- 去重（--dedupe）：先按 pipeline/feedback_dedupe.py 识别垃圾内容和近似重复，只为每簇代表行调用模型
+
+运行：
+    python -m pipeline.stub_model_server &          # 本地测试用的模拟模型服务
+    python -m pipeline.feedback_labeling --base-url http://127.0.0.1:8765/v1
+"""
+
+import asyncio
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from utils.data_store import FEEDBACK_SAMPLE_PATH, FEEDBACK_LABELED_PATH, iter_chunks
+from utils.feedback_labels import LABELING_LABELS, UNCLASSIFIED_LABEL
+from utils.label_store import (
+    LABEL_STORE_PATH, RESULT_COLUMNS, LabelStore, backlog, content_hashes, export_labeled,
+)
+from pipeline.feedback_dedupe import DEDUPE_PATH, dedupe_feedback, describe, load_mapping, write_mapping
+from pipeline.model_client import (
+    DEFAULT_BASE_URL, DEFAULT_MODEL, AdaptiveLimiter, ChatModelClient, ModelAPIError,
+    TokenBucket, call_with_retry, parse_json_reply,
+)
+
+# 垃圾内容不送模型；标签库里有模型给这类反馈的标签时，apply_dedupe 改用其中最多的一个
+SPAM_RESULT = {'label': UNCLASSIFIED_LABEL, 'scene': '', 'api_success': True, 'api_error': ''}
+
+SYSTEM_PROMPT = (
+    "你是拍照翻译功能的用户反馈分析助手。根据用户反馈内容，从给定标签中选出最合适的一个，"
+    "并在反馈属于功能建议或发音朗读问题时，用一句话概括用户的使用场景（否则 scene 留空）。"
+    "只输出 JSON：{\"label\": \"...\", \"scene\": \"...\"}"
+)
+
+
+def build_messages(content):
+    """构造单条反馈的打标请求"""
+    return [
+        {'role': 'system', 'content': SYSTEM_PROMPT},
+        {'role': 'user', 'content': f"可选标签：{'、'.join(LABELING_LABELS)}\n反馈内容：{content}"},
+    ]
+
+
+def needs_labeling(feedback_id, mapping):
+    """去重映射下只有非垃圾内容的代表行需要调用模型"""
+    if mapping is None or feedback_id not in mapping:
+        return True
+    canonical_id, spam = mapping[feedback_id]
+    return not spam and canonical_id == feedback_id
+
+
+async def label_one(client, limiter, bucket, content, max_retries):
+    """为一条反馈打标，返回结果字典（失败时 api_success=False）"""
+    if not isinstance(content, str) or not content.strip():
+        return {'label': UNCLASSIFIED_LABEL, 'scene': '', 'api_success': True, 'api_error': ''}
+
+    async def request():
+        reply = parse_json_reply(await client.complete(build_messages(content)))
+        label = reply.get('label')
+        if label not in LABELING_LABELS:
+            label = UNCLASSIFIED_LABEL
+        return {'label': label, 'scene': reply.get('scene') or '', 'api_success': True, 'api_error': ''}
+
+    try:
+        return await call_with_retry(request, limiter, bucket, max_retries=max_retries)
+    except ModelAPIError as e:
+        return {'label': None, 'scene': '', 'api_success': False, 'api_error': str(e)}
+
+
+async def label_feedback(client, source_path=FEEDBACK_SAMPLE_PATH, store_path=LABEL_STORE_PATH,
+                         concurrency=20, max_concurrency=None, rate=20.0, max_retries=5,
+                         chunksize=10_000, progress=None, mapping=None):
+    """对 source_path 中尚未成功打标（或内容已变化）的反馈打标，结果逐条写入标签库
+
+    mapping 为去重映射（load_mapping 的结果）时跳过垃圾内容和非代表行。
+    返回本次处理的条数。
+    """
+    limiter = AdaptiveLimiter(concurrency, max_limit=max_concurrency)
+    bucket = TokenBucket(rate)
+    queue = asyncio.Queue(maxsize=limiter.max_limit * 2)
+    processed = 0
+
+    with LabelStore(store_path) as store:
+
+        async def worker():
+            nonlocal processed
+            while True:
+                item = await queue.get()
+                if item is None:
+                    queue.task_done()
+                    return
+                feedback_id, digest, content = item
+                result = await label_one(client, limiter, bucket, content, max_retries)
+                store.put(feedback_id, digest, result)
+                processed += 1
+                if progress is not None:
+                    progress(processed, limiter.limit)
+                queue.task_done()
+
+        # worker 数量取并发上限，实际同时在途的请求数由 limiter 控制
+        workers = [asyncio.create_task(worker()) for _ in range(limiter.max_limit)]
+        try:
+            for chunk in backlog(source_path, store_path, chunksize=chunksize):
+                for feedback_id, content, digest in chunk.itertuples(index=False):
+                    if not needs_labeling(feedback_id, mapping):
+                        continue
+                    await queue.put((feedback_id, digest, content))
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            # 被取消（中断）时先停掉 worker，关闭标签库后不再写入；已写入的结果下次跳过
+            for task in workers:
+                task.cancel()
+
+    return processed
+
+
+def apply_dedupe(mapping, source_path=FEEDBACK_SAMPLE_PATH, store_path=LABEL_STORE_PATH, chunksize=100_000):
+    """按去重映射补全标签库：垃圾内容沿用模型的标签，近似重复行沿用代表行的结果
+
+    已有模型结果的垃圾内容保持不变；没有结果的记为模型给已打标垃圾内容最多的标签
+    （标签库中没有这类结果时为无法分类）。结果按每行自己的内容哈希写入，
+    标签计数仍按原始行数统计。返回写入条数。
+    """
+    hashes = {}
+    for chunk in iter_chunks(source_path, columns=['feedback_id', 'feedback_content'], chunksize=chunksize):
+        hashes.update(zip(chunk['feedback_id'].tolist(), content_hashes(chunk['feedback_content'].tolist())))
+
+    with LabelStore(store_path) as store:
+        labels = store.frame()
+        results = dict(zip(zip(labels['feedback_id'].tolist(), labels['content_hash'].tolist()),
+                           labels[RESULT_COLUMNS].to_dict('records')))
+        spam_labels = Counter()
+        for feedback_id, digest in hashes.items():
+            result = results.get((feedback_id, digest))
+            if mapping.get(feedback_id, (feedback_id, ''))[1] and result is not None and result['api_success']:
+                spam_labels[result['label']] += 1
+        spam_result = dict(SPAM_RESULT, label=spam_labels.most_common(1)[0][0]) if spam_labels else SPAM_RESULT
+
+        records = []
+        for feedback_id, digest in hashes.items():
+            canonical_id, spam = mapping.get(feedback_id, (feedback_id, ''))
+            if spam:
+                result = results.get((feedback_id, digest))
+                if result is None or not result['api_success']:
+                    records.append((feedback_id, digest, spam_result))
+            elif canonical_id != feedback_id:
+                result = results.get((canonical_id, hashes.get(canonical_id)))
+                if result is not None and result['api_success']:
+                    records.append((feedback_id, digest, result))
+        return store.put_many(records)
+
+
+def write_labeled(source_path=FEEDBACK_SAMPLE_PATH, output_path=FEEDBACK_LABELED_PATH,
+                  store_path=LABEL_STORE_PATH, mapping=None):
+    """把标签库中的结果并回原始反馈，写出已打标文件
+
+    mapping 为去重映射时先用 apply_dedupe 补全近似重复和垃圾内容的结果。
+    """
+    if mapping is not None:
+        apply_dedupe(mapping, source_path, store_path)
+    return export_labeled(source_path, output_path, store_path)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='用户反馈打标')
+    parser.add_argument('--base-url', default=DEFAULT_BASE_URL, help='OpenAI 兼容接口地址')
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--source', default=str(FEEDBACK_SAMPLE_PATH))
+    parser.add_argument('--output', default=str(FEEDBACK_LABELED_PATH))
+    parser.add_argument('--store', default=str(LABEL_STORE_PATH), help='标签库（SQLite）')
+    parser.add_argument('--concurrency', type=int, default=20, help='初始并发')
+    parser.add_argument('--max-concurrency', type=int, default=40, help='并发上限')
+    parser.add_argument('--rate', type=float, default=20.0, help='每秒请求数上限')
+    parser.add_argument('--max-retries', type=int, default=5)
+    parser.add_argument('--dedupe', action='store_true', help='先去重，只为每簇代表行打标')
+    parser.add_argument('--dedupe-mapping', default=str(DEDUPE_PATH))
+    args = parser.parse_args()
+
+    mapping = None
+    if args.dedupe:
+        result = dedupe_feedback(args.source)
+        print(describe(result))
+        mapping = load_mapping(write_mapping(result, args.dedupe_mapping))
+
+    client = ChatModelClient(base_url=args.base_url, model=args.model)
+
+    def progress(count, limit):
+        if count % 200 == 0:
+            print(f'已处理 {count} 条，当前并发 {limit}', flush=True)
+
+    async def run():
+        # 同步 HTTP 调用在线程池中执行，线程数需覆盖并发上限
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=args.max_concurrency))
+        return await label_feedback(
+            client, source_path=args.source, store_path=args.store,
+            concurrency=args.concurrency, max_concurrency=args.max_concurrency,
+            rate=args.rate, max_retries=args.max_retries, progress=progress, mapping=mapping,
+        )
+
+    processed = asyncio.run(run())
+    with LabelStore(args.store) as store:
+        stats = store.stats()
+    print(f'本次处理 {processed} 条，标签库共 {stats["total"]} 条，失败 {stats["failed"]} 条')
+    print(f'写出 {write_labeled(args.source, args.output, args.store, mapping=mapping)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""
+用户拍照图片打标
+
+对一个目录下的图片调用多模态模型，按年级、内容类型、材料来源等维度打标，
+写出与 工作日标签.csv / 周末标签.csv 相同列的标签文件。
+
+- 解码、缩放、JPEG 重编码在进程池中执行
+- 模型请求受自适应并发、令牌桶限速约束，失败按指数退避重试
+- 结果按图片内容 sha256 缓存，重复执行只会为新增或改动过的图片调用模型
+
+运行：
+    python -m pipeline.image_labeling data/示例图片 --period weekday --output /tmp/工作日标签.csv
+"""
+
+import asyncio
+import base64
+import io
+import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from utils.data_store import DATA_DIR, CSV_ENCODING, file_sha256
+from utils.lazy_imports import lazy_import
+from pipeline.model_client import (
+    DEFAULT_BASE_URL, DEFAULT_MODEL, AdaptiveLimiter, ChatModelClient, ModelAPIError,
+    TokenBucket, call_with_retry, parse_json_reply,
+)
+
+pd = lazy_import('pandas')
+
+CACHE_PATH = DATA_DIR / ".checkpoints" / "image_label_cache.jsonl"
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.webp'}
+# 送给模型的图片最长边，足够识别排版与文字
+MAX_SIDE = 1024
+
+LABEL_FIELDS = ['content_type', 'material_source', 'subject', 'grade_level',
+                'usage_scenario', 'confidence', 'description']
+OUTPUT_COLUMNS = ['content_type', 'material_source', 'subject', 'grade_level', 'usage_scenario',
+                  'confidence', 'image_file', 'time_period', 'labeled_at', 'error', 'description']
+
+PROMPT = """这是一张用户用拍照翻译功能拍摄的图片，请按以下维度标注，只输出 JSON：
+- content_type: reading_comprehension / reading_passage / grammar_exercise / vocabulary_exercise / dialogue_text / cloze_test / writing_assignment / translation_exercise / exam_paper / homework_worksheet / screen_capture / other
+- material_source: workbook / homework_book / official_textbook / exam_paper / screen_capture / handout / supplementary_book / other
+- subject: english / chinese / math / physics / biology / other / unclear
+- grade_level: grade_1_3 / grade_4_6 / grade_7_9 / grade_10_12 / unclear
+- usage_scenario: doing_exercises / doing_homework / previewing / reviewing_exam / reading_extra / unclear
+- confidence: high / medium / low
+- description: 一句话描述图片内容"""
+
+
+def prepare_image(path, max_side=MAX_SIDE):
+    """读取图片，缩放到最长边不超过 max_side，返回 base64 编码的 JPEG（在子进程中执行）"""
+    from PIL import Image
+
+    with Image.open(path) as image:
+        image = image.convert('RGB')
+        image.thumbnail((max_side, max_side))
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=85)
+    return base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def build_messages(image_b64):
+    """构造多模态打标请求"""
+    return [{
+        'role': 'user',
+        'content': [
+            {'type': 'text', 'text': PROMPT},
+            {'type': 'image_url', 'image_url': {'url': f'data:image/jpeg;base64,{image_b64}'}},
+        ],
+    }]
+
+
+def load_cache(path=CACHE_PATH):
+    """读取已缓存的打标结果，返回 {sha256: labels}"""
+    cache = {}
+    path = Path(path)
+    if not path.exists():
+        return cache
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            cache[record['sha256']] = record
+    return cache
+
+
+def list_images(image_dir):
+    return sorted(path for path in Path(image_dir).iterdir() if path.suffix.lower() in IMAGE_SUFFIXES)
+
+
+async def label_images(client, image_dir, time_period, cache_path=CACHE_PATH, concurrency=8,
+                       max_concurrency=None, rate=5.0, max_retries=3, workers=None, progress=None):
+    """为 image_dir 下的图片打标，返回与标签 CSV 同列的 DataFrame"""
+    cache_path = Path(cache_path)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    cache = load_cache(cache_path)
+
+    images = list_images(image_dir)
+    hashes = {path: file_sha256(path) for path in images}
+    pending = [path for path in images if hashes[path] not in cache]
+
+    limiter = AdaptiveLimiter(concurrency, max_limit=max_concurrency)
+    bucket = TokenBucket(rate)
+    # 同时在内存中的已解码图片数量不超过并发上限的两倍
+    decode_slots = asyncio.Semaphore(limiter.max_limit * 2)
+    errors = {}
+    loop = asyncio.get_running_loop()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool, open(cache_path, 'a', encoding='utf-8') as cache_file:
+
+        async def label_one(path):
+            async with decode_slots:
+                try:
+                    image_b64 = await loop.run_in_executor(pool, prepare_image, str(path))
+                except (OSError, ValueError) as e:
+                    # 损坏或不是图片的文件（PIL.UnidentifiedImageError 是 OSError 的子类）只记为该图片出错
+                    errors[path] = f'图片解码失败: {type(e).__name__}: {e}'
+                    return
+
+                async def request():
+                    return parse_json_reply(await client.complete(build_messages(image_b64)))
+
+                try:
+                    reply = await call_with_retry(request, limiter, bucket, max_retries=max_retries)
+                except ModelAPIError as e:
+                    errors[path] = f'请求失败 (尝试 {e.attempts}/{max_retries + 1}): {e}'
+                    return
+
+            record = {field: reply.get(field) for field in LABEL_FIELDS}
+            record['sha256'] = hashes[path]
+            record['labeled_at'] = datetime.now().isoformat()
+            cache[record['sha256']] = record
+            cache_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            cache_file.flush()
+            if progress is not None:
+                progress(path)
+
+        await asyncio.gather(*(label_one(path) for path in pending))
+
+    rows = []
+    for path in images:
+        record = cache.get(hashes[path], {})
+        row = {field: record.get(field) for field in LABEL_FIELDS}
+        row.update({
+            'image_file': path.name,
+            'time_period': time_period,
+            'labeled_at': record.get('labeled_at'),
+            'error': errors.get(path),
+        })
+        rows.append(row)
+    return pd.DataFrame(rows, columns=OUTPUT_COLUMNS)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='用户拍照图片打标')
+    parser.add_argument('image_dir', help='图片目录')
+    parser.add_argument('--period', required=True, choices=['weekday', 'weekend'], help='写入 time_period 列')
+    parser.add_argument('--output', required=True, help='输出 CSV 路径')
+    parser.add_argument('--base-url', default=DEFAULT_BASE_URL, help='OpenAI 兼容接口地址')
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--cache', default=str(CACHE_PATH))
+    parser.add_argument('--concurrency', type=int, default=8, help='初始并发')
+    parser.add_argument('--max-concurrency', type=int, default=16, help='并发上限')
+    parser.add_argument('--rate', type=float, default=5.0, help='每秒请求数上限')
+    parser.add_argument('--workers', type=int, default=None, help='图片预处理进程数')
+    args = parser.parse_args()
+
+    client = ChatModelClient(base_url=args.base_url, model=args.model)
+
+    async def run():
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=args.max_concurrency))
+        return await label_images(
+            client, args.image_dir, args.period, cache_path=args.cache,
+            concurrency=args.concurrency, max_concurrency=args.max_concurrency,
+            rate=args.rate, workers=args.workers,
+            progress=lambda path: print(f'已打标 {path.name}', flush=True),
+        )
+
+    df = asyncio.run(run())
+    df.to_csv(args.output, index=False, encoding=CSV_ENCODING)
+    print(f'共 {len(df)} 张，失败 {df["error"].notna().sum()} 张，写出 {args.output}')
+
+
+if __name__ == '__main__':
+    main()
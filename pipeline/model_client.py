@@ -0,0 +1,172 @@
+"""
+模型 API 调用的公共部件
+
+- ChatModelClient：OpenAI 兼容的 /chat/completions 接口（标准库实现，在线程中执行）
+- TokenBucket：令牌桶限速
+- AdaptiveLimiter：自适应并发（成功逐步加并发，限流/超时减半）
+- call_with_retry：指数退避重试
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+import urllib.error
+import urllib.request
+
+DEFAULT_BASE_URL = os.environ.get('LABELING_API_BASE', 'http://127.0.0.1:8765/v1')
+DEFAULT_MODEL = os.environ.get('LABELING_MODEL', 'stub-model')
+
+
+class ModelAPIError(Exception):
+    """模型接口调用失败
+
+    retryable 表示是否值得重试，throttled 表示是否属于限流/过载（需要降低并发），
+    attempts 为 call_with_retry 放弃前实际尝试的次数。
+    """
+
+    def __init__(self, message, retryable=True, throttled=False):
+        super().__init__(message)
+        self.retryable = retryable
+        self.throttled = throttled
+        self.attempts = 1
+
+
+class ChatModelClient:
+    """OpenAI 兼容的对话接口客户端"""
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, model=DEFAULT_MODEL, api_key=None, timeout=60):
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.api_key = api_key if api_key is not None else os.environ.get('LABELING_API_KEY', '')
+        self.timeout = timeout
+
+    def _post(self, messages):
+        body = json.dumps({
+            'model': self.model,
+            'messages': messages,
+            'temperature': 0,
+        }, ensure_ascii=False).encode('utf-8')
+        request = urllib.request.Request(
+            f'{self.base_url}/chat/completions',
+            data=body,
+            headers={
+                'Content-Type': 'application/json',
+                'Authorization': f'Bearer {self.api_key}',
+            },
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                payload = json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            throttled = e.code == 429 or e.code >= 500
+            raise ModelAPIError(f'HTTP {e.code}', retryable=throttled or e.code == 408,
+                                throttled=throttled) from e
+        except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+            raise ModelAPIError(f'连接失败: {e}', throttled=True) from e
+        try:
+            return payload['choices'][0]['message']['content']
+        except (KeyError, IndexError, TypeError) as e:
+            raise ModelAPIError('响应格式错误', retryable=False) from e
+
+    async def complete(self, messages):
+        """发送对话请求，返回模型回复文本"""
+        return await asyncio.to_thread(self._post, messages)
+
+
+def parse_json_reply(text):
+    """从模型回复中取出 JSON 对象（兼容 ```json 代码块）"""
+    text = text.strip()
+    if text.startswith('```'):
+        text = text.strip('`')
+        if text.startswith('json'):
+            text = text[4:]
+    start, end = text.find('{'), text.rfind('}')
+    if start < 0 or end < start:
+        raise ModelAPIError('回复中没有 JSON', retryable=True)
+    try:
+        return json.loads(text[start:end + 1])
+    except ValueError as e:
+        raise ModelAPIError('回复 JSON 解析失败', retryable=True) from e
+
+
+class TokenBucket:
+    """令牌桶：平均每秒 rate 个请求，允许 burst 个突发"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AdaptiveLimiter:
+    """自适应并发上限（AIMD）
+
+    连续成功 limit 次后上限 +1，遇到限流/过载时上限减半，始终在 [min_limit, max_limit] 之间。
+    """
+
+    def __init__(self, initial, min_limit=1, max_limit=None):
+        self.limit = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit if max_limit is not None else initial * 2
+        self.in_flight = 0
+        self._successes = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            while self.in_flight >= self.limit:
+                await self._condition.wait()
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def record_success(self):
+        self._successes += 1
+        if self._successes >= self.limit and self.limit < self.max_limit:
+            self.limit += 1
+            self._successes = 0
+
+    def record_throttle(self):
+        self.limit = max(self.min_limit, self.limit // 2)
+        self._successes = 0
+
+
+async def call_with_retry(func, limiter, bucket, max_retries=5, backoff_base=1.0, backoff_cap=30.0):
+    """在并发与限速约束下调用 func()，失败时按指数退避（带抖动）重试"""
+    attempt = 0
+    while True:
+        await bucket.acquire()
+        try:
+            async with limiter:
+                result = await func()
+        except ModelAPIError as e:
+            if e.throttled:
+                limiter.record_throttle()
+            attempt += 1
+            if not e.retryable or attempt > max_retries:
+                e.attempts = attempt
+                raise
+            delay = min(backoff_cap, backoff_base * 2 ** (attempt - 1))
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+        else:
+            limiter.record_success()
+            return result
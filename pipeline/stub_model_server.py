@@ -0,0 +1,144 @@
+"""
+本地模拟模型服务（测试用）
+
+实现 OpenAI 兼容的 POST /v1/chat/completions，反馈文本按关键词规则、图片按内容哈希返回确定性的标签，
+可按比例注入 429/500 错误和延迟（或让前几个请求依次返回指定状态码），用于验证并发、限速、重试与断点续跑。
+
+运行：
+    python -m pipeline.stub_model_server --port 8765 --error-rate 0.05
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 按顺序匹配，第一个命中的关键词决定标签
+KEYWORD_LABELS = [
+    (('日语', '韩语', '法语', '语言'), '翻译语言扩展', '学习多语言，拓展翻译范围'),
+    (('收藏', '单词本', '生词'), '单词本收藏', '学习积累，保存生词复习'),
+    (('历史',), '历史记录', '回看以前的翻译结果'),
+    (('读', '发音', '语音', '播放'), '发音不准确', '学习单词发音，辅助记忆'),
+    (('不全', '漏'), '翻译不完整', ''),
+    (('识别', '扫描'), '识别不全', ''),
+    (('卡', '慢'), '速度慢卡顿', ''),
+    (('好用', '很好', '谢谢', '棒'), '满意表扬', ''),
+    (('不准', '错', '不对'), '翻译不准确', ''),
+]
+
+
+def classify(text):
+    """关键词规则打标，返回 (label, scene)"""
+    for keywords, label, scene in KEYWORD_LABELS:
+        if any(keyword in text for keyword in keywords):
+            return label, scene
+    return '无法分类', ''
+
+
+def describe_image(image_url):
+    """多模态请求的确定性回复：按图片数据的哈希在几个典型标注中选一个"""
+    samples = [
+        ('reading_comprehension', 'workbook', 'grade_7_9', 'doing_exercises'),
+        ('reading_passage', 'official_textbook', 'grade_4_6', 'previewing'),
+        ('cloze_test', 'exam_paper', 'grade_7_9', 'reviewing_exam'),
+        ('vocabulary_exercise', 'homework_book', 'grade_4_6', 'doing_homework'),
+    ]
+    content_type, material_source, grade_level, usage_scenario = samples[
+        int(hashlib.md5(image_url.encode()).hexdigest(), 16) % len(samples)]
+    return {
+        'content_type': content_type,
+        'material_source': material_source,
+        'subject': 'english',
+        'grade_level': grade_level,
+        'usage_scenario': usage_scenario,
+        'confidence': 'high',
+        'description': '模拟服务返回的示例标注',
+    }
+
+
+def make_handler(error_rate=0.0, latency=0.0, fail_statuses=()):
+    """fail_statuses 为前几个请求依次返回的错误状态码"""
+    request_count = 0
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            nonlocal request_count
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self._reply(404, {'error': 'not found'})
+                return
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length).decode('utf-8'))
+            with lock:
+                request_count += 1
+                count = request_count
+            if count <= len(fail_statuses):
+                self._reply(fail_statuses[count - 1], {'error': 'injected'})
+                return
+
+            if latency:
+                time.sleep(random.uniform(0, latency))
+            if random.random() < error_rate:
+                self._reply(random.choice([429, 500]), {'error': 'injected'})
+                return
+
+            messages = request.get('messages', [])
+            last = messages[-1]['content'] if messages else ''
+            if isinstance(last, list):
+                # 多模态请求：content 为分段列表，其中包含图片
+                image_url = next((part['image_url']['url'] for part in last
+                                  if part.get('type') == 'image_url'), '')
+                reply = describe_image(image_url)
+            else:
+                label, scene = classify(last.rsplit('反馈内容：', 1)[-1])
+                reply = {'label': label, 'scene': scene}
+
+            self._reply(200, {
+                'id': f'stub-{count}',
+                'object': 'chat.completion',
+                'model': request.get('model', 'stub-model'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': json.dumps(reply, ensure_ascii=False)},
+                    'finish_reason': 'stop',
+                }],
+            })
+
+    return Handler
+
+
+def start_server(host='127.0.0.1', port=0, error_rate=0.0, latency=0.0, fail_statuses=()):
+    """在后台线程中启动服务，返回 (server, base_url)；port=0 时自动分配端口"""
+    server = ThreadingHTTPServer((host, port), make_handler(error_rate, latency, fail_statuses))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    return server, f'http://{host}:{port}/v1'
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='本地模拟模型服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='注入 429/500 的比例')
+    parser.add_argument('--latency', type=float, default=0.0, help='最大随机延迟（秒）')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.error_rate, args.latency))
+    print(f'stub model server on http://{args.host}:{args.port}/v1')
+    server.serve_forever()
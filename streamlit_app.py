@@ -3,15 +3,25 @@
 """
 
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from pathlib import Path
-import os
+
+from utils.activity_index import ActivityIndex
+from utils.data_store import USAGE_EVENTS_PATH
+from utils.exports import dataset_version
+from utils.html_table import render_table
+from utils.lazy_imports import lazy_import
+from utils.profiling import debug_panel, finish_run, mark, record_error, start_run
+from utils.retention import compute_usage_table, event_date_range, load_events
+from utils.snapshot import load_snapshot as build_or_load_snapshot, snapshot_version, usage_aggregates
+
+# plotly 用到时才导入
+go = lazy_import('plotly.graph_objects')
 
 # 获取当前文件所在目录
 BASE_DIR = Path(__file__).parent
 
+start_run('streamlit_app.py')
+
 # 页面配置
 st.set_page_config(
     page_title="使用频次与留存分析",
@@ -20,85 +30,88 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# 读取数据
+# 读取数据（构建阶段预先聚合好的快照，见 utils/snapshot.py），version 随快照及源文件变化
+@st.cache_data(max_entries=1)
+def load_snapshot(version):
+    return build_or_load_snapshot()
+
+# 有使用日志时按所选时间窗口重新计算（见 utils/retention.py），version 随日志文件变化
+@st.cache_data
+def load_event_range(version):
+    return event_date_range(load_events(USAGE_EVENTS_PATH, columns=['event_date']))
+
+@st.cache_data
+def load_usage_for_window(start, end, version):
+    return usage_aggregates(compute_usage_table(load_events(USAGE_EVENTS_PATH), start, end))
+
+# 工作日 / 周末次留（version 随索引文件变化）
 @st.cache_data
-def load_data():
-    # 使用绝对路径（基于当前文件位置）
-    data_path = BASE_DIR / "data" / "使用频次与留存" / "new拍照翻译)使用次数摸排.csv"
-    df = pd.read_csv(data_path, encoding='utf-8-sig')
-    return df
+def load_weekday_weekend_retention(version):
+    return ActivityIndex.open().summary(1)
+
+def format_day(day, with_year=True):
+    return f"{day.year}年{day.month}月{day.day}日" if with_year else f"{day.month}月{day.day}日"
 
 try:
-    df = load_data()
+    snapshot = load_snapshot(snapshot_version())
+    mark('数据加载', 'load')
     
     # ===== 1. 关键数据概览和表格 =====
-    # 提取关键数据行
-    key_rows_all = df[df['app活跃天数分层'] == '合计'].iloc[:8].copy()
-    
-    # 调整顺序：按天数排序，合计放最后
-    order_map = {
-        '合计': 0,
-        '使用1天': 1,
-        '使用2天': 2,
-        '使用3天': 3,
-        '使用4-5天': 4,
-        '使用6-10天': 5,
-        '使用10天以上': 6
-    }
-    key_rows_all['sort_order'] = key_rows_all['翻译使用天数分层'].map(order_map)
-    key_rows_sorted = key_rows_all.sort_values('sort_order')
-    
-    # 将使用1天的次留和七留改为0
-    key_rows_sorted.loc[key_rows_sorted['翻译使用天数分层'] == '使用1天', '平均功能次留率'] = '0%'
-    key_rows_sorted.loc[key_rows_sorted['翻译使用天数分层'] == '使用1天', '平均功能七留率'] = '0%'
-    
-    # 准备显示的数据
-    display_data = key_rows_sorted[['翻译使用天数分层', '翻译uv', '占比', '平均功能次留率', 
-                                     '平均功能七留率', '平均使用间隔(天)(剔除1次的)', '日人均翻译张数']].copy()
-    
-    # 重命名列
-    display_data.rename(columns={'平均使用间隔(天)(剔除1次的)': '平均使用间隔(天)'}, inplace=True)
-    
-    # 将合计行移到最后
-    summary_row = display_data[display_data['翻译使用天数分层'] == '合计']
-    other_rows = display_data[display_data['翻译使用天数分层'] != '合计']
-    display_data = pd.concat([other_rows, summary_row])
+    usage = snapshot['usage']
+    period_text = "2025年10月1日至11月30日"
+    period_short = "10月1日至11月30日"
+    if USAGE_EVENTS_PATH.exists():
+        events_version = dataset_version(USAGE_EVENTS_PATH)
+        first_day, last_day = load_event_range(events_version)
+        window = st.sidebar.date_input("统计时间窗口", value=(first_day, last_day),
+                                       min_value=first_day, max_value=last_day)
+        if len(window) == 2:
+            start, end = window
+            usage = load_usage_for_window(str(start), str(end), events_version)
+            period_text = f"{format_day(start)}至{format_day(end, with_year=start.year != end.year)}"
+            period_short = f"{format_day(start, with_year=False)}至{format_day(end, with_year=False)}"
+        mark('使用数据聚合', 'aggregate')
+    # 关键数据行（已按天数排序，合计在最后），按列存储
+    display_data = usage['table']
     
     # 显示表格，使用HTML实现居中
     st.markdown("##### 📋 拍照翻译功能使用数据")
     
     # 添加统计说明
-    st.markdown("""
+    st.markdown(f"""
     <div style="color: #666; font-size: 0.85rem; line-height: 1.6; margin: 12px 0 20px 0;">
         <strong>统计范围</strong><br>
-        时间：2025年10月1日至11月30日<br>
+        时间：{period_text}<br>
         用户范围：在此期间使用过拍照翻译功能的所有用户<br>
         异常值处理：去除单日使用超过50次的用户、去除单次会话翻译超过30张的用户<br><br>
         <strong>口径定义</strong><br>
-        使用次数：用户在10月1日至11月30日使用拍照翻译功能的天数（去重计算）。<br>
+        使用次数：用户在{period_short}使用拍照翻译功能的天数（去重计算）。<br>
         日均翻译张数：用户平均每天翻译的图片数量。
     </div>
     """, unsafe_allow_html=True)
     
-    # 使用HTML表格实现居中对齐和固定列宽
-    col_widths = ['14%', '12%', '10%', '12%', '12%', '15%', '13%']
-    html_table = '<table style="width:100%; border-collapse: collapse; text-align: center; table-layout: fixed;">'
-    html_table += '<thead><tr style="background-color: #f0f2f6;">'
-    for i, col in enumerate(display_data.columns):
-        html_table += f'<th style="padding: 12px; border: 1px solid #ddd; width: {col_widths[i]};">{col}</th>'
-    html_table += '</tr></thead><tbody>'
-    
-    for idx, row in display_data.iterrows():
-        if row['翻译使用天数分层'] == '合计':
-            html_table += '<tr style="background-color: #e8f4f8; font-weight: 600;">'
-        else:
-            html_table += '<tr>'
-        for col in display_data.columns:
-            html_table += f'<td style="padding: 10px; border: 1px solid #ddd;">{row[col]}</td>'
-        html_table += '</tr>'
-    
-    html_table += '</tbody></table>'
+    # 使用HTML表格实现居中对齐和固定列宽，合计行高亮
+    html_table = render_table(
+        display_data,
+        widths=['14%', '12%', '10%', '12%', '12%', '15%', '13%'],
+        highlight={'column': '翻译使用天数分层', 'value': '合计',
+                   'style': 'background-color: #e8f4f8; font-weight: 600;'}
+    )
     st.markdown(html_table, unsafe_allow_html=True)
+    mark('使用数据表', 'render')
+
+    # 工作日 vs 周末次留（有活跃位图索引时显示，见 utils/activity_index.py）
+    if ActivityIndex.exists():
+        retention_split = load_weekday_weekend_retention(ActivityIndex.open().version())
+        st.markdown("##### 📅 工作日 vs 周末次留")
+        col_weekday, col_weekend, col_gap = st.columns(3)
+        col_weekday.metric("工作日平均次留", f"{retention_split['weekday']:.2%}",
+                           f"标准差 {retention_split['weekday_std']:.2%}", delta_color="off")
+        col_weekend.metric("周末平均次留", f"{retention_split['weekend']:.2%}",
+                           f"标准差 {retention_split['weekend_std']:.2%}", delta_color="off")
+        col_gap.metric("工作日 - 周末",
+                       f"{(retention_split['weekday'] - retention_split['weekend']) * 100:+.2f}pp")
+        mark('工作日周末留存', 'load')
     
     # ===== 2. 核心发现（左侧文字+右侧图表）=====
     st.markdown("")
@@ -133,13 +146,12 @@ try:
     
     with col_chart1:
         # 准备数据
-        usage_data = df[df['app活跃天数分层'] == '合计'].iloc[1:8].copy()
-        usage_data = usage_data[usage_data['翻译使用天数分层'] != '合计']
+        usage_data = usage['distribution']
         
         # 创建饼图
         fig1 = go.Figure(data=[go.Pie(
-            labels=usage_data['翻译使用天数分层'],
-            values=usage_data['翻译uv'],
+            labels=usage_data['labels'],
+            values=usage_data['values'],
             hole=0.4,
             marker=dict(colors=['#95a5a6', '#7f8c8d', '#b8c5d6', '#9db4c8', '#7fa5a4', '#6c9a8b']),
             textinfo='label+percent',
@@ -159,7 +171,9 @@ try:
             )]
         )
         
+        mark('发现1：使用天数分层', 'figure')
         st.plotly_chart(fig1, use_container_width=True)
+    mark('发现1：使用天数分层', 'render')
     
     # 发现2: 平均使用间隔 + 柱状图
     st.markdown("<div style='margin: 30px 0;'></div>", unsafe_allow_html=True)
@@ -225,7 +239,9 @@ try:
             yaxis=dict(range=[0, 10])
         )
         
+        mark('发现2：平均使用间隔', 'figure')
         st.plotly_chart(fig2, use_container_width=True)
+    mark('发现2：平均使用间隔', 'render')
     
     # 发现3: 次留率与七留率 + 对比图
     st.markdown("<div style='margin: 30px 0;'></div>", unsafe_allow_html=True)
@@ -295,7 +311,9 @@ try:
             yaxis=dict(range=[0, 40])
         )
         
+        mark('发现3：次留率与七留率', 'figure')
         st.plotly_chart(fig3, use_container_width=True)
+    mark('发现3：次留率与七留率', 'render')
     
     # 发现4: 日均翻译张数 + 折线图
     st.markdown("<div style='margin: 30px 0;'></div>", unsafe_allow_html=True)
@@ -355,8 +373,15 @@ try:
             yaxis=dict(range=[0, 4])
         )
         
+        mark('发现4：日均翻译张数', 'figure')
         st.plotly_chart(fig4, use_container_width=True)
+    mark('发现4：日均翻译张数', 'render')
 
 except Exception as e:
+    record_error(e)
     st.error(f"数据加载失败: {str(e)}")
     st.info("请确保数据文件路径正确")
+
+
+# 本次执行的段落耗时写到指标文件（见 utils/profiling.py）；?debug=1 时侧边栏显示最慢的段落
+debug_panel(finish_run())
@@ -0,0 +1,60 @@
+"""活跃位图索引：留存与逐行计算一致，重建不影响已打开的索引，读取时不写文件"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.activity_index import ActivityIndex, build_index
+from utils.retention import COUNT_COLUMN, DATE_COLUMN, USER_COLUMN
+
+
+def _events(seed, n_users=300, n_days=20):
+    rng = np.random.default_rng(seed)
+    rows = [(user, day, int(rng.integers(0, 3)))
+            for user in range(n_users) for day in range(n_days) if rng.random() < 0.3]
+    events = pd.DataFrame(rows, columns=[USER_COLUMN, 'day', COUNT_COLUMN])
+    events[DATE_COLUMN] = pd.Timestamp('2025-10-01') + pd.to_timedelta(events.pop('day'), unit='D')
+    return events
+
+
+def _expected_retention(events, k, new_only=False):
+    used = events[events[COUNT_COLUMN] > 0]
+    days = used.groupby(DATE_COLUMN)[USER_COLUMN].apply(set)
+    dates = pd.date_range(events[DATE_COLUMN].min(), events[DATE_COLUMN].max())
+    days = days.reindex(dates, fill_value=set())
+    seen, rates = set(), []
+    for i, date in enumerate(dates):
+        base = days[date] - seen if new_only else days[date]
+        seen |= days[date]
+        if i + k < len(dates) and base:
+            rates.append(len(base & days[dates[i + k]]) / len(base))
+        else:
+            rates.append(np.nan)
+    return np.array(rates)
+
+
+@pytest.mark.parametrize('k', [1, 7])
+def test_retention_matches_rows(tmp_path, k):
+    events = _events(0)
+    index = ActivityIndex.open(build_index(events, tmp_path))
+    np.testing.assert_allclose(index.retention(k), _expected_retention(events, k))
+    np.testing.assert_allclose(index.retention(k, cohort=index.new_users), _expected_retention(events, k, True))
+
+
+def test_rebuild_keeps_open_index(tmp_path):
+    events = _events(0)
+    index = ActivityIndex.open(build_index(events, tmp_path))
+    before = index.retention(1)
+    # 重建时替换文件，已内存映射的旧位图内容不变
+    build_index(_events(1), tmp_path)
+    np.testing.assert_allclose(index.retention(1), before)
+    assert not list(tmp_path.glob('*.tmp*'))
+
+
+def test_missing_cohort_is_not_rebuilt_on_read(tmp_path):
+    index = ActivityIndex.open(build_index(_events(0), tmp_path))
+    (tmp_path / 'new.npy').unlink()
+    assert not ActivityIndex.exists(tmp_path)
+    with pytest.raises(FileNotFoundError):
+        index.new_users()
+    assert not (tmp_path / 'new.npy').exists()
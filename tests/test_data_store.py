@@ -0,0 +1,126 @@
+"""追加导入：续算的指纹与同步追加的 Parquet 与整体重新计算的结果一致"""
+
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from utils import data_store
+from utils.data_store import (
+    CSV_ENCODING, WEEKDAY_LABELS_PATH, append_csv, convert_csv, extend_fingerprint, file_fingerprint,
+    fingerprint_matches, is_fresh, iter_chunks, parquet_path_for, read_dataset,
+)
+
+
+def _comparable(fingerprint):
+    return [{key: value for key, value in part.items() if key not in ('mtime_ns', 'ctime_ns')} for part in fingerprint['parts']]
+
+
+@pytest.mark.parametrize('appended', [1, 100, 4096, 10_000])
+def test_extend_fingerprint(tmp_path, monkeypatch, appended):
+    monkeypatch.setattr(data_store, 'HASH_BLOCK', 4096)
+    path = tmp_path / 'data.csv'
+    path.write_bytes(b'x' * 10_000)
+    fingerprint = file_fingerprint(path)
+    with open(path, 'ab') as f:
+        f.write(b'y' * appended)
+    assert not fingerprint_matches(path, fingerprint)
+    extended = extend_fingerprint(path, fingerprint)
+    assert _comparable(extended) == _comparable(file_fingerprint(path))
+    assert fingerprint_matches(path, extended)
+
+
+def test_rewrite_with_same_size_and_mtime_does_not_match(tmp_path):
+    path = tmp_path / 'data.csv'
+    path.write_bytes(b'a,b\n1,2\n')
+    fingerprint = file_fingerprint(path)
+    stat = path.stat()
+    # 改写内容并还原大小与修改时间
+    path.write_bytes(b'a,b\n3,4\n')
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert path.stat().st_size == fingerprint['parts'][0]['size']
+    assert path.stat().st_mtime_ns == fingerprint['parts'][0]['mtime_ns']
+    assert not fingerprint_matches(path, fingerprint)
+
+
+def test_unchanged_content_matches_after_touch(tmp_path):
+    path = tmp_path / 'data.csv'
+    path.write_bytes(b'a,b\n1,2\n')
+    fingerprint = file_fingerprint(path)
+    os.utime(path, ns=(0, 0))
+    assert fingerprint_matches(path, fingerprint)
+
+
+@pytest.fixture
+def labels_csv(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_store, 'DATA_DIR', tmp_path / 'data')
+    monkeypatch.setattr(data_store, 'PARQUET_DIR', tmp_path / 'data' / '.parquet')
+    path = tmp_path / 'data' / WEEKDAY_LABELS_PATH.name
+    path.parent.mkdir()
+    shutil.copy(WEEKDAY_LABELS_PATH, path)
+    return path
+
+
+def test_append_csv_updates_parquet(labels_csv):
+    convert_csv(labels_csv)
+    parquet_path = parquet_path_for(labels_csv)
+    base = parquet_path.read_bytes()
+    rows = pd.read_csv(WEEKDAY_LABELS_PATH, encoding=CSV_ENCODING).tail(20)
+    append_csv(labels_csv, rows.assign(content_type='new_type', labeled_at='2030-01-01T00:00:00'))
+    append_csv(labels_csv, rows.assign(description=None, labeled_at='2030-01-02T00:00:00'))
+    # 新行写成分片，已有的 Parquet 不重写
+    assert parquet_path.read_bytes() == base
+    assert len(data_store._parquet_files(parquet_path)) == 3
+    assert is_fresh(labels_csv)
+    appended = read_dataset(labels_csv)
+    chunks = pd.concat(iter_chunks(labels_csv, chunksize=50), ignore_index=True)
+    source = data_store._read_source(data_store._parquet_files(parquet_path)[-1])
+
+    convert_csv(labels_csv, force=True)
+    assert data_store._parquet_files(parquet_path) == [parquet_path]
+    pd.testing.assert_frame_equal(appended, read_dataset(labels_csv))
+    pd.testing.assert_frame_equal(chunks.astype(appended.dtypes.to_dict()), appended)
+    assert source['digest'] == data_store._read_source(parquet_path)['digest']
+
+
+def test_append_csv_merges_parts(labels_csv, monkeypatch):
+    monkeypatch.setattr(data_store, 'MAX_PARTS', 2)
+    convert_csv(labels_csv)
+    rows = pd.read_csv(WEEKDAY_LABELS_PATH, encoding=CSV_ENCODING).tail(5)
+    for day in range(1, 6):
+        append_csv(labels_csv, rows.assign(labeled_at=f'2030-01-0{day}T00:00:00'))
+    assert len(data_store._parquet_files(parquet_path_for(labels_csv))) <= 3
+    assert is_fresh(labels_csv)
+    appended = read_dataset(labels_csv)
+    convert_csv(labels_csv, force=True)
+    pd.testing.assert_frame_equal(appended, read_dataset(labels_csv))
+
+
+def test_append_csv_rejects_missing_columns(labels_csv):
+    rows = pd.read_csv(WEEKDAY_LABELS_PATH, encoding=CSV_ENCODING).tail(1).drop(columns=['content_type'])
+    with pytest.raises(ValueError):
+        append_csv(labels_csv, rows)
+
+
+def test_append_csv_validates_before_writing(labels_csv):
+    # 解析失败（时间列不是日期）时 CSV 保持原样
+    before = labels_csv.read_bytes()
+    rows = pd.read_csv(WEEKDAY_LABELS_PATH, encoding=CSV_ENCODING).tail(1).assign(labeled_at='不是时间')
+    with pytest.raises(ValueError):
+        append_csv(labels_csv, rows)
+    assert labels_csv.read_bytes() == before
+
+
+def test_is_fresh_touches_parquet_after_digest_match(labels_csv, monkeypatch):
+    convert_csv(labels_csv)
+    parquet_path = parquet_path_for(labels_csv)
+    # 模拟重新检出：CSV 内容不变，修改时间晚于 Parquet
+    stat = labels_csv.stat()
+    os.utime(parquet_path, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10 ** 10))
+    calls = []
+    file_part = data_store._file_part
+    monkeypatch.setattr(data_store, '_file_part', lambda *args: calls.append(args) or file_part(*args))
+    assert is_fresh(labels_csv)
+    assert is_fresh(labels_csv)
+    assert len(calls) == 1
@@ -0,0 +1,58 @@
+"""垃圾内容规则：正常反馈末尾的表情、填充和乱打不应使整条反馈被判为垃圾内容"""
+
+import pytest
+
+from pipeline.feedback_dedupe import collapse_filler, dedupe_feedback, spam_reason
+from utils.data_store import FEEDBACK_LABELED_PATH, read_dataset
+
+# 取自已打标反馈，模型给出了具体的问题标签
+REAL_FEEDBACK = [
+    '他不仅分译不准确，还把我发的那个图给截了！' + '🤬' * 89,
+    '以后能识别手写体就好了。\n请改进。\n懂没懂。' + '🥹' * 67,
+    '不合格，不按照要求，没有翻译，没有翻译成中文，再也不拍，差评，不把我们放在眼里澎湖湾tgvhvvhvvxhxigcfc'
+    '一天又一天唱歌v唱个歌v好习惯不吃，好v次成功好吃吃吃饭VC接触过好吃不GIFv解封估计不会结婚好几百个观察观察'
+    '咕咕咕i功夫u富贵花v何v吃v发发发官方v吃v公交车给v小姐姐好v拒绝超级超级超级超级超级超级刚接了个警察局',
+    '它字写错了.写成这个他了！' + '🤬' * 4 + '😤' * 5 + '😒' * 4 + '🤬' * 80,
+    '可以翻译一些文言文，然后， 可以用语音，语音中的中文翻译成英文。谢谢。' + '❤' * 150,
+    '没有中文' + '1' * 180,
+    '我要翻译的是诗句的意思并不是翻译成英语。' + ' ' * 200,
+    '把单词的意思也翻译出来。好不好？' + '好不好？' * 25 + '1' * 37,
+    '读的太快了读的太快了，读的太快了，读的太快了读的太快了，读的太快了，读的太快了读的太快了，读的太快了，',
+    'I don’t know if I can get a hold of you but I have a question for you about the car that I have for you '
+    'and I need to know if you have a car that you can borrow from me and I can borrow it for you and',
+    '卡' * 30,
+]
+
+SPAM = [
+    ('', '空内容'),
+    ('6' * 40, '单字重复'),
+    ('🤬' * 20, '单字重复'),
+    ('用人单位喜欢一败涂地特该吃吃仍然v人深V吃果然，大V赘婿vv放大在v徐达吃大V吃滚犊子食发鬼不超过滚蛋吧是尴尬办法不搭噶',
+     '键盘乱打'),
+    ('点击[http://pinyin.cn/e499228]查看表情', '链接/口令'),
+]
+
+
+@pytest.mark.parametrize('text', REAL_FEEDBACK)
+def test_real_feedback_is_not_spam(text):
+    assert spam_reason(text) == ''
+
+
+@pytest.mark.parametrize('text, reason', SPAM)
+def test_spam(text, reason):
+    assert spam_reason(text) == reason
+
+
+def test_collapse_filler():
+    assert collapse_filler('好评😀😀😀，非常非常非常好用！！！') == '好评，非常好用！'
+
+
+def test_near_duplicates_share_labels():
+    # 逐条打标的样本上，簇内各行与代表行的模型标签应基本一致（其余差异来自模型对同一内容的波动）
+    mapping = dedupe_feedback()
+    duplicates = mapping[mapping['feedback_id'] != mapping['canonical_id']]
+    labeled = read_dataset(FEEDBACK_LABELED_PATH, columns=['feedback_id', 'label'])
+    labels = dict(zip(labeled['feedback_id'], labeled['label']))
+    agree = duplicates['feedback_id'].map(labels) == duplicates['canonical_id'].map(labels)
+    assert len(duplicates) > 50
+    assert agree.mean() >= 0.95
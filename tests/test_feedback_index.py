@@ -0,0 +1,83 @@
+"""反馈倒排索引：组合筛选与逐行比较一致，索引随源文件变化重建"""
+
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import feedback_index
+from utils.data_store import CSV_ENCODING, FEEDBACK_LABELED_PATH, read_dataset
+from utils.feedback_index import INDEX_COLUMNS, MISSING_VALUE, SOURCE_COLUMNS, FeedbackIndex, load_or_build
+
+
+@pytest.fixture(scope='module')
+def frame():
+    return read_dataset(FEEDBACK_LABELED_PATH, columns=SOURCE_COLUMNS)
+
+
+@pytest.fixture(scope='module')
+def index(frame):
+    return FeedbackIndex.build(frame)
+
+
+def _expected(frame, filters):
+    dates = frame['feedback_date'].astype('string')
+    columns = {'feedback_month': dates.str[:7], 'feedback_day': dates.str[:10]}
+    hit = np.ones(len(frame), dtype=bool)
+    for column, values in filters.items():
+        if values:
+            series = columns[column] if column in columns else frame[column].astype('string')
+            hit &= series.fillna(MISSING_VALUE).isin(values).to_numpy()
+    return np.flatnonzero(hit)
+
+
+def test_value_counts_match_frame(frame, index):
+    labels = frame['label'].astype('string').fillna(MISSING_VALUE)
+    assert index.value_counts('label') == labels.value_counts().to_dict()
+    counts = list(index.value_counts('brand').values())
+    assert counts == sorted(counts, reverse=True)
+    assert sum(counts) == len(frame)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_query_matches_rows(frame, index, seed):
+    rng = np.random.default_rng(seed)
+    filters = {}
+    for column in rng.choice(INDEX_COLUMNS, size=3, replace=False):
+        values = index.values(column)
+        filters[column] = list(rng.choice(values, size=min(len(values), int(rng.integers(0, 4)) * 3), replace=False))
+    expected = _expected(frame, filters)
+    np.testing.assert_array_equal(index.query(filters), expected)
+    assert index.count(filters) == len(expected)
+
+
+def test_query_edge_cases(frame, index):
+    np.testing.assert_array_equal(index.query({}), np.arange(len(frame)))
+    assert index.count({'brand': []}) == len(frame)
+    assert index.count({'brand': ['不存在的品牌']}) == 0
+    # 缺失值作为单独的取值参与筛选
+    assert index.count({'version': [MISSING_VALUE]}) == frame['version'].isna().sum()
+
+
+def test_load_or_build(tmp_path, monkeypatch, frame):
+    monkeypatch.setattr(feedback_index, 'INDEX_DIR', tmp_path / 'index')
+    csv_path = tmp_path / FEEDBACK_LABELED_PATH.name
+    shutil.copy(FEEDBACK_LABELED_PATH, csv_path)
+    built = load_or_build(csv_path)
+    assert feedback_index.index_path_for(csv_path).exists()
+    assert not list((tmp_path / 'index').glob('*.tmp*'))
+
+    # 源文件未变化时直接读取已保存的索引
+    build = FeedbackIndex.build
+    monkeypatch.setattr(FeedbackIndex, 'build', None)
+    loaded = load_or_build(csv_path)
+    filters = {'label': built.values('label')[:2], 'feedback_month': built.values('feedback_month')[:1]}
+    np.testing.assert_array_equal(loaded.query(filters), built.query(filters))
+    assert loaded.values('brand') == built.values('brand')
+
+    # 源文件变化时重建
+    monkeypatch.setattr(FeedbackIndex, 'build', build)
+    rows = pd.read_csv(csv_path, encoding=CSV_ENCODING).head(3)
+    rows.to_csv(csv_path, mode='a', header=False, index=False, encoding='utf-8')
+    assert load_or_build(csv_path).n_rows == len(frame) + 3
@@ -0,0 +1,194 @@
+"""打标流程：对模拟服务打标、中断后续跑、限流重试与并发回退，去重映射补全标签库"""
+
+import asyncio
+import functools
+
+import pandas as pd
+import pytest
+
+from pipeline import feedback_labeling
+from pipeline.feedback_dedupe import dedupe_feedback
+from pipeline.feedback_labeling import apply_dedupe, label_feedback, label_one
+from pipeline.model_client import AdaptiveLimiter, ChatModelClient, ModelAPIError, TokenBucket, call_with_retry
+from pipeline.stub_model_server import classify, start_server
+from utils.data_store import CSV_ENCODING, FEEDBACK_LABELED_PATH, FEEDBACK_SAMPLE_PATH
+from utils.feedback_labels import LABELING_LABELS, UNCLASSIFIED_LABEL
+from utils.label_store import LabelStore, import_labeled
+
+SOURCE_ROWS = 60
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    path = tmp_path / '反馈标签.sqlite'
+    import_labeled(FEEDBACK_LABELED_PATH, path)
+    return path
+
+
+@pytest.fixture
+def stub():
+    """启动模拟服务，返回其地址；用例结束时关闭"""
+    servers = []
+
+    def start(**kwargs):
+        server, base_url = start_server(**kwargs)
+        servers.append(server)
+        return base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def source_path(tmp_path):
+    path = tmp_path / 'feedback.csv'
+    pd.read_csv(FEEDBACK_SAMPLE_PATH, encoding=CSV_ENCODING, nrows=SOURCE_ROWS).to_csv(
+        path, index=False, encoding=CSV_ENCODING)
+    return path
+
+
+@pytest.fixture
+def fast_retry(monkeypatch):
+    # 退避时间缩短到毫秒级，重试次数与并发调整不变
+    monkeypatch.setattr(feedback_labeling, 'call_with_retry', functools.partial(call_with_retry, backoff_base=0.001))
+
+
+def _labels(store_path):
+    with LabelStore(store_path) as store:
+        frame = store.frame()
+    return dict(zip(frame['feedback_id'], frame['label']))
+
+
+def _expected(source_path):
+    frame = pd.read_csv(source_path, encoding=CSV_ENCODING)
+    labels = {}
+    for feedback_id, content in zip(frame['feedback_id'], frame['feedback_content']):
+        label = classify(content)[0] if isinstance(content, str) and content.strip() else UNCLASSIFIED_LABEL
+        labels[feedback_id] = label if label in LABELING_LABELS else UNCLASSIFIED_LABEL
+    return labels
+
+
+def _label(client, store_path, source_path, **kwargs):
+    kwargs = {'concurrency': 4, 'rate': 1000.0, **kwargs}
+    return asyncio.run(label_feedback(client, source_path=source_path, store_path=store_path, **kwargs))
+
+
+def test_labels_match_stub(stub, source_path, tmp_path, fast_retry):
+    # 随机注入的 429/500 经重试后全部成功
+    client = ChatModelClient(stub(error_rate=0.2))
+    store_path = tmp_path / 'labels.sqlite'
+    assert _label(client, store_path, source_path, max_retries=10) == SOURCE_ROWS
+    assert _labels(store_path) == _expected(source_path)
+    with LabelStore(store_path) as store:
+        assert store.stats()['failed'] == 0
+    # 已全部打标，再次运行不发请求
+    assert _label(client, store_path, source_path) == 0
+
+
+def test_resume_after_interrupt(stub, source_path, tmp_path):
+    client = ChatModelClient(stub(latency=0.01))
+    store_path = tmp_path / 'labels.sqlite'
+
+    async def interrupted():
+        enough = asyncio.Event()
+        task = asyncio.create_task(label_feedback(
+            client, source_path=source_path, store_path=store_path, concurrency=4, rate=1000.0,
+            progress=lambda count, limit: count >= 20 and enough.set()))
+        await enough.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(interrupted())
+    done = _labels(store_path)
+    assert 20 <= len(done) < SOURCE_ROWS
+    # 续跑只处理剩下的行，结果与一次跑完相同
+    assert _label(client, store_path, source_path) == SOURCE_ROWS - len(done)
+    assert _labels(store_path) == _expected(source_path)
+
+    # 内容变化的行重新打标
+    frame = pd.read_csv(source_path, encoding=CSV_ENCODING)
+    frame.loc[0, 'feedback_content'] = '希望能翻译日语'
+    frame.to_csv(source_path, index=False, encoding=CSV_ENCODING)
+    assert _label(client, store_path, source_path) == 1
+    assert _labels(store_path)[frame.loc[0, 'feedback_id']] == '翻译语言扩展'
+
+
+def test_throttling_halves_concurrency(stub, source_path, tmp_path, fast_retry):
+    client = ChatModelClient(stub(fail_statuses=(429, 500, 503)))
+    store_path = tmp_path / 'labels.sqlite'
+    limits = []
+    _label(client, store_path, source_path, concurrency=8, progress=lambda count, limit: limits.append(limit))
+    # 三次限流/过载把并发从 8 减到 1（首条结果写入前可能已回升一次），之后随成功逐步回升
+    assert min(limits) <= 2
+    assert limits[-1] > min(limits)
+    assert _labels(store_path) == _expected(source_path)
+
+
+@pytest.mark.parametrize('status', [429, 500, 503])
+def test_retry_on_throttle(stub, status):
+    client = ChatModelClient(stub(fail_statuses=(status, status)))
+    limiter, attempts = AdaptiveLimiter(8), []
+
+    async def request():
+        attempts.append(1)
+        return await client.complete([{'role': 'user', 'content': '反馈内容：很好用'}])
+
+    reply = asyncio.run(call_with_retry(request, limiter, TokenBucket(1000.0), backoff_base=0.001))
+    assert '满意表扬' in reply
+    assert len(attempts) == 3
+    assert limiter.limit == 2
+
+
+def test_client_error_is_not_retried(stub):
+    client = ChatModelClient(stub(fail_statuses=(400,)))
+    limiter = AdaptiveLimiter(8)
+    with pytest.raises(ModelAPIError) as info:
+        asyncio.run(call_with_retry(lambda: client.complete([]), limiter, TokenBucket(1000.0), backoff_base=0.001))
+    assert info.value.attempts == 1
+    assert not info.value.retryable
+    assert limiter.limit == 8
+
+
+def test_exhausted_retries_are_recorded(stub, fast_retry):
+    client = ChatModelClient(stub(fail_statuses=(503,) * 3))
+    result = asyncio.run(label_one(client, AdaptiveLimiter(4), TokenBucket(1000.0), '很好用', max_retries=2))
+    assert result == {'label': None, 'scene': '', 'api_success': False, 'api_error': 'HTTP 503'}
+    # 失败的结果不算已打标，下一次仍会请求
+    result = asyncio.run(label_one(client, AdaptiveLimiter(4), TokenBucket(1000.0), '很好用', max_retries=2))
+    assert result['api_success'] and result['label'] == '满意表扬'
+
+
+def test_limiter_grows_after_successes():
+    limiter = AdaptiveLimiter(2, max_limit=3)
+    for _ in range(2):
+        limiter.record_success()
+    assert limiter.limit == 3
+    for _ in range(10):
+        limiter.record_success()
+    assert limiter.limit == 3
+    limiter.record_throttle()
+    limiter.record_throttle()
+    assert limiter.limit == 1
+    limiter.record_throttle()
+    assert limiter.limit == 1
+
+
+def test_spam_follows_model_labels(store_path):
+    frame = dedupe_feedback()
+    mapping = dict(zip(frame['feedback_id'], zip(frame['canonical_id'], frame['spam_reason'])))
+    spam = frame.loc[frame['spam_reason'] != '', 'feedback_id'].tolist()
+    kept, removed = spam[::2], spam[1::2]
+    with LabelStore(store_path) as store, store.connection:
+        store.connection.executemany('DELETE FROM labels WHERE feedback_id = ?', [(int(i),) for i in removed])
+    before = _labels(store_path)
+
+    apply_dedupe(mapping, store_path=store_path)
+
+    after = _labels(store_path)
+    kept_labels = [before[i] for i in kept]
+    majority = max(set(kept_labels), key=kept_labels.count)
+    assert [after[i] for i in kept] == kept_labels
+    assert {after[i] for i in removed} == {majority}
@@ -0,0 +1,77 @@
+"""标签 × 天矩阵：编码可还原，周、月汇总与 pandas 重采样一致"""
+
+from collections import Counter
+
+import pandas as pd
+import pytest
+
+from utils.data_store import FEEDBACK_LABELED_PATH, read_dataset
+from utils.feedback_labels import LABEL_GROUPS, label_group
+from utils.feedback_rollup import FREQUENCIES, LabelCube, decode_cube, encode_cube
+
+RESAMPLE_RULES = {'day': 'D', 'week': 'W-MON', 'month': 'MS'}
+
+
+@pytest.fixture(scope='module')
+def frame():
+    frame = read_dataset(FEEDBACK_LABELED_PATH, columns=['label', 'feedback_date'])
+    return frame.assign(day=frame['feedback_date'].astype('string').str[:10]).dropna(subset=['label'])
+
+
+@pytest.fixture(scope='module')
+def counts(frame):
+    return Counter(zip(frame['label'], frame['day']))
+
+
+def _daily(frame):
+    daily = pd.crosstab(pd.to_datetime(frame['day']), frame['label'].astype(str))
+    return daily.reindex(pd.date_range(daily.index.min(), daily.index.max()), fill_value=0)
+
+
+def test_encode_round_trip(counts):
+    cube = encode_cube(counts)
+    assert decode_cube(cube) == counts
+    totals = [sum(row) for row in cube['counts']]
+    assert totals == sorted(totals, reverse=True)
+    assert cube['start'] == min(day for _label, day in counts)
+
+
+@pytest.mark.parametrize('freq', list(FREQUENCIES))
+def test_rollup_matches_resample(frame, counts, freq):
+    rollup = LabelCube(encode_cube(counts)).rollup(freq)
+    daily = _daily(frame)
+    # 周从周一开始：W-MON 按左闭区间、左端点标注
+    expected = daily.resample(RESAMPLE_RULES[freq], closed='left', label='left').sum()
+    expected = expected[rollup.columns].rename_axis(index=None, columns=None)
+    pd.testing.assert_frame_equal(rollup, expected, check_dtype=False, check_freq=False)
+    if freq == 'week':
+        assert (rollup.index.dayofweek == 0).all()
+
+
+def test_groups_sum_labels(counts):
+    cube = LabelCube(encode_cube(counts))
+    by_label, by_group = cube.rollup('week'), cube.groups('week')
+    assert list(by_group.columns[:len(LABEL_GROUPS)]) == list(LABEL_GROUPS)
+    for group in by_group.columns:
+        labels = [label for label in by_label.columns if label_group(label) == group]
+        pd.testing.assert_series_equal(by_group[group], by_label[labels].sum(axis=1), check_names=False,
+                                       check_dtype=False)
+
+
+def test_rollup_of_sparse_cube():
+    counts = Counter({('满意表扬', '2025-05-30'): 2, ('翻译不准确', '2025-06-02'): 1, ('满意表扬', '2025-06-03'): 3})
+    cube = LabelCube(encode_cube(counts))
+    assert cube.rollup('day').shape == (5, 2)
+    week = cube.rollup('week')
+    assert week.index.strftime('%Y-%m-%d').tolist() == ['2025-05-26', '2025-06-02']
+    assert week.to_dict('list') == {'满意表扬': [2, 3], '翻译不准确': [0, 1]}
+    assert cube.rollup('month').to_dict('list') == {'满意表扬': [2, 3], '翻译不准确': [0, 1]}
+    with pytest.raises(ValueError):
+        cube.rollup('year')
+
+
+def test_empty_cube():
+    cube = encode_cube({})
+    assert decode_cube(cube) == Counter()
+    for freq in FREQUENCIES:
+        assert LabelCube(cube).rollup(freq).empty
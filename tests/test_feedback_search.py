@@ -0,0 +1,95 @@
+"""全文检索：结果与逐行查找一致，增量段与全量构建的结果相同"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import feedback_search
+from utils.data_store import CSV_ENCODING, FEEDBACK_SAMPLE_PATH
+from utils.feedback_search import ID_COLUMN, TEXT_COLUMN, build_index, load_or_update, normalize
+
+QUERIES = ['日语', '翻译 不准', '单词本', '发音不准确', '好用', '卡', 'ok', '不能 翻译 日语', '谢谢！', '不存在的词语']
+
+
+@pytest.fixture(scope='module')
+def frame():
+    return pd.read_csv(FEEDBACK_SAMPLE_PATH, encoding=CSV_ENCODING, usecols=[ID_COLUMN, TEXT_COLUMN])
+
+
+@pytest.fixture(scope='module')
+def index(frame):
+    return build_index(frame[ID_COLUMN].to_numpy(), frame[TEXT_COLUMN])
+
+
+def _expected(frame, query):
+    texts = normalize(frame[TEXT_COLUMN])
+    keywords = normalize([query])[0].split()
+    return {row for row, text in enumerate(texts) if all(keyword in text for keyword in keywords)}
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_search_matches_rows(frame, index, query):
+    rows, scores = index.search(query, frame[TEXT_COLUMN].tolist())
+    assert set(rows.tolist()) == _expected(frame, query)
+    assert len(set(rows.tolist())) == len(rows)
+    assert np.all(np.diff(scores) <= 0)
+    limited, _ = index.search(query, frame[TEXT_COLUMN].tolist(), limit=5)
+    np.testing.assert_array_equal(limited, rows[:5])
+
+
+def test_fullwidth_and_case_are_normalized(frame, index):
+    contents = frame[TEXT_COLUMN].tolist()
+    np.testing.assert_array_equal(index.search('ＯＫ', contents)[0], index.search('ok', contents)[0])
+
+
+def _write(path, frame):
+    frame.to_csv(path, index=False, encoding=CSV_ENCODING)
+
+
+def _append(path, frame):
+    frame.to_csv(path, mode='a', header=False, index=False, encoding='utf-8')
+
+
+def _assert_same(index, frame):
+    full = build_index(frame[ID_COLUMN].to_numpy(), frame[TEXT_COLUMN])
+    np.testing.assert_array_equal(index.doc_ids, full.doc_ids)
+    contents = frame[TEXT_COLUMN].tolist()
+    for query in QUERIES:
+        rows, scores = index.search(query, contents)
+        expected_rows, expected_scores = full.search(query, contents)
+        np.testing.assert_array_equal(rows, expected_rows)
+        np.testing.assert_allclose(scores, expected_scores)
+
+
+def test_incremental_segments_match_full_build(tmp_path, monkeypatch, frame):
+    monkeypatch.setattr(feedback_search, 'MAX_SEGMENTS', 3)
+    csv_path, index_dir = tmp_path / 'feedback.csv', tmp_path / 'index'
+    _write(csv_path, frame.iloc[:5000])
+    assert len(load_or_update(csv_path, index_dir).segments) == 1
+
+    for n_segments, (start, end) in zip([2, 3, 1], [(5000, 6000), (6000, 7000), (7000, 8000)]):
+        _append(csv_path, frame.iloc[start:end])
+        index = load_or_update(csv_path, index_dir)
+        # 超过段数上限时合并为一个段
+        assert len(index.segments) == n_segments
+        _assert_same(index, frame.iloc[:end])
+        reloaded = load_or_update(csv_path, index_dir)
+        assert len(reloaded.segments) == n_segments
+        _assert_same(reloaded, frame.iloc[:end])
+
+
+def test_changed_rows_rebuild(tmp_path, frame):
+    csv_path, index_dir = tmp_path / 'feedback.csv', tmp_path / 'index'
+    _write(csv_path, frame.iloc[:3000])
+    load_or_update(csv_path, index_dir)
+    _append(csv_path, frame.iloc[3000:4000])
+    assert len(load_or_update(csv_path, index_dir).segments) == 2
+
+    # 已索引的行文本被修改时全量重建
+    changed = frame.iloc[:4000].copy()
+    changed.loc[10, TEXT_COLUMN] = '希望增加日语翻译'
+    _write(csv_path, changed)
+    index = load_or_update(csv_path, index_dir)
+    assert len(index.segments) == 1
+    assert 10 in index.search('增加日语', changed[TEXT_COLUMN].tolist())[0]
+    _assert_same(index, changed)
@@ -0,0 +1,103 @@
+"""增量导入：水位同一时刻的新行不丢失，已导入的行不重复"""
+
+import shutil
+
+import pandas as pd
+import pytest
+
+from utils import data_store, ingest, snapshot
+from utils.data_store import (
+    CSV_ENCODING, DATA_DIR, FEEDBACK_LABELED_PATH, FEEDBACK_SAMPLE_PATH, LABEL_STORE_PATH, USAGE_PATH,
+    WEEKDAY_LABELS_PATH, WEEKEND_LABELS_PATH, read_dataset,
+)
+
+PATH_NAMES = {
+    'USAGE_PATH': USAGE_PATH,
+    'WEEKDAY_LABELS_PATH': WEEKDAY_LABELS_PATH,
+    'WEEKEND_LABELS_PATH': WEEKEND_LABELS_PATH,
+    'FEEDBACK_LABELED_PATH': FEEDBACK_LABELED_PATH,
+}
+
+
+@pytest.fixture
+def scratch(tmp_path, monkeypatch):
+    """把数据目录复制到临时目录，导入只改动副本"""
+    data_dir = tmp_path / 'data'
+    moved = {path: data_dir / path.relative_to(DATA_DIR)
+             for path in [*PATH_NAMES.values(), FEEDBACK_SAMPLE_PATH, LABEL_STORE_PATH]}
+    for source, target in moved.items():
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if source.exists():
+            shutil.copy(source, target)
+    monkeypatch.setattr(data_store, 'DATA_DIR', data_dir)
+    monkeypatch.setattr(data_store, 'PARQUET_DIR', data_dir / '.parquet')
+    monkeypatch.setitem(data_store.JOINED_DATASETS, moved[FEEDBACK_LABELED_PATH],
+                        (moved[FEEDBACK_SAMPLE_PATH], moved[LABEL_STORE_PATH]))
+    for name, path in PATH_NAMES.items():
+        monkeypatch.setattr(snapshot, name, moved[path])
+    for name, path in snapshot.SOURCES.items():
+        monkeypatch.setitem(snapshot.SOURCES, name, moved[path])
+    for name, (path, *columns) in ingest.DATASETS.items():
+        monkeypatch.setitem(ingest.DATASETS, name, (moved[path], *columns))
+    return {'moved': moved, 'state_path': data_dir / 'state.json', 'snapshot_path': data_dir / 'aggregates.json'}
+
+
+def _ingest(scratch, dataset, rows):
+    return ingest.ingest(dataset, rows, state_path=scratch['state_path'], snapshot_path=scratch['snapshot_path'])
+
+
+def _image_rows(names, labeled_at):
+    rows = pd.read_csv(WEEKDAY_LABELS_PATH, encoding=CSV_ENCODING).head(len(names))
+    return rows.assign(image_file=names, labeled_at=labeled_at)
+
+
+def test_same_second_rows_are_ingested(scratch):
+    second = '2030-01-01T00:00:00'
+    assert _ingest(scratch, 'weekday_labels', _image_rows(['a.jpg', 'b.jpg'], second)) == (2, 0)
+    # 同一秒内稍后到达的新行仍然导入，已导入的行跳过
+    assert _ingest(scratch, 'weekday_labels', _image_rows(['b.jpg', 'c.jpg'], second)) == (1, 1)
+    assert _ingest(scratch, 'weekday_labels', _image_rows(['a.jpg', 'c.jpg'], second)) == (0, 2)
+    assert ingest.load_state(scratch['state_path'])['weekday_labels']['watermark_keys'] == ['a.jpg', 'b.jpg', 'c.jpg']
+
+    images = read_dataset(scratch['moved'][WEEKDAY_LABELS_PATH])
+    assert images.loc[images['labeled_at'] == second, 'image_file'].tolist() == ['a.jpg', 'b.jpg', 'c.jpg']
+    # 累加后的快照仍与源文件一致，且与重新构建的结果相同
+    aggregates = snapshot.load_snapshot(scratch['snapshot_path'])
+    assert snapshot.is_snapshot_fresh(aggregates)
+    assert aggregates['images'] == snapshot.build_snapshot()['images']
+
+
+def test_same_second_after_rescan(scratch):
+    # 没有状态文件时扫描得到水位及水位时刻已有的行
+    existing = read_dataset(FEEDBACK_LABELED_PATH, raw=True)
+    watermark = existing['feedback_date'].max()
+    latest = existing[existing['feedback_date'] == watermark]
+    rows = pd.concat([latest, latest.assign(feedback_id=latest['feedback_id'] + 10 ** 9)], ignore_index=True)
+    assert _ingest(scratch, 'feedback', rows) == (len(latest), len(latest))
+    feedback = read_dataset(scratch['moved'][FEEDBACK_LABELED_PATH])
+    assert len(feedback) == len(existing) + len(latest)
+    assert feedback['feedback_id'].is_unique
+    aggregates = snapshot.load_snapshot(scratch['snapshot_path'])
+    assert aggregates['feedback'] == snapshot.build_snapshot()['feedback']
+
+
+@pytest.mark.parametrize('dataset', ['weekday_labels', 'feedback'])
+def test_fingerprint_extended_after_append(scratch, monkeypatch, dataset):
+    path, time_column, key_column = ingest.DATASETS[dataset]
+    if dataset == 'feedback':
+        # 首次导入反馈时建立标签库，数据源随之变化，快照会整体重建一次
+        ingest.ensure_label_store(path)
+    snapshot.load_snapshot(scratch['snapshot_path'])
+    rows = read_dataset(path, raw=True).tail(3)
+    keys = rows[key_column] + 10 ** 9 if dataset == 'feedback' else rows[key_column] + '.new'
+    rows = rows.assign(**{time_column: '2030-01-01 00:00:00', key_column: keys})
+
+    calls = []
+    file_part = data_store._file_part
+    monkeypatch.setattr(data_store, '_file_part', lambda *args: calls.append(args) or file_part(*args))
+    assert _ingest(scratch, dataset, rows) == (3, 0)
+    # 快照中的指纹从追加前的指纹续算，与整体重新计算的结果相同
+    assert all(len(args) == 2 and args[1] is not None for args in calls if args[0] in data_store.source_files(path))
+    fingerprint = ingest.load_state(scratch['state_path'])[dataset]['source']
+    assert fingerprint == data_store.file_fingerprint(path)
+    assert snapshot.is_snapshot_fresh(snapshot.load_snapshot(scratch['snapshot_path']))
@@ -0,0 +1,65 @@
+"""标签库拼接：按已打标 CSV 路径读取的结果与读取文件本身一致"""
+
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from utils import data_store
+from utils.data_store import FEEDBACK_LABELED_PATH, FEEDBACK_SAMPLE_PATH, iter_chunks, read_dataset
+from utils.label_store import LabelStore, content_hash, export_labeled, import_labeled, store_digest
+
+COLUMNS = [None, ['label', 'feedback_content'], ['feedback_date', 'api_success', 'feedback_id'],
+           ['feedback_id', 'feedback_content']]
+
+
+@pytest.fixture(scope='module')
+def store_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp('store') / '反馈标签.sqlite'
+    import_labeled(FEEDBACK_LABELED_PATH, path)
+    return path
+
+
+@pytest.fixture
+def joined(store_path, monkeypatch):
+    monkeypatch.setitem(data_store.JOINED_DATASETS, FEEDBACK_LABELED_PATH, (FEEDBACK_SAMPLE_PATH, store_path))
+
+
+@pytest.mark.parametrize('raw', [False, True])
+@pytest.mark.parametrize('columns', COLUMNS)
+def test_read_matches_file(store_path, monkeypatch, columns, raw):
+    expected = read_dataset(FEEDBACK_LABELED_PATH, columns=columns, raw=raw)
+    monkeypatch.setitem(data_store.JOINED_DATASETS, FEEDBACK_LABELED_PATH, (FEEDBACK_SAMPLE_PATH, store_path))
+    pd.testing.assert_frame_equal(read_dataset(FEEDBACK_LABELED_PATH, columns=columns, raw=raw), expected)
+
+
+def test_chunks_match_read(joined):
+    chunks = pd.concat(iter_chunks(FEEDBACK_LABELED_PATH, chunksize=3000, raw=True), ignore_index=True)
+    pd.testing.assert_frame_equal(chunks, read_dataset(FEEDBACK_LABELED_PATH, raw=True))
+
+
+def test_export_is_byte_identical(store_path, tmp_path):
+    output = export_labeled(FEEDBACK_SAMPLE_PATH, tmp_path / 'labeled.csv', store_path)
+    assert output.read_bytes() == FEEDBACK_LABELED_PATH.read_bytes()
+
+
+def test_version_follows_store(joined, store_path):
+    assert data_store.source_files(FEEDBACK_LABELED_PATH)[:2] == [FEEDBACK_SAMPLE_PATH, store_path]
+    fingerprint = data_store.file_fingerprint(FEEDBACK_LABELED_PATH)
+    assert data_store.fingerprint_matches(FEEDBACK_LABELED_PATH, fingerprint)
+    with LabelStore(store_path) as store:
+        store.put(1, content_hash('新反馈'), {'label': '其他', 'api_success': True})
+    assert not data_store.fingerprint_matches(FEEDBACK_LABELED_PATH, fingerprint)
+
+
+def test_store_digest_is_read_only(store_path, tmp_path):
+    with LabelStore(store_path) as store:
+        expected = store.digest()
+    content, mtime_ns = store_path.read_bytes(), store_path.stat().st_mtime_ns
+    assert store_digest(store_path) == expected
+    assert store_path.read_bytes() == content
+    assert store_path.stat().st_mtime_ns == mtime_ns
+    # 不存在的库不会被创建
+    with pytest.raises(sqlite3.Error):
+        store_digest(tmp_path / 'missing.sqlite')
+    assert not (tmp_path / 'missing.sqlite').exists()
@@ -0,0 +1,128 @@
+"""使用次数摸排表：向量化计算与逐用户、逐天的计算一致"""
+
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.retention import (
+    ACTIVE_DAYS_THRESHOLD, ACTIVE_LAYERS, BUCKET_ORDER, COUNT_COLUMN, DATE_COLUMN, RETENTION_DAYS, TABLE_COLUMNS,
+    TOTAL_LABEL, USAGE_BUCKETS, USER_COLUMN, compute_usage_table, event_date_range,
+)
+
+START, END = pd.Timestamp('2025-10-01'), pd.Timestamp('2025-10-21')
+
+
+def _events(seed, n_users=400):
+    """窗口前后各留几天；每个用户活跃概率不同，含当天多条记录、0 次记录和单日异常值"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for user in range(n_users):
+        p = rng.uniform(0.05, 0.9)
+        for day in range(-3, (END - START).days + 12):
+            if rng.random() < p:
+                count = int(rng.choice([0, 1, 2, 5, 60], p=[0.2, 0.4, 0.25, 0.145, 0.005]))
+                rows.extend([(user, day, count)] * int(rng.integers(1, 3)))
+    events = pd.DataFrame(rows, columns=[USER_COLUMN, 'day', COUNT_COLUMN])
+    events[DATE_COLUMN] = (START + pd.to_timedelta(events.pop('day'), unit='D')).dt.strftime('%Y-%m-%d')
+    return events.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def _percent(value):
+    return '' if value is None else f'{value * 100:.2f}%'
+
+
+def _expected_table(events, max_daily_count=50):
+    n_days = (END - START).days + 1
+    counts = defaultdict(int)
+    for user, date, count in events[[USER_COLUMN, DATE_COLUMN, COUNT_COLUMN]].itertuples(index=False):
+        day = (pd.Timestamp(date) - START).days
+        if 0 <= day < n_days + max(RETENTION_DAYS):
+            counts[user, day] += count
+    last_day = max(day for _user, day in counts)
+
+    users = {}
+    for (user, day), count in counts.items():
+        info = users.setdefault(user, {'active': set(), 'used': set(), 'all_used': set(), 'count': 0, 'outlier': False})
+        if count > 0:
+            info['all_used'].add(day)
+        if day < n_days:
+            info['active'].add(day)
+            info['outlier'] |= count > max_daily_count
+            if count > 0:
+                info['used'].add(day)
+                info['count'] += count
+    selected = {user: info for user, info in users.items() if info['used'] and not info['outlier']}
+
+    def bucket(info):
+        days = len(info['used'])
+        return next(name for name, low, high in USAGE_BUCKETS if days >= low and (high is None or days <= high))
+
+    def metrics(group):
+        use_days = sum(len(info['used']) for info in group)
+        repeat = [info for info in group if len(info['used']) >= 2]
+        result = {
+            'uv': len(group),
+            'daily_count': sum(info['count'] for info in group) / use_days,
+            'interval': (np.mean([(max(info['used']) - min(info['used'])) / (len(info['used']) - 1)
+                                  for info in repeat]) if repeat else np.nan),
+        }
+        for k in RETENTION_DAYS:
+            rates = []
+            for day in range(n_days):
+                base = [info for info in group if day in info['used'] and day + k <= last_day]
+                if base:
+                    rates.append(sum(day + k in info['all_used'] for info in base) / len(base))
+            result[k] = float(np.mean(rates)) if rates else None
+        return result
+
+    records = []
+    layers = [(TOTAL_LABEL, list(selected.values()))]
+    layers += [(name, [info for info in selected.values() if (len(info['active']) >= ACTIVE_DAYS_THRESHOLD) == flag])
+               for name, flag in ACTIVE_LAYERS]
+    for layer_name, group in layers:
+        parts = [(TOTAL_LABEL, group)] + [(name, [info for info in group if bucket(info) == name])
+                                          for name in BUCKET_ORDER]
+        for bucket_name, members in parts:
+            if not members:
+                continue
+            values = metrics(members)
+            records.append({
+                'app活跃天数分层': layer_name,
+                '翻译使用天数分层': bucket_name,
+                '翻译uv': values['uv'],
+                '占比': _percent(values['uv'] / len(selected)),
+                '日人均翻译张数': round(float(values['daily_count']), 2),
+                '平均使用间隔(天)(剔除1次的)': round(float(values['interval']), 2),
+                '平均功能次留率': _percent(values[1]),
+                '平均功能七留率': _percent(values[7]),
+            })
+    return pd.DataFrame(records, columns=TABLE_COLUMNS)
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_table_matches_per_user(seed):
+    events = _events(seed)
+    table = compute_usage_table(events, START, END)
+    expected = _expected_table(events)
+    # 合计层包含全部使用天数分层，活跃分层两层的 uv 之和等于合计
+    assert set(table['翻译使用天数分层']) == {TOTAL_LABEL, *BUCKET_ORDER}
+    layer_totals = table[table['翻译使用天数分层'] == TOTAL_LABEL].set_index('app活跃天数分层')['翻译uv']
+    assert layer_totals[TOTAL_LABEL] == sum(layer_totals[name] for name, _flag in ACTIVE_LAYERS)
+    pd.testing.assert_frame_equal(table, expected)
+
+
+def test_timestamps_and_threshold():
+    events = _events(2)
+    # 日期列为时间戳时结果相同；异常值阈值调低后剔除更多用户
+    timestamps = events.assign(**{DATE_COLUMN: pd.to_datetime(events[DATE_COLUMN])})
+    pd.testing.assert_frame_equal(compute_usage_table(timestamps, START, END), compute_usage_table(events, START, END))
+    pd.testing.assert_frame_equal(compute_usage_table(events, START, END, max_daily_count=4),
+                                  _expected_table(events, max_daily_count=4))
+
+
+def test_event_date_range():
+    events = _events(0, n_users=20)
+    dates = pd.to_datetime(events[DATE_COLUMN])
+    assert event_date_range(events) == (dates.min().date(), dates.max().date())
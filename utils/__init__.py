@@ -0,0 +1,3 @@
+"""
+拍照翻译功能分析 - 页面共用的数据与工具模块
+"""
@@ -0,0 +1,283 @@
+"""
+页面基准测试
+
+在子进程中用 streamlit 的 AppTest 无界面执行各页面，记录：
+- 冷启动：全新进程中第一次执行（streamlit 缓存为空，磁盘上的 Parquet / 快照 / 索引已构建）
+- 热执行：同一进程中再次执行（命中 st.cache_data / st.cache_resource）
+- 进程峰值内存（RSS）和各段落（utils.profiling.mark）耗时
+
+除随附数据（1×）外，可以生成按倍数放大的合成数据：已打标反馈与图片标签逐份复制
+（feedback_id 逐份错开），明细 CSV 由放大后的已打标反馈重新生成，其余文件复制或链接到原文件。
+每个倍数一棵目录树（.benchmarks/x10/ 等，代码目录为指向项目的符号链接），
+先执行一遍数据构建（Parquet、快照、索引、缩略图）并记录耗时，再测页面。
+
+结果写入 .benchmarks/latest.json；--save-baseline 保存为基线 benchmark_baseline.json（随代码提交，
+在同一台基准机器上更新），之后每次与基线比较，耗时或内存超过基线一定比例时列为回归并以非零状态退出。
+
+    python -m utils.benchmark                          # 全部页面，随附数据
+    python -m utils.benchmark --scales 1 10 100 1000   # 另测放大 10×、100×、1000× 的数据
+    python -m utils.benchmark --save-baseline          # 保存为基线
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from utils.data_store import (
+    BASE_DIR, CSV_ENCODING, DATA_DIR, FEEDBACK_LABELED_PATH, JOINED_DATASETS, WEEKDAY_LABELS_PATH,
+    WEEKEND_LABELS_PATH, joined_sources,
+)
+from utils.lazy_imports import lazy_import
+from utils.profiling import default_pages
+
+pd = lazy_import('pandas')
+
+BENCH_DIR = BASE_DIR / ".benchmarks"
+# 基线随代码提交（.benchmarks/ 下的放大数据与本次结果不提交）
+BASELINE_PATH = BASE_DIR / "benchmark_baseline.json"
+LATEST_PATH = BENCH_DIR / "latest.json"
+
+# 放大的数据集 → 需要逐份错开的 ID 列
+SCALED_DATASETS = {
+    FEEDBACK_LABELED_PATH: ['feedback_id'],
+    WEEKDAY_LABELS_PATH: [],
+    WEEKEND_LABELS_PATH: [],
+}
+# 放大后在目录树中执行的数据构建（与 README「数据构建」一致）
+BUILD_STEPS = ['utils.data_store', 'utils.snapshot', 'utils.feedback_index', 'utils.feedback_search',
+               'utils.image_cache']
+# 回归判定：超过基线的比例，以及忽略的绝对差（秒 / MB），避免小数值上的抖动
+TOLERANCE = 0.2
+MIN_SECONDS = 0.05
+MIN_MB = 20
+
+
+# ===== 合成数据 =====
+
+def scale_csv(source, target, scale, id_columns=()):
+    """把 CSV 复制 scale 份写到 target；文本按原样保留，ID 列每份加上固定偏移"""
+    df = pd.read_csv(source, encoding=CSV_ENCODING, dtype=str, keep_default_na=False)
+    ids = {column: pd.to_numeric(df[column], errors='coerce') for column in id_columns}
+    offsets = {column: int(values.max()) + 1 for column, values in ids.items()}
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_suffix('.csv.tmp')
+    for copy in range(scale):
+        chunk = df
+        if copy and ids:
+            chunk = df.copy()
+            for column, values in ids.items():
+                chunk[column] = (values + copy * offsets[column]).astype('Int64').astype(str).replace('<NA>', '')
+        chunk.to_csv(tmp_path, mode='w' if copy == 0 else 'a', header=copy == 0, index=False,
+                     encoding=CSV_ENCODING if copy == 0 else 'utf-8')
+    tmp_path.replace(target)
+    return target
+
+
+def _scale_source(source, root):
+    """放大所用的 CSV：由标签库拼接读取的数据集先在树外导出一份"""
+    sources = joined_sources(source)
+    if sources is None:
+        return source
+    from utils.label_store import export_labeled
+    return export_labeled(sources[0], root.parent / f'{root.name}.{source.name}', sources[1])
+
+
+def _link(source, target):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if not target.exists() and not target.is_symlink():
+        target.symlink_to(source, target_is_directory=source.is_dir())
+
+
+def build_scaled_tree(scale, root=None):
+    """生成 scale 倍数据的目录树并返回其根目录；已存在的树直接复用"""
+    from utils.feedback_views import VIEWS, write_view
+
+    root = Path(root or BENCH_DIR / f'x{scale}')
+    if (root / '.complete').exists():
+        return root
+    # 代码、图片等目录直接链接到项目
+    for entry in BASE_DIR.iterdir():
+        if entry.name in ('data', '.git', '.benchmarks', '__pycache__') or entry.name.startswith('.'):
+            continue
+        _link(entry, root / entry.name)
+    # data/ 下放大的文件单独生成，其余文件逐个链接（构建产物目录不链接，在树内重新构建）；
+    # 树内读取放大后的已打标 CSV，标签库不进入目录树
+    view_paths = {view.path for view in VIEWS.values()}
+    store_names = {store_path.name for _raw_path, store_path in JOINED_DATASETS.values()}
+    for source in DATA_DIR.rglob('*'):
+        relative = source.relative_to(DATA_DIR)
+        if source.is_dir() or relative.parts[0].startswith('.') or source in view_paths:
+            continue
+        if source in SCALED_DATASETS or source.name.split('-')[0] in store_names:
+            continue
+        target = root / 'data' / relative
+        if source.suffix == '.csv':
+            # CSV 需要是树内的真实文件，Parquet 转换按解析后的路径判断是否位于 data/ 下
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(source, target)
+        else:
+            _link(source, target)
+    for source, id_columns in SCALED_DATASETS.items():
+        scale_csv(_scale_source(source, root), root / 'data' / source.relative_to(DATA_DIR), scale, id_columns)
+    labeled = root / 'data' / FEEDBACK_LABELED_PATH.relative_to(DATA_DIR)
+    for view in VIEWS.values():
+        write_view(view, source=labeled, output_path=root / 'data' / view.path.relative_to(DATA_DIR))
+    (root / '.complete').touch()
+    return root
+
+
+def _child_env(root):
+    return dict(os.environ, PYTHONPATH=str(root))
+
+
+def run_build(root):
+    """在目录树中执行数据构建，返回 {步骤: 秒}"""
+    timings = {}
+    for module in BUILD_STEPS:
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, '-m', module], cwd=root, env=_child_env(root),
+                                capture_output=True, text=True)
+        if result.returncode:
+            raise RuntimeError(f'{module} 执行失败：\n{result.stderr[-2000:]}')
+        timings[module] = time.perf_counter() - started
+    return timings
+
+
+# ===== 页面执行 =====
+
+_CHILD_SCRIPT = """
+import json, resource, sys, time
+from streamlit.testing.v1 import AppTest
+from utils import profiling
+
+page, repeat, timeout = sys.argv[1], int(sys.argv[2]), float(sys.argv[3])
+runs = []
+for _ in range(repeat):
+    started = time.perf_counter()
+    app = AppTest.from_file(page, default_timeout=timeout).run()
+    runs.append({'wall': time.perf_counter() - started,
+                 'sections': profiling.latest_sections(),
+                 'errors': [str(e.value) for e in app.exception] + [str(e.value) for e in app.error]})
+# ru_maxrss 在 Linux 上以 KiB 为单位，macOS 上为字节
+peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+print('__BENCH__' + json.dumps({'runs': runs, 'peak_rss': peak_rss}, ensure_ascii=False))
+"""
+
+
+def bench_page(page_path, root=BASE_DIR, repeat=3, timeout=600):
+    """在全新子进程中执行页面 repeat 次（第一次为冷启动），返回耗时、峰值内存和段落耗时"""
+    result = subprocess.run([sys.executable, '-c', _CHILD_SCRIPT, str(page_path), str(repeat), str(timeout)],
+                            cwd=root, env=_child_env(root), capture_output=True, text=True)
+    bench = None
+    for line in result.stdout.splitlines():
+        if line.startswith('__BENCH__'):
+            bench = json.loads(line[len('__BENCH__'):])
+    if bench is None:
+        raise RuntimeError(f'页面执行失败：{page_path}\n{result.stderr[-2000:]}')
+    cold, *warm = bench['runs']
+    warm = warm or [cold]
+    warm_walls = sorted(run['wall'] for run in warm)
+    return {
+        'cold': cold['wall'],
+        'warm': warm_walls[len(warm_walls) // 2],
+        'peak_rss_mb': bench['peak_rss'] / 1e6,
+        'sections': {name: seconds for name, seconds in cold['sections']},
+        'errors': sorted({error for run in bench['runs'] for error in run['errors']}),
+    }
+
+
+def run_suite(scales=(1,), pages=None, repeat=3, progress=print):
+    """按倍数依次构建数据并测量各页面，返回 {'1x/streamlit_app.py': 结果, ...}"""
+    results = {}
+    for scale in scales:
+        root = BASE_DIR if scale == 1 else build_scaled_tree(scale)
+        build = run_build(root)
+        progress(f'[{scale}x] 数据构建 ' + '，'.join(f'{step.split(".")[-1]} {seconds:.1f}s'
+                                                  for step, seconds in build.items()))
+        for page in pages or default_pages(BASE_DIR):
+            relative = Path(page).relative_to(BASE_DIR)
+            result = bench_page(root / relative, root=root, repeat=repeat)
+            result['build'] = build
+            results[f'{scale}x/{relative}'] = result
+            progress(format_result(f'{scale}x/{relative}', result))
+    return results
+
+
+# ===== 基线与回归 =====
+
+def load_results(path):
+    path = Path(path)
+    if not path.exists():
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_results(results, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=1)
+
+
+def _regressed(current, baseline, floor):
+    return current > baseline * (1 + TOLERANCE) and current - baseline > floor
+
+
+def compare(results, baseline):
+    """与基线比较，返回回归列表 [(页面, 指标, 基线, 本次)]；基线中没有的页面跳过"""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        for metric, floor in (('cold', MIN_SECONDS), ('warm', MIN_SECONDS), ('peak_rss_mb', MIN_MB)):
+            if _regressed(result[metric], base[metric], floor):
+                regressions.append((key, metric, base[metric], result[metric]))
+        for section, seconds in result['sections'].items():
+            if section in base['sections'] and _regressed(seconds, base['sections'][section], MIN_SECONDS):
+                regressions.append((key, f'段落 {section}', base['sections'][section], seconds))
+    return regressions
+
+
+def format_result(key, result):
+    lines = [f'== {key}  冷启动 {result["cold"] * 1000:.0f} ms  热执行 {result["warm"] * 1000:.0f} ms  '
+             f'峰值内存 {result["peak_rss_mb"]:.0f} MB']
+    for name, seconds in result['sections'].items():
+        lines.append(f'    {seconds * 1000:8.1f} ms  {name}')
+    for error in result['errors']:
+        lines.append(f'  !! {error[:200]}')
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='页面基准测试（无界面执行，随附数据与放大的合成数据）')
+    parser.add_argument('pages', nargs='*', help='页面脚本路径，默认全部页面')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1], help='数据倍数，如 1 10 100 1000')
+    parser.add_argument('--repeat', type=int, default=3, help='每个页面执行次数（第一次为冷启动）')
+    parser.add_argument('--save-baseline', action='store_true', help='把本次结果保存为基线')
+    parser.add_argument('--baseline', default=str(BASELINE_PATH))
+    args = parser.parse_args()
+
+    pages = [Path(page).resolve() for page in args.pages] or None
+    results = run_suite(args.scales, pages, repeat=args.repeat)
+    write_results(results, LATEST_PATH)
+    if args.save_baseline:
+        baseline = load_results(args.baseline)
+        baseline.update(results)
+        write_results(baseline, args.baseline)
+        print(f'基线已保存：{args.baseline}')
+    else:
+        regressions = compare(results, load_results(args.baseline))
+        for key, metric, before, after in regressions:
+            print(f'回归 {key} {metric}：{before:.3f} → {after:.3f}')
+        if regressions:
+            sys.exit(1)
+    if any(result['errors'] for result in results.values()):
+        sys.exit(1)
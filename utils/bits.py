@@ -0,0 +1,17 @@
+"""
+位图工具
+
+活跃位图索引（utils/activity_index.py）与反馈倒排索引（utils/feedback_index.py）共用：
+位图均为 np.packbits 得到的 uint8 数组，每个用户 / 每行占 1 位。
+"""
+
+from utils.lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+
+def popcount(bits, axis=-1):
+    """位图中 1 的个数（np.bitwise_count 需要 numpy 2.0，更早的版本逐位展开后计数）"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(bits).sum(axis=axis, dtype=np.int64)
+    return np.unpackbits(bits, axis=axis).sum(axis=axis, dtype=np.int64)
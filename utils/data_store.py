@@ -0,0 +1,420 @@
+"""
+列式数据存储
+
+把 data/ 下的 CSV 转换为 Parquet（存放在 data/.parquet/ 下，目录结构与 data/ 一致），
+页面加载时优先读取 Parquet 并只读取需要的列；Parquet 缺失或过期时回退到 CSV。
+列的选取与类型按 utils/schemas.py 中的声明处理（Parquet 中也按声明的类型存储）。
+
+已打标反馈是拼接数据集（JOINED_DATASETS）：标签库存在时，按已打标 CSV 的路径读取
+实际读的是原始反馈并入标签库（utils/label_store.py），已打标 CSV 本身不再读取，也不转换 Parquet。
+
+追加导入（append_csv）时新行写成单独的 Parquet 分片（<文件名>.parts/ 下），不重写已有的 Parquet；
+读取时按顺序拼接，分片过多时合并为一个文件，重新转换（convert_csv）时也会合并。
+
+构建命令：
+    python -m utils.data_store
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+from utils.lazy_imports import lazy_import
+from utils.schemas import schema_for
+
+pd = lazy_import('pandas')
+
+
+# 项目根目录与数据目录
+BASE_DIR = Path(__file__).parent.parent
+DATA_DIR = BASE_DIR / "data"
+PARQUET_DIR = DATA_DIR / ".parquet"
+
+# 写入 Parquet 元数据中的源文件指纹字段（CSV 的 _file_part）
+SOURCE_KEY = b"source_fingerprint"
+# 指纹按块链式计算摘要的块大小
+HASH_BLOCK = 1 << 20
+# 追加分片超过这个数量时合并，读取时打开的文件数不会无限增长
+MAX_PARTS = 64
+
+CSV_ENCODING = 'utf-8-sig'
+
+# 各数据集的 CSV 路径
+USAGE_PATH = DATA_DIR / "使用频次与留存" / "new拍照翻译)使用次数摸排.csv"
+WEEKDAY_LABELS_PATH = DATA_DIR / "图片内容分布" / "工作日标签.csv"
+WEEKEND_LABELS_PATH = DATA_DIR / "图片内容分布" / "周末标签.csv"
+FEEDBACK_SAMPLE_PATH = DATA_DIR / "用户反馈" / "用户反馈数据_抽样8000条.csv"
+FEEDBACK_LABELED_PATH = DATA_DIR / "用户反馈" / "用户反馈数据_已打标_8000条_20并发.csv"
+PRONUNCIATION_DETAIL_PATH = DATA_DIR / "用户反馈" / "发音朗读问题详细数据.csv"
+SUGGESTION_DETAIL_PATH = DATA_DIR / "用户反馈" / "产品建议详细数据.csv"
+# 逐用户逐天的使用日志（可选，见 utils/retention.py）
+USAGE_EVENTS_PATH = DATA_DIR / "使用频次与留存" / "拍照翻译使用日志.parquet"
+# 反馈标签库（见 utils/label_store.py）
+LABEL_STORE_PATH = DATA_DIR / "用户反馈" / "反馈标签.sqlite"
+
+# 读取时拼接的数据集：路径 → (原始数据, 标签库)；标签库尚未建立时仍读取文件本身
+JOINED_DATASETS = {FEEDBACK_LABELED_PATH: (FEEDBACK_SAMPLE_PATH, LABEL_STORE_PATH)}
+
+
+def joined_sources(path):
+    """拼接数据集的 (原始数据, 标签库)；普通文件或标签库不存在时返回 None"""
+    resolved = Path(path).resolve()
+    for dataset, sources in JOINED_DATASETS.items():
+        if dataset.resolve() == resolved:
+            return sources if sources[1].exists() else None
+    return None
+
+
+def source_files(path):
+    """数据集实际读取的文件：拼接数据集为原始数据、标签库（及其 WAL 文件），否则为文件本身"""
+    sources = joined_sources(path)
+    if sources is None:
+        return [Path(path)]
+    raw_path, store_path = sources
+    return [raw_path] + _store_files(store_path)
+
+
+def file_sha256(path):
+    """计算文件内容的 sha256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _stat(files):
+    """多个文件合计的大小与最新的修改时间、状态变化时间
+
+    ctime 无法用 os.utime 设回，内容被改写后即使大小与修改时间都还原也能发现。
+    """
+    stats = [f.stat() for f in files]
+    return (sum(stat.st_size for stat in stats), max(stat.st_mtime_ns for stat in stats),
+            max(stat.st_ctime_ns for stat in stats))
+
+
+def _chain(chain, block):
+    return hashlib.sha256(chain.encode() + hashlib.sha256(block).digest()).hexdigest()
+
+
+def _file_part(path, previous=None):
+    """单个文件的指纹：大小、修改时间、状态变化时间与按块链式计算的内容摘要
+
+    chain 为最后一个完整块之后的链值；previous 为同一文件只在末尾追加之前的指纹时，
+    从其最后一个完整块接着计算，只读取不完整的块和新增的内容。
+    """
+    offset, chain = 0, ''
+    if previous is not None and Path(path).stat().st_size >= previous['size']:
+        offset, chain = previous['size'] // HASH_BLOCK * HASH_BLOCK, previous['chain']
+    with open(path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        f.seek(offset)
+        while len(block := f.read(HASH_BLOCK)) == HASH_BLOCK:
+            chain = _chain(chain, block)
+            offset += HASH_BLOCK
+    return {'size': offset + len(block), 'mtime_ns': stat.st_mtime_ns, 'ctime_ns': stat.st_ctime_ns,
+            'digest': _chain(chain, block), 'chain': chain}
+
+
+def _store_files(store_path):
+    wal_path = store_path.with_name(store_path.name + '-wal')
+    return [store_path] + ([wal_path] if wal_path.exists() else [])
+
+
+def _store_part(store_path):
+    """标签库的指纹：摘要为库内的写入代数（见 LabelStore.digest），不读取整个文件"""
+    from utils.label_store import store_digest
+
+    # 先取摘要再取大小与修改时间：两者之间有写入时记录的是较旧的摘要，下次检查会发现变化
+    digest = store_digest(store_path)
+    size, mtime_ns, _ = _stat(_store_files(store_path))
+    return {'size': size, 'mtime_ns': mtime_ns, 'digest': digest}
+
+
+def _parts(path):
+    """数据集指纹的组成 [(类型, 路径)]：拼接数据集为原始数据文件与标签库"""
+    sources = joined_sources(path)
+    if sources is None:
+        return [('file', Path(path))]
+    return [('file', sources[0]), ('store', sources[1])]
+
+
+def file_fingerprint(path):
+    """数据集指纹：各源文件的大小、修改时间与内容摘要"""
+    return {'parts': [_file_part(p) if kind == 'file' else _store_part(p) for kind, p in _parts(path)]}
+
+
+def extend_fingerprint(path, fingerprint):
+    """数据文件只在末尾追加过内容时，从追加前的指纹续算新指纹（不重新读取整个文件）"""
+    parts = _parts(path)
+    if len(fingerprint.get('parts', ())) != len(parts):
+        return file_fingerprint(path)
+    return {'parts': [_file_part(p, previous) if kind == 'file' else _store_part(p)
+                      for (kind, p), previous in zip(parts, fingerprint['parts'])]}
+
+
+def fingerprint_matches(path, fingerprint):
+    """数据集是否与指纹一致；大小、修改时间与状态变化时间都相同时不再计算摘要"""
+    parts = _parts(path)
+    if len(fingerprint.get('parts', ())) != len(parts):
+        return False
+    for (kind, part_path), part in zip(parts, fingerprint['parts']):
+        size, mtime_ns, ctime_ns = _stat(_store_files(part_path) if kind == 'store' else [part_path])
+        # 标签库只读打开时 SQLite 也可能创建 -shm 文件，不比较 ctime；其内容由写入代数判断
+        same_ctime = kind == 'store' or ctime_ns == part.get('ctime_ns')
+        if size == part['size'] and mtime_ns == part['mtime_ns'] and same_ctime:
+            continue
+        if kind == 'file':
+            if size != part['size'] or _file_part(part_path)['digest'] != part['digest']:
+                return False
+        # 标签库合并 WAL 时大小和修改时间会变而内容不变，只比较摘要
+        elif _store_part(part_path)['digest'] != part['digest']:
+            return False
+    return True
+
+
+def parquet_path_for(csv_path):
+    """CSV 对应的 Parquet 路径；不在 data/ 下的文件返回 None"""
+    try:
+        relative = Path(csv_path).resolve().relative_to(DATA_DIR.resolve())
+    except ValueError:
+        return None
+    return PARQUET_DIR / relative.with_suffix('.parquet')
+
+
+def _parts_dir(parquet_path):
+    return parquet_path.with_suffix('.parts')
+
+
+def _parquet_files(parquet_path):
+    """主文件及按追加顺序排列的分片"""
+    parts_dir = _parts_dir(parquet_path)
+    parts = sorted(parts_dir.glob('*.parquet')) if parts_dir.exists() else []
+    return [parquet_path] + parts
+
+
+def _read_parquet(parquet_path, columns=None):
+    """读取主文件及全部分片，分类列的类别按排序统一（与整体转换的结果一致）"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    files = _parquet_files(parquet_path)
+    if len(files) == 1:
+        return pd.read_parquet(parquet_path, columns=columns)
+    df = pa.concat_tables([pq.read_table(f, columns=columns) for f in files]).to_pandas()
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].cat.reorder_categories(sorted(df[column].cat.categories))
+    return df
+
+
+def _read_source(parquet_path):
+    import pyarrow.parquet as pq
+    metadata = pq.read_schema(parquet_path).metadata or {}
+    value = metadata.get(SOURCE_KEY)
+    return json.loads(value) if value else None
+
+
+def _with_source(table, source):
+    metadata = dict(table.schema.metadata or {})
+    metadata[SOURCE_KEY] = json.dumps(source).encode()
+    return table.replace_schema_metadata(metadata)
+
+
+def _write_parquet(table, parquet_path):
+    import pyarrow.parquet as pq
+
+    parquet_path.parent.mkdir(parents=True, exist_ok=True)
+    # 先写临时文件再替换，避免页面读到写了一半的文件
+    tmp_path = parquet_path.with_suffix('.parquet.tmp')
+    pq.write_table(table, tmp_path, compression='zstd')
+    tmp_path.replace(parquet_path)
+
+
+def is_fresh(csv_path):
+    """Parquet 是否存在且与 CSV 一致
+
+    先比较修改时间；部署时重新检出会刷新 mtime，此时再比较内容摘要。
+    摘要一致时把 Parquet 的修改时间更新为当前时间，之后的读取不再重新计算摘要。
+    有分片时按最后一个分片判断（其中记录的是追加后的 CSV 摘要）。
+    """
+    csv_path = Path(csv_path)
+    parquet_path = parquet_path_for(csv_path)
+    if parquet_path is None or not parquet_path.exists():
+        return False
+    parquet_path = _parquet_files(parquet_path)[-1]
+    if parquet_path.stat().st_mtime >= csv_path.stat().st_mtime:
+        return True
+    try:
+        fresh = _read_source(parquet_path)['digest'] == _file_part(csv_path)['digest']
+    except Exception:
+        return False
+    if fresh:
+        try:
+            os.utime(parquet_path)
+        except OSError:
+            # 只读部署时无法更新，每次仍按摘要判断
+            pass
+    return fresh
+
+
+def convert_csv(csv_path, force=False):
+    """把单个 CSV 写成 Parquet，返回 Parquet 路径"""
+    import pyarrow as pa
+
+    csv_path = Path(csv_path)
+    parquet_path = parquet_path_for(csv_path)
+    if not force and is_fresh(csv_path):
+        return parquet_path
+
+    source = _file_part(csv_path)
+    df = _parse_csv(csv_path, schema_for(csv_path))
+    # 先删除分片：中途失败时主文件的摘要与 CSV 不一致，下次读取会重新转换，不会重复计入分片
+    shutil.rmtree(_parts_dir(parquet_path), ignore_errors=True)
+    _write_parquet(_with_source(pa.Table.from_pandas(df, preserve_index=False), source), parquet_path)
+    return parquet_path
+
+
+def _parse_csv(source, schema, **options):
+    """Parquet 保留全部列（不丢弃未使用的列），只按声明转换类型"""
+    if schema is None:
+        return pd.read_csv(source, encoding=CSV_ENCODING, **options)
+    return schema.apply(pd.read_csv(source, encoding=CSV_ENCODING, dtype=schema.csv_dtypes(), **options), columns=[])
+
+
+def append_csv(csv_path, rows):
+    """把 rows 按文件的列顺序追加到 CSV 末尾
+
+    新行先按文件的列和类型解析，解析失败时不改动 CSV。Parquet 与追加前的 CSV 一致时，
+    新行写成一个分片，源文件摘要从原来的指纹续算，不重写已有的 Parquet，也不重新计算整个 CSV 的摘要。
+    """
+    import io
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    csv_path = Path(csv_path)
+    header = list(pd.read_csv(csv_path, encoding=CSV_ENCODING, nrows=0).columns)
+    missing = [column for column in header if column not in rows.columns]
+    if missing:
+        raise ValueError(f'新数据缺少列：{"、".join(missing)}')
+    # 按写入的文本解析新行，与整体转换得到的类型一致
+    text = rows[header].to_csv(header=False, index=False)
+    new = _parse_csv(io.StringIO(text), schema_for(csv_path), header=None, names=header)
+
+    parquet_path = parquet_path_for(csv_path)
+    fresh = is_fresh(csv_path)
+    if fresh:
+        files = _parquet_files(parquet_path)
+        previous = _read_source(files[-1])
+        if len(files) > MAX_PARTS:
+            # 在追加 CSV 之前合并，主文件记录的仍是追加前的摘要
+            table = _with_source(pa.Table.from_pandas(_read_parquet(parquet_path), preserve_index=False), previous)
+            shutil.rmtree(_parts_dir(parquet_path))
+            _write_parquet(table, parquet_path)
+            files = [parquet_path]
+    with open(csv_path, 'a', encoding='utf-8', newline='') as f:
+        f.write(text)
+    if not fresh:
+        return
+
+    # 按主文件的列类型写入，全为空的列也不会推断成别的类型
+    schema = pq.read_schema(parquet_path)
+    table = pa.Table.from_pandas(new, schema=schema, preserve_index=False)
+    index = int(files[-1].stem) + 1 if len(files) > 1 else 1
+    _write_parquet(_with_source(table, _file_part(csv_path, previous)), _parts_dir(parquet_path) / f'{index:05d}.parquet')
+
+
+def convert_all(force=False):
+    """转换 data/ 下全部 CSV（由标签库拼接读取的已打标 CSV 除外）"""
+    converted = []
+    for csv_path in sorted(DATA_DIR.rglob('*.csv')):
+        if PARQUET_DIR in csv_path.parents or joined_sources(csv_path) is not None:
+            continue
+        converted.append(convert_csv(csv_path, force=force))
+    return converted
+
+
+def _apply_schema(df, schema, columns):
+    return df if schema is None else schema.apply(df, columns)
+
+
+def _csv_options(schema, columns):
+    if schema is None:
+        return {'usecols': columns}
+    return {'usecols': schema.usecols(columns), 'dtype': schema.csv_dtypes()}
+
+
+def read_dataset(csv_path, columns=None, raw=False):
+    """读取数据集
+
+    Parquet 可用且未过期时直接读取（只读 columns 指定的列），否则回退到 CSV。
+    列与类型按 utils/schemas.py 的声明；raw=True 时直接按 pandas 默认推断读取 CSV
+    （需要原样导出文件内容时使用）。拼接数据集读取原始数据并入标签库。
+    """
+    csv_path = Path(csv_path)
+    sources = joined_sources(csv_path)
+    if sources is not None:
+        from utils.label_store import load_labeled
+        return load_labeled(*sources, columns=columns, raw=raw)
+    if raw:
+        return pd.read_csv(csv_path, encoding=CSV_ENCODING, usecols=columns)
+    schema = schema_for(csv_path)
+    if is_fresh(csv_path):
+        try:
+            return _apply_schema(_read_parquet(parquet_path_for(csv_path), columns=columns), schema, columns)
+        except ImportError:
+            pass
+    df = pd.read_csv(csv_path, encoding=CSV_ENCODING, **_csv_options(schema, columns))
+    return _apply_schema(df, schema, columns)
+
+
+def iter_chunks(csv_path, columns=None, chunksize=100_000, raw=False):
+    """分块读取数据集，每块最多 chunksize 行
+
+    与 read_dataset 相同，优先读取未过期的 Parquet，否则分块解析 CSV。
+    """
+    csv_path = Path(csv_path)
+    sources = joined_sources(csv_path)
+    if sources is not None:
+        from utils.label_store import iter_labeled
+        yield from iter_labeled(*sources, columns=columns, chunksize=chunksize, raw=raw)
+        return
+    if raw:
+        yield from pd.read_csv(csv_path, encoding=CSV_ENCODING, usecols=columns, chunksize=chunksize)
+        return
+    schema = schema_for(csv_path)
+    if is_fresh(csv_path):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            pass
+        else:
+            for path in _parquet_files(parquet_path_for(csv_path)):
+                for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+                    yield _apply_schema(batch.to_pandas(), schema, columns)
+            return
+    for chunk in pd.read_csv(csv_path, encoding=CSV_ENCODING, chunksize=chunksize, **_csv_options(schema, columns)):
+        yield _apply_schema(chunk, schema, columns)
+
+
+def dataset_columns(csv_path):
+    """数据集的全部列名（与 raw=True 读取时的顺序一致），不读取数据"""
+    sources = joined_sources(csv_path)
+    if sources is not None:
+        from utils.label_store import RESULT_COLUMNS
+        return dataset_columns(sources[0]) + RESULT_COLUMNS
+    return list(pd.read_csv(csv_path, encoding=CSV_ENCODING, nrows=0).columns)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='把 data/ 下的 CSV 转换为 Parquet')
+    parser.add_argument('--force', action='store_true', help='忽略新鲜度检查，全部重新生成')
+    args = parser.parse_args()
+
+    for path in convert_all(force=args.force):
+        print(path.relative_to(BASE_DIR))
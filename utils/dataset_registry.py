@@ -0,0 +1,113 @@
+"""
+进程级只读数据集注册表
+
+页面中的大表（已打标反馈等）在进程内只加载一份，所有会话共享：
+
+- registry.frame(path, columns) 返回浅拷贝。pandas 3 默认写时复制，
+  会话里修改返回的表只会复制被修改的列，不会影响共享的那一份，也不会每个会话各复制一份
+- 每次取用时比较源文件的大小与修改时间，文件变化后重新加载，加载完成后整体替换旧数据；
+  旧版本不再被引用即释放，不会像按版本缓存那样越积越多
+- 同一数据集同时只有一个会话在加载，其他会话等待并复用结果
+- registry.report() 列出各数据集占用的内存
+
+    from utils.dataset_registry import registry
+    rows = registry.frame(FEEDBACK_LABELED_PATH, columns=['label', 'feedback_content'])
+
+    python -m utils.dataset_registry    # 加载页面用到的数据集并输出内存占用
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+
+from utils.data_store import read_dataset
+from utils.exports import dataset_version
+
+
+@dataclass
+class _Entry:
+    version: str
+    value: object
+    loaded_at: float
+    load_seconds: float
+    hits: int = 0
+
+
+class DatasetRegistry:
+    """按 (名称, 源文件, 列) 登记的只读数据，源文件变化时原子替换"""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def _load_lock(self, key):
+        with self._lock:
+            return self._load_locks.setdefault(key, threading.Lock())
+
+    def load(self, name, path, loader, columns=None):
+        """取出登记的数据；首次取用或源文件变化时调用 loader() 加载"""
+        key = (name, str(path), tuple(columns) if columns is not None else None)
+        version = dataset_version(path)
+        entry = self._entries.get(key)
+        if entry is None or entry.version != version:
+            with self._load_lock(key):
+                # 等待期间可能已由其他会话加载完成
+                entry = self._entries.get(key)
+                if entry is None or entry.version != version:
+                    started = time.perf_counter()
+                    value = loader()
+                    entry = _Entry(version, value, time.time(), time.perf_counter() - started)
+                    with self._lock:
+                        self._entries[key] = entry
+        entry.hits += 1
+        return entry.value
+
+    def frame(self, path, columns=None):
+        """数据集（按 utils/schemas.py 的声明读取）的共享只读 DataFrame"""
+        frame = self.load('dataset', path, lambda: read_dataset(path, columns=columns), columns=columns)
+        return frame.copy(deep=False)
+
+    def derived(self, name, path, build):
+        """由数据集推导出的共享只读 DataFrame（如明细视图），随源文件一起重建"""
+        return self.load(name, path, build).copy(deep=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def report(self):
+        """各登记数据的行数与内存占用（DataFrame 以外的对象只记录加载信息）"""
+        with self._lock:
+            entries = list(self._entries.items())
+        records = []
+        for (name, path, columns), entry in entries:
+            value = entry.value
+            is_frame = hasattr(value, 'memory_usage')
+            records.append({
+                'name': name,
+                'path': path,
+                'columns': len(columns) if columns is not None else (value.shape[1] if is_frame else None),
+                'rows': len(value) if is_frame else None,
+                'bytes': int(value.memory_usage(deep=True).sum()) if is_frame else None,
+                'version': entry.version,
+                'loaded_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry.loaded_at)),
+                'load_seconds': round(entry.load_seconds, 3),
+                'hits': entry.hits,
+            })
+        return records
+
+
+registry = DatasetRegistry()
+
+
+if __name__ == '__main__':
+    from utils.data_store import BASE_DIR, FEEDBACK_LABELED_PATH
+    from utils.feedback_views import VIEW_COLUMNS
+
+    registry.frame(FEEDBACK_LABELED_PATH)
+    registry.frame(FEEDBACK_LABELED_PATH, columns=VIEW_COLUMNS)
+    for record in registry.report():
+        path = record['path'].replace(str(BASE_DIR) + '/', '')
+        print(f"[{record['name']}] {path}  {record['columns']} 列 × {record['rows']} 行  "
+              f"{record['bytes'] / 1e6:.2f} MB  加载 {record['load_seconds']}s")
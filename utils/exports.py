@@ -0,0 +1,188 @@
+"""
+下载导出
+
+下载按钮的数据按需生成：页面把 lazy_export() 返回的函数交给 st.download_button，
+只有用户点击下载时才执行导出；结果按数据版本缓存，数据不变时重复下载不再重新生成。
+
+多个数据集（可按条件筛选）可以打包为 ZIP（CSV 或 Parquet），
+逐块读取、逐块写入 data/.exports/ 下的文件，不会把整份数据同时放进内存；
+可能很大的单表导出（如筛选结果）同样逐块写成文件，不在内存中缓存。
+data/.exports/ 下最多保留最近用到的 16 个文件。
+
+不超过 EAGER_MAX_ROWS 行的导出由 download_data 直接交给下载按钮：按需生成的文件不归任何会话所有，
+其他会话执行脚本后的清理可能在点击与下载之间把它删除（内容相同的导出共用同一个文件），
+直接给出的内容在会话引用期间一直保留。
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+
+from utils.data_store import DATA_DIR, CSV_ENCODING, iter_chunks, source_files
+
+EXPORT_DIR = DATA_DIR / ".exports"
+
+_CACHE_SIZE = 16
+# 不超过这个行数的导出在页面执行时直接生成（内容按数据版本缓存，各会话共用）
+EAGER_MAX_ROWS = 20_000
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def dataset_version(path):
+    """数据版本：文件大小与修改时间（拼接数据集为各源文件的大小与修改时间）"""
+    return '-'.join(f'{stat.st_size}-{stat.st_mtime_ns}' for stat in map(os.stat, source_files(path)))
+
+
+def csv_bytes(df):
+    """DataFrame 转为带 BOM 的 UTF-8 CSV（Excel 打开不乱码）"""
+    return df.to_csv(index=False).encode(CSV_ENCODING)
+
+
+def download_data(export, rows):
+    """交给 st.download_button 的 data：rows 不超过 EAGER_MAX_ROWS 时直接给出内容，否则给出按需生成的函数"""
+    return export() if rows <= EAGER_MAX_ROWS else export
+
+
+def lazy_export(key, build):
+    """返回一个无参函数：首次调用时执行 build() 生成导出内容，之后按 key 复用
+
+    key 应包含数据版本，数据变化后自然生成新的导出。
+    """
+    def export():
+        with _cache_lock:
+            if key in _cache:
+                _cache.move_to_end(key)
+                return _cache[key]
+        data = build()
+        with _cache_lock:
+            _cache[key] = data
+            if len(_cache) > _CACHE_SIZE:
+                _cache.popitem(last=False)
+        return data
+
+    return export
+
+
+def _prune_exports(keep=_CACHE_SIZE):
+    """只保留最近用到（修改时间最新）的 keep 个导出文件"""
+    files = []
+    for path in EXPORT_DIR.iterdir():
+        if path.suffix in ('.zip', '.csv'):
+            try:
+                files.append((path.stat().st_mtime_ns, path))
+            except FileNotFoundError:
+                pass
+    for _mtime, path in sorted(files, reverse=True)[keep:]:
+        path.unlink(missing_ok=True)
+
+
+def _file_export(target, write):
+    """返回 target 的内容；文件不存在时先调用 write(临时路径) 生成"""
+    try:
+        # 更新修改时间，按最近使用保留
+        os.utime(target)
+        return target.read_bytes()
+    except FileNotFoundError:
+        pass
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    # 每个线程写自己的临时文件，完成后原子替换
+    tmp_path = target.with_suffix(f'.{threading.get_ident()}.tmp')
+    write(tmp_path)
+    data = tmp_path.read_bytes()
+    tmp_path.replace(target)
+    _prune_exports()
+    return data
+
+
+def _export_target(parts, suffix):
+    digest = hashlib.sha1(json.dumps(parts, ensure_ascii=False, default=str).encode()).hexdigest()[:20]
+    return EXPORT_DIR / f'{digest}{suffix}'
+
+
+def write_csv(target, df, chunksize=50_000):
+    """DataFrame 按行分块写成带 BOM 的 UTF-8 CSV（与 csv_bytes 的内容相同）"""
+    with open(target, 'w', encoding=CSV_ENCODING, newline='') as f:
+        for start in range(0, max(len(df), 1), chunksize):
+            df.iloc[start:start + chunksize].to_csv(f, index=False, header=start == 0)
+    return target
+
+
+def lazy_csv_export(key, build):
+    """返回一个无参函数：首次调用时把 build() 返回的 DataFrame 分块写入 data/.exports/，之后按 key 复用
+
+    与 lazy_export 相同，key 应包含数据版本；内容保存在文件中，不占用内存缓存。
+    """
+    target = _export_target(['csv', key], '.csv')
+    return lambda: _file_export(target, lambda tmp_path: write_csv(tmp_path, build()))
+
+
+def _write_csv_entry(archive, name, chunks):
+    with archive.open(f'{name}.csv', 'w', force_zip64=True) as raw:
+        with io.TextIOWrapper(raw, encoding=CSV_ENCODING, newline='') as f:
+            header = True
+            for chunk in chunks:
+                chunk.to_csv(f, index=False, header=header)
+                header = False
+
+
+def _write_parquet_entry(archive, name, chunks):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    with archive.open(f'{name}.parquet', 'w', force_zip64=True) as raw:
+        writer = None
+        try:
+            for chunk in chunks:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(raw, table.schema, compression='zstd')
+                writer.write_table(table.cast(writer.schema))
+        finally:
+            if writer is not None:
+                writer.close()
+
+
+def _filtered_chunks(entry, chunksize):
+    predicate = entry.get('where')
+    written = False
+    chunk = None
+    for chunk in iter_chunks(entry['path'], columns=entry.get('columns'), chunksize=chunksize, raw=True):
+        if predicate is not None:
+            chunk = chunk[predicate(chunk)]
+        if len(chunk):
+            written = True
+            yield chunk
+    # 筛选结果为空时仍写出表头 / schema
+    if not written and chunk is not None:
+        yield chunk
+
+
+def write_zip_bundle(target, entries, fmt='csv', chunksize=50_000):
+    """把多个数据集逐块写入 ZIP
+
+    entries: [{'name': 文件名（不含扩展名）, 'path': CSV 路径,
+               'columns': 列（可选）, 'where': chunk -> 布尔掩码（可选）}]
+    fmt: 'csv' 或 'parquet'
+    """
+    write_entry = _write_parquet_entry if fmt == 'parquet' else _write_csv_entry
+    with zipfile.ZipFile(target, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for entry in entries:
+            write_entry(archive, entry['name'], _filtered_chunks(entry, chunksize))
+    return target
+
+
+def lazy_zip_export(entries, fmt='csv', filter_key=''):
+    """返回一个无参函数：首次调用时生成 ZIP 文件，之后按数据版本复用
+
+    filter_key 用于区分同一数据集的不同筛选条件（如 'brand=vivo'）。
+    返回值是 ZIP 文件的内容（bytes），可直接交给 st.download_button。
+    """
+    versions = [(entry['name'], str(entry['path']), entry.get('columns'), dataset_version(entry['path']))
+                for entry in entries]
+    target = _export_target([versions, fmt, filter_key], '.zip')
+    return lambda: _file_export(target, lambda tmp_path: write_zip_bundle(tmp_path, entries, fmt=fmt))
@@ -0,0 +1,186 @@
+"""
+用户反馈倒排索引
+
+为反馈数据的分类列（version、brand、device_model、app_name、feedback_type、label、
+反馈月份、反馈日期）建立「取值 → 行号」倒排表，组合筛选时把各列选中取值的行号
+合并为位图（每行 1 位）再按位与，不需要对整张表逐列做布尔比较。
+百万行数据上的组合筛选在几十毫秒内完成。
+
+索引保存在 data/.index/feedback/ 下，带源文件指纹，源文件变化时自动重建。
+
+    index = load_or_build(FEEDBACK_LABELED_PATH)
+    rows = index.query({'brand': ['vivo'], 'label': ['翻译不准确'], 'feedback_month': ['2025-05']})
+"""
+
+import json
+from functools import lru_cache
+from pathlib import Path
+
+from utils.bits import popcount
+from utils.data_store import DATA_DIR, file_fingerprint, fingerprint_matches, read_dataset
+from utils.lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+INDEX_DIR = DATA_DIR / ".index" / "feedback"
+INDEX_VERSION = 1
+
+SOURCE_COLUMNS = ['version', 'brand', 'device_model', 'app_name', 'feedback_type', 'label', 'feedback_date']
+# feedback_date 形如 2025-05-01 04:10:19，按月、按天两级建索引
+INDEX_COLUMNS = ['version', 'brand', 'device_model', 'app_name', 'feedback_type', 'label',
+                 'feedback_month', 'feedback_day']
+MISSING_VALUE = '(空)'
+
+
+def _index_frame(df):
+    """原始列转为建索引用的字符串列"""
+    columns = {}
+    for column in SOURCE_COLUMNS:
+        if column == 'feedback_date':
+            dates = df[column].astype('string')
+            columns['feedback_month'] = dates.str[:7]
+            columns['feedback_day'] = dates.str[:10]
+        else:
+            columns[column] = df[column].astype('string')
+    return pd.DataFrame(columns).fillna(MISSING_VALUE)
+
+
+class FeedbackIndex:
+    """分类列倒排索引
+
+    每列存三个数组：values（取值，按行数降序）、order（按取值分组后的行号）、
+    offsets（每个取值在 order 中的起止位置）。
+    """
+
+    def __init__(self, n_rows, columns):
+        self.n_rows = n_rows
+        self.columns = columns
+        self._positions = {name: {value: i for i, value in enumerate(data['values'])}
+                           for name, data in columns.items()}
+        self._bitmap = lru_cache(maxsize=256)(self._build_bitmap)
+
+    @classmethod
+    def build(cls, df):
+        """从 DataFrame 构建索引（行号即 df 的行位置）"""
+        frame = _index_frame(df)
+        columns = {}
+        for name in INDEX_COLUMNS:
+            codes, uniques = pd.factorize(frame[name])
+            counts = np.bincount(codes, minlength=len(uniques))
+            # 取值按行数降序，筛选面板中常见取值排在前面
+            rank = np.argsort(-counts, kind='stable')
+            remap = np.empty_like(rank)
+            remap[rank] = np.arange(len(rank))
+            codes = remap[codes]
+            order = np.argsort(codes, kind='stable').astype(np.int32)
+            offsets = np.concatenate([[0], np.cumsum(counts[rank])])
+            columns[name] = {'values': np.asarray(uniques, dtype=object)[rank], 'order': order, 'offsets': offsets}
+        return cls(len(frame), columns)
+
+    def save(self, path, source_fingerprint):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {}
+        for name, data in self.columns.items():
+            arrays[f'{name}.values'] = data['values'].astype(str)
+            arrays[f'{name}.order'] = data['order']
+            arrays[f'{name}.offsets'] = data['offsets']
+        tmp_path = path.with_suffix('.tmp.npz')
+        np.savez(tmp_path, **arrays)
+        tmp_path.replace(path)
+        meta = {'version': INDEX_VERSION, 'n_rows': self.n_rows, 'source': source_fingerprint}
+        tmp_path = path.with_suffix('.tmp.json')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=1)
+        tmp_path.replace(path.with_suffix('.json'))
+
+    @classmethod
+    def load(cls, path):
+        with open(Path(path).with_suffix('.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        with np.load(path) as arrays:
+            columns = {name: {'values': arrays[f'{name}.values'].astype(object),
+                              'order': arrays[f'{name}.order'],
+                              'offsets': arrays[f'{name}.offsets']}
+                       for name in INDEX_COLUMNS}
+        return cls(meta['n_rows'], columns), meta
+
+    def values(self, column):
+        """某列的全部取值（按行数降序）"""
+        return list(self.columns[column]['values'])
+
+    def value_counts(self, column):
+        data = self.columns[column]
+        return dict(zip(data['values'], np.diff(data['offsets']).tolist()))
+
+    def rows(self, column, value):
+        """某列等于 value 的行号（升序）"""
+        position = self._positions[column].get(value)
+        if position is None:
+            return np.empty(0, dtype=np.int32)
+        data = self.columns[column]
+        return data['order'][data['offsets'][position]:data['offsets'][position + 1]]
+
+    def _build_bitmap(self, column, value):
+        hit = np.zeros(self.n_rows, dtype=bool)
+        hit[self.rows(column, value)] = True
+        return np.packbits(hit)
+
+    def bitmap(self, column, values):
+        """某列取值属于 values 的行的位图"""
+        bitmaps = [self._bitmap(column, value) for value in values]
+        if not bitmaps:
+            return np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+        return np.bitwise_or.reduce(bitmaps) if len(bitmaps) > 1 else bitmaps[0]
+
+    def query_bitmap(self, filters):
+        """filters: {列名: [取值, ...]}；空列表表示该列不限"""
+        result = None
+        for column, values in filters.items():
+            if not values:
+                continue
+            bits = self.bitmap(column, tuple(values))
+            result = bits if result is None else result & bits
+        return result
+
+    def query(self, filters):
+        """满足全部筛选条件的行号（升序）；没有任何条件时返回全部行"""
+        bits = self.query_bitmap(filters)
+        if bits is None:
+            return np.arange(self.n_rows)
+        return np.flatnonzero(np.unpackbits(bits, count=self.n_rows))
+
+    def count(self, filters):
+        bits = self.query_bitmap(filters)
+        return self.n_rows if bits is None else int(popcount(bits))
+
+
+def index_path_for(csv_path):
+    return INDEX_DIR / f'{Path(csv_path).stem}.npz'
+
+
+def load_or_build(csv_path):
+    """读取索引；缺失、版本不符或源文件变化时重新构建并尽量写回"""
+    path = index_path_for(csv_path)
+    if path.exists():
+        try:
+            index, meta = FeedbackIndex.load(path)
+            if meta.get('version') == INDEX_VERSION and fingerprint_matches(csv_path, meta['source']):
+                return index
+        except (OSError, ValueError, KeyError):
+            pass
+
+    index = FeedbackIndex.build(read_dataset(csv_path, columns=SOURCE_COLUMNS))
+    try:
+        index.save(path, file_fingerprint(csv_path))
+    except OSError:
+        pass
+    return index
+
+
+if __name__ == '__main__':
+    from utils.data_store import BASE_DIR, FEEDBACK_LABELED_PATH
+
+    load_or_build(FEEDBACK_LABELED_PATH)
+    print(index_path_for(FEEDBACK_LABELED_PATH).relative_to(BASE_DIR))
@@ -0,0 +1,52 @@
+"""
+用户反馈标签分组
+
+页面表格、流式聚合、明细视图共用同一套分组定义。
+"""
+
+# 定义标签分组
+TRANSLATION_QUALITY_LABELS = ['翻译不准确', '翻译不完整', '翻译语言错误']
+PRONUNCIATION_LABELS = ['发音不准确', '朗读不自然', '朗读功能优化', '朗读卡顿重复',
+                        '朗读速度问题', '缺少中文朗读', '发音朗读问题', 'Audio_Issues']
+SUGGESTION_LABELS = ['翻译语言扩展', '功能需求', '其他功能需求', '单词本收藏',
+                     '句子分析', '历史记录', 'Feature_Requests']
+UNCLASSIFIED_LABEL = '无法分类'
+SATISFIED_LABEL = '满意表扬'
+
+# 问题分布表的分组顺序；未命中任何分组的标签归入"其他问题"
+LABEL_GROUPS = {
+    '翻译质量问题': TRANSLATION_QUALITY_LABELS,
+    '其他/无法分类': [UNCLASSIFIED_LABEL],
+    '满意反馈': [SATISFIED_LABEL],
+    '发音朗读问题': PRONUNCIATION_LABELS,
+    '产品建议': SUGGESTION_LABELS,
+}
+OTHER_GROUP = '其他问题'
+
+# 模型打标时可选的标签（英文标签为早期打标遗留，不再使用）
+LABELING_LABELS = (
+    TRANSLATION_QUALITY_LABELS
+    + ['识别不全', 'OCR识别错误', '识别问题', '词组识别', '识别优化']
+    + [label for label in PRONUNCIATION_LABELS if label != 'Audio_Issues']
+    + [label for label in SUGGESTION_LABELS if label != 'Feature_Requests']
+    + ['界面交互问题', '结果展示问题', '速度慢卡顿', '体验问题',
+       SATISFIED_LABEL, '其他', UNCLASSIFIED_LABEL]
+)
+
+_LABEL_TO_GROUP = {label: group for group, labels in LABEL_GROUPS.items() for label in labels}
+
+
+def label_group(label):
+    """标签所属分组"""
+    return _LABEL_TO_GROUP.get(label, OTHER_GROUP)
+
+
+def group_counts(label_counts, total):
+    """由标签计数汇总出各分组数量
+
+    "其他问题"按总数减去已命名分组计算，缺失标签的行也计入其中。
+    """
+    counts = {group: sum(int(label_counts.get(label, 0)) for label in labels)
+              for group, labels in LABEL_GROUPS.items()}
+    counts[OTHER_GROUP] = int(total) - sum(counts.values())
+    return counts
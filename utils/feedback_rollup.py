@@ -0,0 +1,94 @@
+"""
+反馈标签时间序列（标签 × 天）
+
+快照中只存一份按天的「标签 × 天」计数矩阵（从最早一天起逐日连续，没有反馈的天为 0），
+周、月汇总和标签分组汇总都由它推导。页面画趋势图时只读这份矩阵，
+不接触原始行，也不再解析 feedback_date 字符串。
+
+    cube = LabelCube(snapshot['feedback']['label_days'])
+    cube.groups('week')['翻译质量问题']
+"""
+
+from collections import Counter
+from datetime import date, timedelta
+
+from utils.feedback_labels import LABEL_GROUPS, label_group
+from utils.lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+FREQUENCIES = {'day': '日', 'week': '周', 'month': '月'}
+
+
+def encode_cube(label_daily_counts):
+    """{(标签, 日期): 数量} 转为快照中的紧凑结构
+
+    {'start': 最早日期, 'labels': [按总数降序的标签], 'counts': [[每个标签逐日的数量], ...]}
+    """
+    if not label_daily_counts:
+        return {'start': None, 'labels': [], 'counts': []}
+    days = sorted({day for _label, day in label_daily_counts})
+    start = date.fromisoformat(days[0])
+    n_days = (date.fromisoformat(days[-1]) - start).days + 1
+    totals = Counter()
+    for (label, _day), count in label_daily_counts.items():
+        totals[label] += count
+    labels = [label for label, _count in sorted(totals.items(), key=lambda item: (-item[1], item[0]))]
+    position = {label: i for i, label in enumerate(labels)}
+    counts = [[0] * n_days for _ in labels]
+    for (label, day), count in label_daily_counts.items():
+        counts[position[label]][(date.fromisoformat(day) - start).days] = int(count)
+    return {'start': days[0], 'labels': labels, 'counts': counts}
+
+
+def decode_cube(cube):
+    """encode_cube 的逆过程，返回 {(标签, 日期): 数量}（只含非零项）"""
+    decoded = Counter()
+    if not cube['labels']:
+        return decoded
+    start = date.fromisoformat(cube['start'])
+    for label, row in zip(cube['labels'], cube['counts']):
+        for offset, count in enumerate(row):
+            if count:
+                decoded[(label, (start + timedelta(days=offset)).isoformat())] = count
+    return decoded
+
+
+class LabelCube:
+    """标签 × 天计数矩阵及其周、月汇总"""
+
+    def __init__(self, cube):
+        self.labels = list(cube['labels'])
+        # 没有反馈时 counts 为空列表，按 0 天处理
+        self.counts = np.asarray(cube['counts'], dtype=np.int32).reshape(len(self.labels), -1 if self.labels else 0)
+        n_days = self.counts.shape[1]
+        self.dates = pd.date_range(cube['start'], periods=n_days) if n_days else pd.DatetimeIndex([])
+
+    def _period_starts(self, freq):
+        """每个周期在逐日序列中的起始位置及周期起始日期（周从周一开始）"""
+        if freq == 'day':
+            return np.arange(len(self.dates)), self.dates
+        if freq == 'week':
+            keys = (np.arange(len(self.dates)) + self.dates[0].dayofweek) // 7 if len(self.dates) else np.zeros(0)
+            period_dates = self.dates - pd.to_timedelta(self.dates.dayofweek, unit='D')
+        elif freq == 'month':
+            keys = self.dates.year * 12 + self.dates.month
+            period_dates = self.dates.to_period('M').to_timestamp()
+        else:
+            raise ValueError(f'不支持的粒度：{freq}')
+        starts = np.flatnonzero(np.r_[True, np.diff(np.asarray(keys)) != 0]) if len(self.dates) else np.zeros(0, int)
+        return starts, period_dates[starts]
+
+    def rollup(self, freq='day'):
+        """按 day / week / month 汇总，返回 DataFrame（行为周期起始日期，列为标签）"""
+        starts, index = self._period_starts(freq)
+        values = np.add.reduceat(self.counts, starts, axis=1) if len(starts) else self.counts[:, :0]
+        return pd.DataFrame(values.T, index=index, columns=self.labels)
+
+    def groups(self, freq='day'):
+        """按标签分组汇总（分组定义见 utils/feedback_labels.py），列顺序同问题分布表"""
+        by_label = self.rollup(freq)
+        grouped = by_label.T.groupby([label_group(label) for label in by_label.columns]).sum().T
+        columns = [group for group in list(LABEL_GROUPS) + [g for g in grouped.columns if g not in LABEL_GROUPS]]
+        return grouped.reindex(columns=columns, fill_value=0)
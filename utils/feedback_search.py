@@ -0,0 +1,356 @@
+"""
+用户反馈全文检索
+
+对 feedback_content 建立字符二元组（bigram）倒排索引，关键词/短语查询先按 bigram 求交得到候选行，
+再用原文确认短语确实出现，最后按 BM25 打分排序，百万行数据上毫秒级返回。
+
+索引按段（segment）保存在 data/.index/search/<数据文件名>/ 下：首次全量构建，
+之后数据文件只在末尾追加新反馈时只为新增行建一个增量段，段数过多时合并；
+每个段记录所含行的 feedback_id 与文本指纹，已有行的 ID 或文本发生变化时全量重建。
+
+    index = load_or_update(FEEDBACK_LABELED_PATH)
+    rows, scores = index.search('日语 单词本', contents)
+
+构建 / 更新命令：
+    python -m utils.feedback_search [CSV 路径]
+"""
+
+import hashlib
+import json
+import math
+import shutil
+from pathlib import Path
+
+from utils.data_store import DATA_DIR, read_dataset
+from utils.lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+INDEX_DIR = DATA_DIR / ".index" / "search"
+INDEX_VERSION = 2
+TEXT_COLUMN = 'feedback_content'
+ID_COLUMN = 'feedback_id'
+MAX_SEGMENTS = 8
+# BM25 参数
+K1 = 1.2
+B = 0.75
+
+_CHAR_BITS = 21  # Unicode 码位不超过 21 位
+
+
+def normalize(texts):
+    """全角转半角、英文小写"""
+    return pd.Series(texts, dtype='string').fillna('').str.normalize('NFKC').str.lower()
+
+
+def _is_term_char(char):
+    return char.isalnum()
+
+
+def _bigram_keys(text):
+    """单个字符串的 bigram 编码（不跨越空白和标点）"""
+    keys = []
+    for a, b in zip(text, text[1:]):
+        if _is_term_char(a) and _is_term_char(b):
+            keys.append((ord(a) << _CHAR_BITS) | ord(b))
+    return keys
+
+
+def build_segment(texts, first_doc):
+    """为一批文本建一个段；文档号从 first_doc 开始连续编号
+
+    全部文本拼成一个码位数组，向量化生成 (bigram, 文档) 对后排序去重。
+    """
+    texts = normalize(texts)
+    lengths = texts.str.len().to_numpy(dtype=np.int64)
+    joined = '\x00'.join(texts.tolist()) + '\x00'
+    codes = np.frombuffer(joined.encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+    docs = np.repeat(np.arange(len(texts), dtype=np.int64), lengths + 1)
+
+    unique_codes = np.unique(codes)
+    valid_codes = unique_codes[[_is_term_char(chr(code)) for code in unique_codes]]
+    valid = np.isin(codes, valid_codes)
+    pair = valid[:-1] & valid[1:]
+    # 前后都不是文字的单字（如单独的字母）无法组成 bigram，以 (字, 0) 单独记录
+    isolated = valid & ~np.r_[False, pair] & ~np.r_[pair, False]
+    keys = np.concatenate([(codes[:-1][pair] << _CHAR_BITS) | codes[1:][pair], codes[isolated] << _CHAR_BITS])
+    pair_docs = np.concatenate([docs[:-1][pair], docs[isolated]])
+
+    doc_lengths = np.bincount(pair_docs, minlength=len(texts)).astype(np.int32)
+    # 按 (bigram, 文档) 排序去重，重复次数即词频
+    order = np.lexsort((pair_docs, keys))
+    keys, pair_docs = keys[order], pair_docs[order]
+    if len(keys):
+        boundary = np.r_[True, (keys[1:] != keys[:-1]) | (pair_docs[1:] != pair_docs[:-1])]
+        starts = np.flatnonzero(boundary)
+        tf = np.diff(np.r_[starts, len(keys)]).astype(np.uint16)
+        keys, pair_docs = keys[starts], pair_docs[starts]
+    else:
+        tf = np.zeros(0, dtype=np.uint16)
+    terms, term_starts = np.unique(keys, return_index=True)
+    return {
+        'terms': terms,
+        'offsets': np.r_[term_starts, len(keys)].astype(np.int64),
+        'docs': (pair_docs + first_doc).astype(np.int32),
+        'tf': tf,
+        'doc_lengths': doc_lengths,
+        'first_doc': first_doc,
+    }
+
+
+def merge_segments(segments):
+    """把多个段合并为一个（文档号已是全局编号，直接拼接后按 bigram 稳定排序）"""
+    terms = np.concatenate([np.repeat(s['terms'], np.diff(s['offsets'])) for s in segments])
+    docs = np.concatenate([s['docs'] for s in segments])
+    tf = np.concatenate([s['tf'] for s in segments])
+    order = np.argsort(terms, kind='stable')
+    terms, docs, tf = terms[order], docs[order], tf[order]
+    unique_terms, term_starts = np.unique(terms, return_index=True)
+    return {
+        'terms': unique_terms,
+        'offsets': np.r_[term_starts, len(terms)].astype(np.int64),
+        'docs': docs,
+        'tf': tf,
+        'doc_lengths': np.concatenate([s['doc_lengths'] for s in segments]),
+        'first_doc': segments[0]['first_doc'],
+    }
+
+
+def _intersect_sorted(a, b):
+    """两个升序、无重复数组的交集：短数组在长数组中二分查找"""
+    if len(a) > len(b):
+        a, b = b, a
+    if not len(a):
+        return a
+    position = np.searchsorted(b, a)
+    position[position >= len(b)] = len(b) - 1
+    return a[b[position] == a]
+
+
+class SearchIndex:
+    """由若干段组成的 bigram 倒排索引"""
+
+    def __init__(self, segments, doc_ids):
+        self.segments = segments
+        self.doc_ids = doc_ids
+        self.n_docs = len(doc_ids)
+        self.doc_lengths = (np.concatenate([s['doc_lengths'] for s in segments])
+                            if segments else np.zeros(0, dtype=np.int32))
+        self.avg_length = float(self.doc_lengths.mean()) if self.n_docs else 0.0
+
+    def postings(self, key):
+        """某个 bigram 的 (文档号, 词频)，跨段拼接"""
+        docs, tfs = [], []
+        for segment in self.segments:
+            position = np.searchsorted(segment['terms'], key)
+            if position < len(segment['terms']) and segment['terms'][position] == key:
+                start, end = segment['offsets'][position], segment['offsets'][position + 1]
+                docs.append(segment['docs'][start:end])
+                tfs.append(segment['tf'][start:end])
+        if not docs:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.uint16)
+        return np.concatenate(docs), np.concatenate(tfs)
+
+    def _single_char_postings(self, char):
+        """单字查询：包含该字的所有 bigram 及单独出现的该字的并集"""
+        code = ord(char)
+        matched = np.zeros(self.n_docs, dtype=bool)
+        for segment in self.segments:
+            terms = segment['terms']
+            positions = np.flatnonzero(((terms >> _CHAR_BITS) == code) | ((terms & ((1 << _CHAR_BITS) - 1)) == code))
+            starts, ends = segment['offsets'][positions], segment['offsets'][positions + 1]
+            lengths = ends - starts
+            # 各倒排表在 docs 中的区间展开为下标
+            index = np.repeat(starts - np.cumsum(np.r_[0, lengths[:-1]]), lengths) + np.arange(lengths.sum())
+            matched[segment['docs'][index]] = True
+        return np.flatnonzero(matched).astype(np.int32)
+
+    def search(self, query, contents=None, limit=None):
+        """检索，返回 (行号数组, 分数数组)，按分数降序
+
+        query 按空白切分为多个关键词，所有关键词都要出现；
+        传入 contents（按行号可取原文）时再确认关键词原样出现，排除 bigram 拼凑出的误命中。
+        """
+        keywords = [kw for kw in normalize([query])[0].split() if kw]
+        if not keywords or not self.n_docs:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+
+        candidates = None
+        scores = np.zeros(self.n_docs)
+        for keyword in keywords:
+            keys = sorted(set(_bigram_keys(keyword)))
+            if not keys:
+                # 单字或只有标点：按包含该字的 bigram 取候选，不参与打分
+                matched = None
+                for char in keyword:
+                    if _is_term_char(char):
+                        docs = self._single_char_postings(char)
+                        matched = docs if matched is None else _intersect_sorted(matched, docs)
+                if matched is None:
+                    continue
+                candidates = matched if candidates is None else _intersect_sorted(candidates, matched)
+                continue
+            for key in keys:
+                docs, tf = self.postings(key)
+                candidates = docs if candidates is None else _intersect_sorted(candidates, docs)
+                if not len(docs):
+                    break
+                idf = math.log(1 + (self.n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                norm = K1 * (1 - B + B * self.doc_lengths[docs] / max(self.avg_length, 1e-9))
+                scores[docs] += idf * tf * (K1 + 1) / (tf + norm)
+            if candidates is not None and not len(candidates):
+                break
+
+        if candidates is None or not len(candidates):
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        rows = candidates.astype(np.int64)
+        # 两个字的关键词由 bigram 精确命中；更长或含标点的关键词才需要对原文确认
+        to_verify = [kw for kw in keywords if len(kw) > 2 or not all(_is_term_char(c) for c in kw)]
+        if contents is not None and to_verify:
+            texts = normalize([contents[row] for row in rows]).tolist()
+            keep = [all(keyword in text for keyword in to_verify) for text in texts]
+            rows = rows[np.asarray(keep, dtype=bool)]
+        order = np.argsort(-scores[rows], kind='stable')
+        if limit is not None:
+            order = order[:limit]
+        return rows[order], scores[rows[order]]
+
+
+# ===== 持久化与增量更新 =====
+
+def index_dir_for(csv_path):
+    return INDEX_DIR / Path(csv_path).stem
+
+
+def _save_segment(index_dir, number, segment):
+    path = index_dir / f'segment_{number:04d}.npz'
+    np.savez(path, **{key: value for key, value in segment.items() if key != 'first_doc'},
+             first_doc=np.int64(segment['first_doc']))
+    return path.name
+
+
+def content_fingerprint(texts):
+    """一批文本的内容指纹（逐行哈希后整体取 SHA-1）"""
+    hashes = pd.util.hash_pandas_object(pd.Series(texts, dtype='string').fillna(''), index=False)
+    return hashlib.sha1(hashes.to_numpy().tobytes()).hexdigest()
+
+
+def _load_segment(path):
+    with np.load(path) as arrays:
+        segment = {key: arrays[key] for key in arrays.files}
+    segment['first_doc'] = int(segment['first_doc'])
+    return segment
+
+
+def save_index(index, index_dir, fingerprints):
+    """全量写出，旧文件一并清除；fingerprints 为各段文本的 content_fingerprint"""
+    index_dir = Path(index_dir)
+    if index_dir.exists():
+        shutil.rmtree(index_dir)
+    index_dir.mkdir(parents=True)
+    names = [_save_segment(index_dir, i, segment) for i, segment in enumerate(index.segments)]
+    _save_doc_ids(index_dir, index.doc_ids)
+    _write_meta(index_dir, names, fingerprints)
+
+
+def _save_doc_ids(index_dir, doc_ids):
+    tmp_path = index_dir / 'doc_ids.tmp.npy'
+    np.save(tmp_path, doc_ids)
+    tmp_path.replace(index_dir / 'doc_ids.npy')
+
+
+def _write_meta(index_dir, segment_names, fingerprints):
+    meta = {'version': INDEX_VERSION, 'segments': segment_names, 'fingerprints': fingerprints}
+    tmp_path = index_dir / 'meta.json.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=1)
+    tmp_path.replace(index_dir / 'meta.json')
+
+
+def load_index(index_dir):
+    index_dir = Path(index_dir)
+    with open(index_dir / 'meta.json', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('version') != INDEX_VERSION or len(meta['fingerprints']) != len(meta['segments']):
+        raise ValueError(f'索引版本不符：{meta.get("version")}')
+    segments = [_load_segment(index_dir / name) for name in meta['segments']]
+    doc_ids = np.load(index_dir / 'doc_ids.npy')
+    # doc_ids 与 meta.json 分别替换，中途中断时两者可能不一致
+    if sum(len(segment['doc_lengths']) for segment in segments) != len(doc_ids):
+        raise ValueError('索引文件不一致')
+    return SearchIndex(segments, doc_ids), meta
+
+
+def build_index(ids, texts):
+    return SearchIndex([build_segment(texts, 0)], np.asarray(ids))
+
+
+def _segment_bounds(index):
+    for segment in index.segments:
+        yield segment['first_doc'], segment['first_doc'] + len(segment['doc_lengths'])
+
+
+def _prefix_matches(index, meta, ids, texts):
+    """数据文件开头的行（ID 与文本）是否与索引中各段一致"""
+    if len(ids) < index.n_docs or not np.array_equal(ids[:index.n_docs], index.doc_ids):
+        return False
+    return all(content_fingerprint(texts.iloc[start:end]) == fingerprint
+               for (start, end), fingerprint in zip(_segment_bounds(index), meta['fingerprints']))
+
+
+def load_or_update(csv_path, index_dir=None):
+    """读取索引并与数据文件同步
+
+    数据文件开头的行与索引各段的 feedback_id、文本指纹都一致时只为新增行建增量段，否则全量重建。
+    """
+    index_dir = Path(index_dir) if index_dir else index_dir_for(csv_path)
+    frame = read_dataset(csv_path, columns=[ID_COLUMN, TEXT_COLUMN])
+    ids, texts = frame[ID_COLUMN].to_numpy(), frame[TEXT_COLUMN]
+
+    index = meta = None
+    if (index_dir / 'meta.json').exists():
+        try:
+            index, meta = load_index(index_dir)
+        except (OSError, ValueError, KeyError):
+            index = None
+
+    if index is not None and _prefix_matches(index, meta, ids, texts):
+        if len(ids) == index.n_docs:
+            return index
+        new_texts = texts.iloc[index.n_docs:]
+        segments = index.segments + [build_segment(new_texts, index.n_docs)]
+        updated = SearchIndex(segments, ids)
+        try:
+            if len(segments) > MAX_SEGMENTS:
+                updated = SearchIndex([merge_segments(segments)], ids)
+                save_index(updated, index_dir, [content_fingerprint(texts)])
+            else:
+                name = _save_segment(index_dir, len(meta['segments']), segments[-1])
+                _save_doc_ids(index_dir, ids)
+                _write_meta(index_dir, meta['segments'] + [name],
+                            meta['fingerprints'] + [content_fingerprint(new_texts)])
+        except OSError:
+            pass
+        return updated
+
+    index = build_index(ids, texts)
+    try:
+        save_index(index, index_dir, [content_fingerprint(texts)])
+    except OSError:
+        # 只读部署环境下仍可使用内存中的索引
+        pass
+    return index
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    from utils.data_store import BASE_DIR, FEEDBACK_LABELED_PATH
+
+    csv_path = Path(sys.argv[1]) if len(sys.argv) > 1 else FEEDBACK_LABELED_PATH
+    started = time.perf_counter()
+    index = load_or_update(csv_path)
+    print(f'{index.n_docs} 条反馈，{len(index.segments)} 个段，{time.perf_counter() - started:.1f}s -> '
+          f'{index_dir_for(csv_path).relative_to(BASE_DIR)}')
@@ -0,0 +1,69 @@
+"""
+用户反馈流式聚合
+
+按固定行数分块读取反馈数据，逐块累加标签计数、分组合计、按天计数、标签 × 天计数
+和各版本的反馈数与首次出现日期，内存占用只与块大小和标签/日期/版本的取值个数有关，与总行数无关。
+"""
+
+from collections import Counter
+from dataclasses import dataclass, field
+
+from utils.data_store import iter_chunks
+from utils.feedback_labels import group_counts
+from utils.lazy_imports import lazy_import
+
+pd = lazy_import('pandas')
+
+# 聚合只需要这几列
+AGGREGATE_COLUMNS = ['label', 'feedback_date', 'version']
+DEFAULT_CHUNKSIZE = 100_000
+MISSING_LABEL = '(空)'
+
+
+@dataclass
+class FeedbackSummary:
+    """反馈聚合结果"""
+    total: int = 0
+    label_counts: Counter = field(default_factory=Counter)
+    daily_counts: Counter = field(default_factory=Counter)
+    label_daily_counts: Counter = field(default_factory=Counter)   # (标签, 日期) → 数量
+    version_counts: Counter = field(default_factory=Counter)
+    version_first_seen: dict = field(default_factory=dict)         # 版本 → 最早反馈日期
+
+    def update(self, chunk):
+        """累加一块数据"""
+        self.total += len(chunk)
+        # label / version 按 category 读入时转回字符串，避免计入本块未出现的类别
+        versions = chunk['version'].astype('string')
+        self.label_counts.update(chunk['label'].astype('string').value_counts().to_dict())
+        # feedback_date 形如 2025-05-01 04:10:19，取前 10 位即日期
+        days = chunk['feedback_date'].astype('string').str[:10]
+        self.daily_counts.update(days.dropna().value_counts().to_dict())
+        # 缺失标签的行也计入标签 × 天，按分组汇总时与 group_counts 一样归入"其他问题"
+        labels = chunk['label'].astype('string').fillna(MISSING_LABEL)
+        self.label_daily_counts.update(chunk.groupby([labels, days]).size().to_dict())
+        self.version_counts.update(versions.value_counts().to_dict())
+        for version, day in chunk['feedback_date'].groupby(versions).min().astype(str).str[:10].items():
+            if version not in self.version_first_seen or day < self.version_first_seen[version]:
+                self.version_first_seen[version] = day
+
+    @property
+    def group_counts(self):
+        """各分组数量"""
+        return group_counts(self.label_counts, self.total)
+
+    def label_series(self):
+        """按数量降序的标签计数，与 value_counts() 结果一致"""
+        return pd.Series(dict(self.label_counts.most_common()), name='count', dtype='int64')
+
+    def daily_series(self):
+        """按日期排序的每日反馈数"""
+        return pd.Series(dict(sorted(self.daily_counts.items())), name='count', dtype='int64')
+
+
+def aggregate_feedback(feedback_path, chunksize=DEFAULT_CHUNKSIZE):
+    """流式聚合反馈数据"""
+    summary = FeedbackSummary()
+    for chunk in iter_chunks(feedback_path, columns=AGGREGATE_COLUMNS, chunksize=chunksize):
+        summary.update(chunk)
+    return summary
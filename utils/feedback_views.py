@@ -0,0 +1,81 @@
+"""
+用户反馈明细视图
+
+发音朗读问题、产品建议两份明细就是已打标反馈中对应标签分组（utils/feedback_labels.py）的行，
+这里把它们定义为已打标反馈上的视图，不再单独读取明细 CSV：
+行号由倒排索引（utils/feedback_index.py）的 label 列求并得到，再从同一份数据中取出明细列。
+三份数据因此不会不一致；明细 CSV 只作为导出产物，需要时重新生成：
+
+    python -m utils.feedback_views
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+
+from utils.data_store import (
+    FEEDBACK_LABELED_PATH, PRONUNCIATION_DETAIL_PATH, SUGGESTION_DETAIL_PATH, CSV_ENCODING, iter_chunks,
+)
+from utils.feedback_labels import LABEL_GROUPS
+
+# 明细列（与原明细 CSV 相同）
+VIEW_COLUMNS = ['feedback_date', 'feedback_content', 'label', 'scene']
+
+
+@dataclass(frozen=True)
+class FeedbackView:
+    """已打标反馈中某个标签分组的明细"""
+    name: str       # 导出文件名（不含扩展名）
+    group: str      # LABEL_GROUPS 中的分组
+    path: Path      # 导出的明细 CSV
+
+    @property
+    def labels(self):
+        return LABEL_GROUPS[self.group]
+
+    def rows(self, index):
+        """视图在已打标反馈中的行号（升序，即原文件顺序）"""
+        return index.query({'label': self.labels})
+
+    def select(self, frame, index):
+        """从已打标反馈（至少含 VIEW_COLUMNS）中取出视图的行"""
+        view = frame.iloc[self.rows(index)][VIEW_COLUMNS].reset_index(drop=True)
+        if view['label'].dtype == 'category':
+            view['label'] = view['label'].cat.remove_unused_categories()
+        return view
+
+    def where(self, chunk):
+        """分块导出用的筛选条件"""
+        return chunk['label'].isin(self.labels)
+
+    def zip_entry(self, source=FEEDBACK_LABELED_PATH):
+        """utils.exports.write_zip_bundle 的条目"""
+        return {'name': self.name, 'path': source, 'columns': VIEW_COLUMNS, 'where': self.where}
+
+
+PRONUNCIATION_VIEW = FeedbackView('发音朗读问题详细数据', '发音朗读问题', PRONUNCIATION_DETAIL_PATH)
+SUGGESTION_VIEW = FeedbackView('产品建议详细数据', '产品建议', SUGGESTION_DETAIL_PATH)
+VIEWS = {'pronunciation': PRONUNCIATION_VIEW, 'suggestion': SUGGESTION_VIEW}
+
+
+def write_view(view, source=FEEDBACK_LABELED_PATH, output_path=None, chunksize=100_000):
+    """按视图分块筛选已打标反馈，写出明细 CSV，返回行数"""
+    output_path = Path(output_path or view.path)
+    tmp_path = output_path.with_suffix('.csv.tmp')
+    first, written = True, 0
+    # 原样读取，导出的明细与已打标 CSV 中对应行的文本一致
+    for chunk in iter_chunks(source, columns=VIEW_COLUMNS, chunksize=chunksize, raw=True):
+        chunk = chunk[view.where(chunk)]
+        chunk.to_csv(tmp_path, mode='w' if first else 'a', header=first, index=False,
+                     encoding=CSV_ENCODING if first else 'utf-8')
+        first = False
+        written += len(chunk)
+    tmp_path.replace(output_path)
+    return written
+
+
+if __name__ == '__main__':
+    from utils.data_store import BASE_DIR
+
+    for view in VIEWS.values():
+        count = write_view(view)
+        print(f'{view.path.relative_to(BASE_DIR)}：{count} 条')
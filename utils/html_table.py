@@ -0,0 +1,104 @@
+"""
+HTML 表格渲染
+
+按列数组一次性生成页面中居中、固定列宽的 HTML 表格，高亮行、加粗单元格、列宽均为声明式参数。
+渲染结果按数据与参数的哈希缓存，数据不变时重复渲染直接返回缓存。
+
+    html = render_table(
+        {'问题类型': [...], '占比': [...]},
+        widths=['40%', '60%'],
+        highlight={'column': '问题类型', 'value': '翻译质量问题', 'style': 'background-color: #ffebee;'},
+        bold={'columns': ['占比'], 'where': ('问题类型', '翻译质量问题')},
+    )
+"""
+
+import hashlib
+import pickle
+import threading
+from collections import OrderedDict
+
+TABLE_STYLE = 'width:100%; border-collapse: collapse; text-align: center; table-layout: fixed;'
+HEADER_ROW_STYLE = 'background-color: #f0f2f6;'
+TH_STYLE = 'padding: 12px; border: 1px solid #ddd;'
+TD_STYLE = 'padding: 10px; border: 1px solid #ddd;'
+BOLD_STYLE = 'font-weight: 700;'
+
+_CACHE_SIZE = 64
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _match_mask(columns, column, value, n_rows):
+    if column is None:
+        return [False] * n_rows
+    return [cell == value for cell in columns[column]]
+
+
+def _render(columns, widths, highlight, bold, header_style):
+    names = list(columns)
+    n_rows = len(columns[names[0]]) if names else 0
+
+    # 表头
+    th_styles = [
+        ' '.join(part for part in (TH_STYLE, f'width: {widths[i]};' if widths else '', header_style) if part)
+        for i in range(len(names))
+    ]
+    header = ''.join(f'<th style="{style}">{name}</th>' for style, name in zip(th_styles, names))
+
+    # 行样式
+    highlight = highlight or {}
+    highlighted = _match_mask(columns, highlight.get('column'), highlight.get('value'), n_rows)
+    row_open = [f'<tr style="{highlight["style"]}">' if hit else '<tr>' for hit in highlighted]
+
+    # 每列的单元格（只有加粗列需要逐行判断）
+    bold = bold or {}
+    bold_columns = set(bold.get('columns', ()))
+    where_column, where_value = bold.get('where', (None, None))
+    bold_mask = _match_mask(columns, where_column, where_value, n_rows) if bold_columns else None
+    plain_open = f'<td style="{TD_STYLE}">'
+    bold_open = f'<td style="{TD_STYLE} {BOLD_STYLE}">'
+    cell_columns = []
+    for name in names:
+        if name in bold_columns:
+            cells = [f'{bold_open if hit else plain_open}{value}</td>'
+                     for hit, value in zip(bold_mask, columns[name])]
+        else:
+            cells = [f'{plain_open}{value}</td>' for value in columns[name]]
+        cell_columns.append(cells)
+
+    body = ''.join(
+        row_open[i] + ''.join(cells) + '</tr>'
+        for i, cells in enumerate(zip(*cell_columns))
+    )
+    return (f'<table style="{TABLE_STYLE}"><thead><tr style="{HEADER_ROW_STYLE}">{header}</tr></thead>'
+            f'<tbody>{body}</tbody></table>')
+
+
+def render_table(data, widths=None, highlight=None, bold=None, header_style=''):
+    """渲染 HTML 表格
+
+    data: {列名: 值列表}，或 DataFrame
+    widths: 各列宽度，如 ['25%', '75%']
+    highlight: {'column', 'value', 'style'}，column 等于 value 的行加上 style
+    bold: {'columns': [...], 'where': (列名, 值)}，满足条件的行中这些列加粗
+    header_style: 追加到表头单元格的样式
+    """
+    if hasattr(data, 'to_dict'):
+        data = data.to_dict(orient='list')
+    columns = {name: list(values) for name, values in data.items()}
+
+    key = hashlib.sha1(pickle.dumps(
+        (columns, widths, highlight, bold, header_style), protocol=pickle.HIGHEST_PROTOCOL
+    )).hexdigest()
+    with _cache_lock:
+        html = _cache.get(key)
+        if html is not None:
+            _cache.move_to_end(key)
+            return html
+
+    html = _render(columns, widths, highlight, bold, header_style)
+    with _cache_lock:
+        _cache[key] = html
+        if len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return html
@@ -0,0 +1,90 @@
+"""
+页面图片缩略图缓存
+
+原图（0.4–1.1 MB 的截图/照片）按宽度档位缩放并重新压缩为 WebP，
+以源文件内容哈希命名存放在 data/.thumbnails/ 下，只生成一次。
+页面通过 thumbnail() 取缩略图路径，生成失败时退回原图。
+
+预生成命令：
+    python -m utils.image_cache
+"""
+
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+from utils.data_store import BASE_DIR, DATA_DIR, file_sha256
+
+THUMBNAIL_DIR = DATA_DIR / ".thumbnails"
+# 宽度档位（像素）；三栏布局下每栏约 400px，800 可覆盖 2x 屏幕
+WIDTH_BUCKETS = (400, 800, 1200)
+DEFAULT_WIDTH = 800
+QUALITY = 80
+
+# 页面中用到的图片目录
+IMAGE_DIRS = [BASE_DIR / "图片", DATA_DIR / "示例图片"]
+
+
+def width_bucket(width):
+    """不小于 width 的最小档位"""
+    for bucket in WIDTH_BUCKETS:
+        if bucket >= width:
+            return bucket
+    return WIDTH_BUCKETS[-1]
+
+
+def build_thumbnail(src_path, width=DEFAULT_WIDTH):
+    """生成（或复用）缩略图，返回缩略图路径"""
+    src_path = Path(src_path)
+    bucket = width_bucket(width)
+    target = THUMBNAIL_DIR / f"{file_sha256(src_path)[:20]}_w{bucket}.webp"
+    if target.exists():
+        return target
+
+    # 只有真正需要生成时才导入 Pillow
+    from PIL import Image
+
+    THUMBNAIL_DIR.mkdir(parents=True, exist_ok=True)
+    with Image.open(src_path) as image:
+        image = image.convert('RGB')
+        if image.width > bucket:
+            image = image.resize((bucket, round(image.height * bucket / image.width)), Image.LANCZOS)
+        # 临时文件带进程号和线程号，多个会话同时生成同一张缩略图时互不覆盖
+        tmp_path = target.with_suffix(f'.{os.getpid()}-{threading.get_ident()}.webp.tmp')
+        image.save(tmp_path, format='WEBP', quality=QUALITY, method=4)
+    tmp_path.replace(target)
+    return target
+
+
+@lru_cache(maxsize=256)
+def _cached_thumbnail(src_path, size, mtime_ns, width):
+    return str(build_thumbnail(src_path, width))
+
+
+def thumbnail(src_path, width=DEFAULT_WIDTH):
+    """页面使用的图片路径：优先返回缩略图，失败时返回原图路径"""
+    src_path = str(src_path)
+    try:
+        stat = os.stat(src_path)
+        return _cached_thumbnail(src_path, stat.st_size, stat.st_mtime_ns, width_bucket(width))
+    except Exception:
+        return src_path
+
+
+def build_all(width=DEFAULT_WIDTH):
+    """为页面用到的所有图片生成缩略图"""
+    built = []
+    for image_dir in IMAGE_DIRS:
+        if not image_dir.exists():
+            continue
+        for path in sorted(image_dir.iterdir()):
+            if path.suffix.lower() in ('.jpg', '.jpeg', '.png', '.webp'):
+                built.append((path, build_thumbnail(path, width)))
+    return built
+
+
+if __name__ == '__main__':
+    for src, target in build_all():
+        print(f'{src.relative_to(BASE_DIR)} ({src.stat().st_size // 1024} KB) -> '
+              f'{target.relative_to(BASE_DIR)} ({target.stat().st_size // 1024} KB)')
@@ -0,0 +1,198 @@
+"""
+增量导入
+
+每天的新数据（新反馈、新一批图片标签）追加到现有 CSV 末尾，不再整体替换文件；
+每个数据集记录一个时间水位（已导入的最大 feedback_date / labeled_at）及水位那一刻已导入行的键，
+只接受水位之后的行和与水位同一时刻、键尚未导入的行，并在聚合快照（utils/snapshot.py）上直接累加新行的统计：
+标签计数、分组合计、每日计数、标签 × 天计数、图片内容/年级/材料来源计数及工作日/周末合计。
+
+新反馈经标签库导入：原始列追加到原始反馈，标签写入标签库（utils/label_store.py），
+已打标 CSV 存在时在末尾追加同样拼接出的行（与重新导出的结果相同）；标签库尚未建立时先从已打标 CSV 导入。
+追加 CSV 时新行写成 Parquet 分片（data_store.append_csv），快照中的源文件指纹从追加前的指纹续算，
+一次导入的耗时只与新增行数有关，不再重新解析或重新计算整个文件的摘要。
+
+水位保存在 data/.snapshot/ingest_state.json；首次导入时扫描一遍现有数据得到初始水位。
+追加后的文件末尾新增行也会被全文检索索引（utils/feedback_search.py）按增量段处理。
+
+    python -m utils.ingest feedback 新反馈.csv
+    python -m utils.ingest weekday_labels 新标签.csv
+"""
+
+import json
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from utils.data_store import (
+    DATA_DIR, FEEDBACK_LABELED_PATH, JOINED_DATASETS, WEEKDAY_LABELS_PATH, WEEKEND_LABELS_PATH, CSV_ENCODING,
+    append_csv, extend_fingerprint, fingerprint_matches, iter_chunks, joined_sources,
+)
+from utils.feedback_rollup import decode_cube
+from utils.feedback_stream import FeedbackSummary
+from utils.label_store import RESULT_COLUMNS, LabelStore, import_labeled, label_records
+from utils.lazy_imports import lazy_import
+from utils.snapshot import SNAPSHOT_PATH, load_snapshot, summary_aggregates, write_snapshot
+
+pd = lazy_import('pandas')
+
+STATE_PATH = DATA_DIR / ".snapshot" / "ingest_state.json"
+
+# 数据集 → (文件, 时间列, 键列)；时间列均为可按字符串比较先后的 ISO 格式
+DATASETS = {
+    'feedback': (FEEDBACK_LABELED_PATH, 'feedback_date', 'feedback_id'),
+    'weekday_labels': (WEEKDAY_LABELS_PATH, 'labeled_at', 'image_file'),
+    'weekend_labels': (WEEKEND_LABELS_PATH, 'labeled_at', 'image_file'),
+}
+
+
+def load_state(path=STATE_PATH):
+    path = Path(path)
+    if not path.exists():
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_state(state, path=STATE_PATH):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.json.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=1)
+    tmp_path.replace(path)
+
+
+def _keys_at(rows, time_column, key_column, watermark):
+    """时间等于水位的行的键（字符串）"""
+    return set(rows.loc[rows[time_column].astype(str) == watermark, key_column].astype(str))
+
+
+def scan_watermark(dataset):
+    """扫描数据集得到当前水位（时间列最大值）及水位时刻已有行的键"""
+    path, time_column, key_column = DATASETS[dataset]
+    watermark, keys = '', set()
+    # 按原始字符串比较，与新数据中的时间列保持同一格式
+    for chunk in iter_chunks(path, columns=[time_column, key_column], raw=True):
+        chunk = chunk[chunk[time_column].notna()]
+        if not len(chunk):
+            continue
+        latest = chunk[time_column].astype(str).max()
+        if latest > watermark:
+            watermark, keys = latest, set()
+        if latest == watermark:
+            keys |= _keys_at(chunk, time_column, key_column, watermark)
+    return watermark, keys
+
+
+def _add_counts(counts, series):
+    for key, value in series.value_counts().items():
+        counts[key] = counts.get(key, 0) + int(value)
+
+
+def update_feedback(aggregates, rows):
+    """在快照的 feedback 聚合上累加新行"""
+    summary = FeedbackSummary(aggregates['total'], Counter(aggregates['label_counts']),
+                              Counter(aggregates['daily_counts']), decode_cube(aggregates['label_days']),
+                              Counter(aggregates['version_counts']), dict(aggregates['version_first_seen']))
+    summary.update(rows)
+    return summary_aggregates(summary)
+
+
+def update_images(aggregates, rows, period):
+    """在快照的 images 聚合上累加新行；period 为 weekday / weekend"""
+    aggregates[f'{period}_total'] += len(rows)
+    _add_counts(aggregates['grade_counts'], rows['grade_level'])
+    _add_counts(aggregates['content_counts'], rows['content_type'])
+    _add_counts(aggregates[f'{period}_material'], rows['material_source'])
+    aggregates[f'{period}_writing'] += int((rows['content_type'] == 'writing_assignment').sum())
+    return aggregates
+
+
+def ensure_label_store(path):
+    """反馈经标签库导入；标签库尚未建立时先从已打标 CSV 导入"""
+    if joined_sources(path) is None:
+        import_labeled(path, JOINED_DATASETS[path][1])
+
+
+def with_results(rows):
+    """补齐结果列：新数据没有标签时按未打标导入（进入待打标队列）"""
+    missing = {column: None for column in RESULT_COLUMNS if column not in rows.columns}
+    if 'api_success' in missing:
+        missing['api_success'] = rows['label'].notna() if 'label' in rows.columns else False
+    return rows.assign(**missing) if missing else rows
+
+
+def append_feedback(path, rows):
+    """原始列追加到原始反馈，标签写入标签库；已打标 CSV 存在时在末尾追加同样的行"""
+    raw_path, store_path = joined_sources(path)
+    append_csv(raw_path, rows)
+    # 带标签或打标失败记录的行写入标签库，其余行留在待打标队列
+    labeled = rows[rows['label'].notna() | rows['api_error'].notna()]
+    if len(labeled):
+        with LabelStore(store_path) as store:
+            store.put_many(label_records(labeled))
+    if Path(path).exists():
+        append_csv(path, rows)
+
+
+def ingest(dataset, new_rows, state_path=STATE_PATH, snapshot_path=SNAPSHOT_PATH):
+    """导入一批新数据，返回 (追加行数, 跳过行数)
+
+    时间早于水位、或与水位同一时刻且键已导入的行视为已导入，直接跳过。
+    """
+    path, time_column, key_column = DATASETS[dataset]
+    if dataset == 'feedback':
+        ensure_label_store(path)
+        new_rows = with_results(new_rows)
+    # 先确认快照与现有文件一致（不一致时这里会完整重建一次），再在其上累加
+    snapshot = load_snapshot(snapshot_path)
+    state = load_state(state_path)
+    previous = state.get(dataset, {})
+    watermark, keys = previous.get('watermark'), previous.get('watermark_keys')
+    if keys is None or not fingerprint_matches(path, previous['source']):
+        # 首次导入、旧版状态文件没有记录键，或文件在导入之外被整体替换过
+        watermark, keys = scan_watermark(dataset)
+    keys = set(keys)
+
+    times = new_rows[time_column].astype(str)
+    same_time = (times == watermark) & ~new_rows[key_column].astype(str).isin(keys)
+    fresh = new_rows[new_rows[time_column].notna() & ((times > watermark) | same_time)]
+    fresh = fresh.iloc[fresh[time_column].astype(str).argsort(kind='stable')]
+    skipped = len(new_rows) - len(fresh)
+    if not len(fresh):
+        return 0, skipped
+
+    if dataset == 'feedback':
+        append_feedback(path, fresh)
+        snapshot['feedback'] = update_feedback(snapshot['feedback'], fresh)
+    else:
+        append_csv(path, fresh)
+        snapshot['images'] = update_images(snapshot['images'], fresh, dataset.split('_')[0])
+    # 快照的指纹与追加前的文件一致，只续算新增的部分
+    snapshot['sources'][dataset] = extend_fingerprint(path, snapshot['sources'][dataset])
+    snapshot['updated_at'] = datetime.now().isoformat(timespec='seconds')
+    write_snapshot(snapshot, snapshot_path)
+
+    latest = str(fresh[time_column].astype(str).max())
+    latest_keys = _keys_at(fresh, time_column, key_column, latest) | (keys if latest == watermark else set())
+    state[dataset] = {'watermark': latest,
+                      'watermark_keys': sorted(latest_keys),
+                      'source': snapshot['sources'][dataset],
+                      'ingested_at': snapshot['updated_at']}
+    write_state(state, state_path)
+    return len(fresh), skipped
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='把新数据增量导入现有数据集')
+    parser.add_argument('dataset', choices=list(DATASETS))
+    parser.add_argument('source', help='新数据 CSV（列与目标数据集相同）')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    appended, skipped = ingest(args.dataset, pd.read_csv(args.source, encoding=CSV_ENCODING))
+    print(f'追加 {appended} 行，跳过水位之前的 {skipped} 行，{time.perf_counter() - started:.2f}s')
+    print(f'水位：{load_state()[args.dataset]["watermark"]}' if appended else '水位未变化')
@@ -0,0 +1,271 @@
+"""
+用户反馈标签库
+
+打标结果（label、scene、api_success、api_error）单独存放在 SQLite 中，
+以 (feedback_id, 内容哈希) 为主键，不再复制原始反馈的全部列：
+
+- 读取时按主键把标签并回原始反馈（load_labeled / iter_labeled），反馈内容被修改过的行视为未打标。
+  标签库存在时，utils/data_store.py 按已打标 CSV 路径的读取（页面、索引、快照、下载）都改为这样拼接
+- 新导出的原始反馈只有「没有标签或内容变化」的行进入待打标队列（backlog），不会重复打标
+- 已打标 CSV 只是导出产物（export_labeled），供外部使用；导入标签库后可以删除
+
+首次使用时从现有的已打标 CSV 导入：
+    python -m utils.label_store import                # 导入 用户反馈数据_已打标_8000条_20并发.csv
+    python -m utils.label_store backlog [原始反馈.csv]  # 待打标条数
+    python -m utils.label_store export                 # 重新生成已打标 CSV
+"""
+
+import hashlib
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+from utils.data_store import (
+    FEEDBACK_LABELED_PATH, FEEDBACK_SAMPLE_PATH, LABEL_STORE_PATH, CSV_ENCODING, iter_chunks, read_dataset,
+)
+from utils.lazy_imports import lazy_import
+from utils.schemas import schema_for
+
+pd = lazy_import('pandas')
+
+KEY_COLUMNS = ['feedback_id', 'content_hash']
+RESULT_COLUMNS = ['label', 'scene', 'api_success', 'api_error']
+TEXT_COLUMN = 'feedback_content'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS labels (
+    feedback_id   INTEGER NOT NULL,
+    content_hash  TEXT NOT NULL,
+    label         TEXT,
+    scene         TEXT,
+    api_success   INTEGER NOT NULL,
+    api_error     TEXT,
+    labeled_at    TEXT NOT NULL,
+    PRIMARY KEY (feedback_id, content_hash)
+) WITHOUT ROWID
+"""
+# 库的随机编号与写入代数：每次 put_many 代数加一，作为标签库的内容摘要（见 data_store.file_fingerprint）
+_META_SCHEMA = 'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)'
+
+
+def content_hash(text):
+    """反馈内容的哈希（SHA-1 前 16 位）；空内容统一按空字符串计算"""
+    if not isinstance(text, str):
+        text = ''
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def content_hashes(texts):
+    return [content_hash(text) for text in texts]
+
+
+class LabelStore:
+    """以 (feedback_id, content_hash) 为键的标签库"""
+
+    def __init__(self, path=LABEL_STORE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        # WAL 下逐条提交的开销很小，打标中途崩溃也不会丢失已提交的结果
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(_SCHEMA)
+        self.connection.execute(_META_SCHEMA)
+        if self._meta('id') is None:
+            self.connection.execute("INSERT INTO meta VALUES ('id', abs(random()))")
+        self.connection.commit()
+
+    def _meta(self, key):
+        row = self.connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def digest(self):
+        """内容摘要：库编号与写入代数，标签有写入时即变化"""
+        return f"{self._meta('id')}-{self._meta('generation') or 0}"
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def put_many(self, records):
+        """写入结果；records 为 (feedback_id, content_hash, result 字典) 的序列，同键覆盖"""
+        labeled_at = datetime.now().isoformat(timespec='seconds')
+        rows = [(int(fid), digest, result.get('label'), result.get('scene') or '',
+                 int(bool(result.get('api_success'))), result.get('api_error') or '', labeled_at)
+                for fid, digest, result in records]
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO labels VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+            self.connection.execute("INSERT INTO meta VALUES ('generation', 1) "
+                                    "ON CONFLICT (key) DO UPDATE SET value = value + 1")
+        return len(rows)
+
+    def put(self, feedback_id, digest, result):
+        return self.put_many([(feedback_id, digest, result)])
+
+    def labeled_keys(self):
+        """已成功打标的 (feedback_id, content_hash) 集合"""
+        cursor = self.connection.execute('SELECT feedback_id, content_hash FROM labels WHERE api_success = 1')
+        return set(cursor.fetchall())
+
+    def frame(self):
+        """全部标签（DataFrame，列为 KEY_COLUMNS + RESULT_COLUMNS）"""
+        frame = pd.read_sql_query(f'SELECT {", ".join(KEY_COLUMNS + RESULT_COLUMNS)} FROM labels', self.connection)
+        frame['api_success'] = frame['api_success'].astype(bool)
+        return frame
+
+    def stats(self):
+        total, failed = self.connection.execute(
+            'SELECT COUNT(*), COALESCE(SUM(api_success = 0), 0) FROM labels').fetchone()
+        return {'total': total, 'failed': failed}
+
+
+def store_digest(store_path=LABEL_STORE_PATH):
+    """标签库的内容摘要（与 LabelStore.digest 相同）
+
+    只读打开，不设置 PRAGMA、不建表，检查数据是否变化时不会改动标签库；没有 meta 表的旧库摘要固定。
+    无法打开或读取时抛出 sqlite3.Error。
+    """
+    connection = sqlite3.connect(f'{Path(store_path).resolve().as_uri()}?mode=ro', uri=True)
+    try:
+        has_meta = connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'meta'").fetchone()
+        meta = dict(connection.execute('SELECT key, value FROM meta').fetchall()) if has_meta else {}
+    finally:
+        connection.close()
+    return f"{meta.get('id')}-{meta.get('generation') or 0}"
+
+
+def join_labels(raw, labels):
+    """把标签并回原始反馈（按 feedback_id + 内容哈希），列顺序与已打标 CSV 一致
+
+    没有对应标签的行 label 为空、api_success 为 False；整列为空时与 read_csv 推断的一样为 float 的 NaN。
+    """
+    keys = pd.DataFrame({'feedback_id': raw['feedback_id'].to_numpy(),
+                         'content_hash': content_hashes(raw[TEXT_COLUMN].tolist())})
+    merged = keys.merge(labels, on=KEY_COLUMNS, how='left')
+    joined = raw.copy()
+    for column in RESULT_COLUMNS:
+        values = merged[column].to_numpy()
+        if column == 'api_success':
+            joined[column] = pd.Series(values, index=raw.index).fillna(False).astype(bool)
+        else:
+            series = pd.Series(values, index=raw.index).replace('', None)
+            joined[column] = series.astype(float) if series.isna().all() else series
+    return joined
+
+
+def _raw_columns(columns):
+    """拼接 columns 需要从原始反馈读取的列（含主键所需的列）"""
+    if columns is None:
+        return None
+    read_columns = [c for c in columns if c not in RESULT_COLUMNS]
+    return read_columns + [c for c in ('feedback_id', TEXT_COLUMN) if c not in read_columns]
+
+
+def _needs_labels(columns):
+    return columns is None or any(c in RESULT_COLUMNS for c in columns)
+
+
+def _select(joined, columns, raw):
+    """按读取已打标 CSV 的方式取列：raw 时列按文件中的顺序，否则按请求的顺序并转换为声明的类型"""
+    if raw:
+        return joined if columns is None else joined[[c for c in joined.columns if c in columns]]
+    if columns is not None:
+        joined = joined[columns]
+    # 整列为空的标签列先转回 object，转换后与从 Parquet 读回的空列类型相同
+    empty = {c: object for c in RESULT_COLUMNS if c in joined.columns and joined[c].dtype == float}
+    return schema_for(FEEDBACK_LABELED_PATH).apply(joined.astype(empty) if empty else joined, columns)
+
+
+def load_labeled(raw_path=FEEDBACK_SAMPLE_PATH, store_path=LABEL_STORE_PATH, columns=None, raw=False):
+    """读取原始反馈并在内存中并入标签，结果与读取已打标 CSV 相同（参数同 read_dataset）"""
+    if not _needs_labels(columns):
+        return read_dataset(raw_path, columns=columns, raw=raw)
+    with LabelStore(store_path) as store:
+        labels = store.frame()
+    return _select(join_labels(read_dataset(raw_path, columns=_raw_columns(columns), raw=raw), labels), columns, raw)
+
+
+def iter_labeled(raw_path=FEEDBACK_SAMPLE_PATH, store_path=LABEL_STORE_PATH, columns=None, chunksize=100_000,
+                 raw=False):
+    """分块读取原始反馈并入标签（参数同 iter_chunks）"""
+    if not _needs_labels(columns):
+        yield from iter_chunks(raw_path, columns=columns, chunksize=chunksize, raw=raw)
+        return
+    with LabelStore(store_path) as store:
+        labels = store.frame()
+    for chunk in iter_chunks(raw_path, columns=_raw_columns(columns), chunksize=chunksize, raw=raw):
+        yield _select(join_labels(chunk, labels), columns, raw)
+
+
+def backlog(raw_path=FEEDBACK_SAMPLE_PATH, store_path=LABEL_STORE_PATH, chunksize=10_000):
+    """逐块产出需要打标的反馈（没有成功的标签，或内容与打标时不同）
+
+    每块为 DataFrame，列为 feedback_id、feedback_content、content_hash。
+    """
+    with LabelStore(store_path) as store:
+        done = store.labeled_keys()
+    for chunk in iter_chunks(raw_path, columns=['feedback_id', TEXT_COLUMN], chunksize=chunksize):
+        chunk = chunk.assign(content_hash=content_hashes(chunk[TEXT_COLUMN].tolist()))
+        pending = [key not in done for key in zip(chunk['feedback_id'].tolist(), chunk['content_hash'].tolist())]
+        chunk = chunk[pending]
+        if len(chunk):
+            yield chunk
+
+
+def label_records(frame):
+    """已打标的行（feedback_id、feedback_content 与结果列）转为 put_many 的记录"""
+    frame = frame[['feedback_id', TEXT_COLUMN] + RESULT_COLUMNS]
+    frame = frame.astype(object).where(frame.notna(), None)
+    return [(fid, content_hash(text), {'label': label, 'scene': scene, 'api_success': success, 'api_error': error})
+            for fid, text, label, scene, success, error in frame.itertuples(index=False)]
+
+
+def import_labeled(labeled_path=FEEDBACK_LABELED_PATH, store_path=LABEL_STORE_PATH, chunksize=100_000):
+    """把已打标 CSV 中的结果导入标签库，返回导入条数"""
+    imported = 0
+    columns = ['feedback_id', TEXT_COLUMN] + RESULT_COLUMNS
+    with LabelStore(store_path) as store:
+        # 直接读取文件本身（标签库存在时按这个路径的 iter_chunks 读的是拼接结果）
+        for chunk in pd.read_csv(labeled_path, encoding=CSV_ENCODING, usecols=columns, chunksize=chunksize):
+            imported += store.put_many(label_records(chunk))
+    return imported
+
+
+def export_labeled(raw_path=FEEDBACK_SAMPLE_PATH, output_path=FEEDBACK_LABELED_PATH,
+                   store_path=LABEL_STORE_PATH, chunksize=100_000):
+    """按原始反馈分块并入标签，写出已打标 CSV"""
+    output_path = Path(output_path)
+    tmp_path = output_path.with_suffix('.csv.tmp')
+    first = True
+    # 原样读取原始反馈，导出文件的其余列与原始导出逐字节一致
+    for chunk in iter_labeled(raw_path, store_path, chunksize=chunksize, raw=True):
+        chunk.to_csv(tmp_path, mode='w' if first else 'a', header=first, index=False,
+                     encoding=CSV_ENCODING if first else 'utf-8')
+        first = False
+    tmp_path.replace(output_path)
+    return output_path
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='用户反馈标签库')
+    parser.add_argument('command', choices=['import', 'backlog', 'export'])
+    parser.add_argument('path', nargs='?', help='import 时为已打标 CSV，backlog / export 时为原始反馈 CSV')
+    parser.add_argument('--store', default=str(LABEL_STORE_PATH))
+    parser.add_argument('--output', default=str(FEEDBACK_LABELED_PATH), help='export 的输出路径')
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        count = import_labeled(args.path or FEEDBACK_LABELED_PATH, args.store)
+        print(f'导入 {count} 条标签 → {args.store}')
+    elif args.command == 'backlog':
+        pending = sum(len(chunk) for chunk in backlog(args.path or FEEDBACK_SAMPLE_PATH, args.store))
+        print(f'待打标 {pending} 条')
+    else:
+        print(f'写出 {export_labeled(args.path or FEEDBACK_SAMPLE_PATH, args.output, args.store)}')
@@ -0,0 +1,50 @@
+"""
+重模块的延迟导入
+
+pandas / plotly 等模块导入耗时明显，页面只在真正用到时才导入：
+
+    pd = lazy_import('pandas')
+    go = lazy_import('plotly.graph_objects')
+
+返回的代理在第一次访问属性时才执行 import。代理不注册到 sys.modules，
+避免 streamlit 等库检测到"已导入"而提前触发加载。
+"""
+
+import importlib
+import sys
+
+
+class LazyModule:
+    """首次访问属性时才导入的模块代理"""
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            module = importlib.import_module(self.__dict__['_name'])
+            self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_module'] is not None else 'not loaded'
+        return f"<lazy module '{self.__dict__['_name']}' ({state})>"
+
+
+def lazy_import(name):
+    """已导入的模块直接返回，否则返回延迟导入代理"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name)
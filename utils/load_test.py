@@ -0,0 +1,315 @@
+"""
+多会话压测
+
+启动一个真实的 streamlit 服务（或连接已有服务），模拟 N 个同时在线的查看者，
+每个查看者通过 WebSocket（与浏览器相同的协议）依次打开全部页面：
+- 每个页面请求一次脚本执行，计时到服务端返回 script_finished
+- 加载页面中的图片（浏览器会按 /media/ 地址逐个请求）
+- 依次点击页面中的每个下载按钮（内容已随页面给出的直接下载；延迟生成的先由服务端执行导出，再按返回的地址下载）
+
+展开「标注标准」等 st.expander 只在浏览器端切换显示，不会请求服务端；
+expander 中的内容在每次脚本执行时已经生成并发送，包含在页面耗时里。
+
+按 --sessions 给出的并发数逐级加压，每级输出页面与下载的延迟分位数、每秒页面数，
+以及服务进程内存（Linux 下读取 /proc）峰值相对预热后空载时的增量和每个会话的平均增量。
+加压前先由一个会话浏览一遍（预热），数据加载与缓存的内存不计入会话增量。
+
+    python -m utils.load_test --sessions 1 5 10 20 30
+    python -m utils.load_test --url http://127.0.0.1:8501 --pid 12345 --sessions 10
+"""
+
+import asyncio
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+from utils.benchmark import BENCH_DIR, write_results
+from utils.data_store import BASE_DIR
+
+MAIN_SCRIPT = BASE_DIR / "streamlit_app.py"
+RESULTS_PATH = BENCH_DIR / "load_test.json"
+REQUEST_TIMEOUT = 300
+RSS_SAMPLE_SECONDS = 0.2
+
+
+# ===== 服务进程 =====
+
+def start_server(port, script=MAIN_SCRIPT):
+    """以无界面模式启动 streamlit 服务，等待健康检查通过后返回进程"""
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', str(script), '--server.headless', 'true',
+         '--server.port', str(port), '--browser.gatherUsageStats', 'false'],
+        cwd=BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1) as response:
+                if response.status == 200:
+                    return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError('streamlit 服务启动超时')
+
+
+def process_rss(pid):
+    """进程当前常驻内存（字节）；读不到时返回 None"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+# ===== 模拟查看者 =====
+
+class Viewer:
+    """一个浏览器会话：一条 WebSocket 连接上的脚本执行与下载请求"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.ws = None
+        self.session_id = ''
+        self.pages = {}          # 页面名 → page_script_hash
+        self.other_pages = []    # 首页以外的页面（导航顺序）
+        self.page_times = []
+        self.download_times = []
+        self.errors = []
+
+    async def connect(self):
+        from websockets.asyncio.client import connect
+
+        ws_url = self.base_url.replace('http', 'ws', 1) + '/_stcore/stream'
+        self.ws = await connect(ws_url, subprotocols=['streamlit'], max_size=None)
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+    async def _receive(self):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        message = ForwardMsg()
+        message.ParseFromString(await self.ws.recv())
+        return message
+
+    async def open_page(self, page_name=''):
+        """执行一次页面脚本，返回页面中的下载按钮与图片地址"""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+
+        request = BackMsg()
+        request.rerun_script.query_string = ''
+        request.rerun_script.page_name = page_name
+        request.rerun_script.page_script_hash = self.pages.get(page_name, '')
+        started = time.perf_counter()
+        await self.ws.send(request.SerializeToString())
+        downloads, images = [], []
+        while True:
+            message = await self._receive()
+            kind = message.WhichOneof('type')
+            if kind == 'new_session':
+                self.session_id = message.new_session.initialize.session_id or self.session_id
+            elif kind == 'navigation':
+                app_pages = message.navigation.app_pages
+                self.pages = {page.page_name: page.page_script_hash for page in app_pages}
+                self.other_pages = [page.page_name for page in app_pages if page.url_pathname]
+            elif kind == 'delta' and message.delta.WhichOneof('type') == 'new_element':
+                element = message.delta.new_element
+                element_type = element.WhichOneof('type')
+                if element_type == 'download_button':
+                    button = element.download_button
+                    downloads.append((button.label, button.deferred_file_id, button.url))
+                elif element_type == 'imgs':
+                    images.extend(image.url for image in element.imgs.imgs)
+                elif element_type == 'exception':
+                    self.errors.append(f'{page_name or "首页"}：{element.exception.message[:200]}')
+            elif kind == 'script_finished':
+                break
+        self.page_times.append(time.perf_counter() - started)
+        return downloads, images
+
+    def _fetch(self, url):
+        """下载 /media/ 下的文件，失败时记为错误并返回 False"""
+        try:
+            with urllib.request.urlopen(self.base_url + url, timeout=REQUEST_TIMEOUT) as response:
+                response.read()
+            return True
+        except OSError as e:
+            self.errors.append(f'{url}：{e}')
+            return False
+
+    async def fetch_media(self, urls):
+        await asyncio.gather(*(asyncio.to_thread(self._fetch, url) for url in urls if url.startswith('/')))
+
+    async def download(self, label, file_id, url):
+        """点击下载按钮：内容已随页面给出时直接下载，否则服务端执行导出并返回文件地址，再下载文件"""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+
+        started = time.perf_counter()
+        if not file_id:
+            if await asyncio.to_thread(self._fetch, url):
+                self.download_times.append(time.perf_counter() - started)
+            return
+        request = BackMsg()
+        operation = request.backend_operation_request
+        operation.request_id = file_id
+        operation.session_id = self.session_id
+        operation.deferred_file.file_id = file_id
+        await self.ws.send(request.SerializeToString())
+        while True:
+            message = await self._receive()
+            if message.WhichOneof('type') == 'backend_operation_response':
+                response = message.backend_operation_response
+                if response.request_id == file_id:
+                    break
+        if response.error_msg:
+            self.errors.append(f'{label}：{response.error_msg}')
+            return
+        if await asyncio.to_thread(self._fetch, response.deferred_file.url):
+            self.download_times.append(time.perf_counter() - started)
+
+    async def visit(self, page_name, downloads=True):
+        buttons, images = await asyncio.wait_for(self.open_page(page_name), REQUEST_TIMEOUT)
+        await self.fetch_media(images)
+        if downloads:
+            for label, file_id, url in buttons:
+                await asyncio.wait_for(self.download(label, file_id, url), REQUEST_TIMEOUT)
+
+    async def browse(self, rounds=1, downloads=True):
+        """依次打开全部页面，点击各页面的下载按钮"""
+        for _ in range(rounds):
+            # 打开首页后才拿到导航中的页面列表
+            await self.visit('', downloads)
+            for page_name in self.other_pages:
+                await self.visit(page_name, downloads)
+
+
+# ===== 逐级加压 =====
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+async def _sample_rss(pid, samples, stop):
+    while not stop.is_set():
+        rss = process_rss(pid)
+        if rss is not None:
+            samples.append(rss)
+        await asyncio.sleep(RSS_SAMPLE_SECONDS)
+
+
+async def run_level(base_url, sessions, rounds=1, downloads=True, pid=None):
+    """sessions 个查看者同时浏览，返回该级的统计；测量结束后连接才关闭"""
+    viewers = [Viewer(base_url) for _ in range(sessions)]
+    samples, stop = [], asyncio.Event()
+    sampler = asyncio.create_task(_sample_rss(pid, samples, stop)) if pid else None
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(viewer.connect() for viewer in viewers))
+        results = await asyncio.gather(*(viewer.browse(rounds, downloads) for viewer in viewers),
+                                       return_exceptions=True)
+        elapsed = time.perf_counter() - started
+        # 会话仍然在线时读取内存
+        rss = process_rss(pid) if pid else None
+    finally:
+        stop.set()
+        if sampler is not None:
+            await sampler
+        await asyncio.gather(*(viewer.close() for viewer in viewers), return_exceptions=True)
+
+    page_times = [t for viewer in viewers for t in viewer.page_times]
+    download_times = [t for viewer in viewers for t in viewer.download_times]
+    errors = [error for viewer in viewers for error in viewer.errors]
+    errors += [repr(result) for result in results if isinstance(result, BaseException)]
+
+    def latency(values):
+        return {f'p{q}': percentile(values, q) for q in (50, 90, 99)}
+
+    return {
+        'sessions': sessions,
+        'seconds': elapsed,
+        'page_views': len(page_times),
+        'page_views_per_second': len(page_times) / elapsed if elapsed else None,
+        'page_latency': latency(page_times),
+        'downloads': len(download_times),
+        'download_latency': latency(download_times),
+        'rss': rss,
+        'peak_rss': max(samples) if samples else rss,
+        'errors': errors,
+    }
+
+
+async def run_load_test(base_url, levels, rounds=1, downloads=True, pid=None, progress=print):
+    # 预热：第一个会话触发数据加载和各级缓存，不计入结果；之后的内存增量只反映会话本身
+    cold_rss = process_rss(pid) if pid else None
+    warmup = await run_level(base_url, 1, 1, downloads, pid)
+    progress('预热 ' + format_level(warmup))
+    idle_rss = process_rss(pid) if pid else None
+    report = {'cold_rss': cold_rss, 'idle_rss': idle_rss, 'warmup': warmup, 'levels': []}
+    for sessions in levels:
+        level = await run_level(base_url, sessions, rounds, downloads, pid)
+        if idle_rss is not None and level['peak_rss'] is not None:
+            # 按本级峰值计：会话结束后服务端释放的对象不会出现在结束时的读数里
+            level['rss_growth'] = level['peak_rss'] - idle_rss
+            level['rss_per_session'] = level['rss_growth'] / sessions
+        report['levels'].append(level)
+        progress(format_level(level))
+    return report
+
+
+def _ms(value):
+    return '-' if value is None else f'{value * 1000:.0f}'
+
+
+def format_level(level):
+    page, download = level['page_latency'], level['download_latency']
+    line = (f'{level["sessions"]:>4} 会话  {level["page_views"]} 次页面  {level["page_views_per_second"]:.1f} 页/s  '
+            f'页面 p50/p90/p99 {_ms(page["p50"])}/{_ms(page["p90"])}/{_ms(page["p99"])} ms  '
+            f'下载 p50/p90/p99 {_ms(download["p50"])}/{_ms(download["p90"])}/{_ms(download["p99"])} ms')
+    if level.get('rss') is not None:
+        line += f'  内存 {level["rss"] / 1e6:.0f} MB（峰值 {level["peak_rss"] / 1e6:.0f} MB'
+        if 'rss_per_session' in level:
+            line += f'，每会话 +{level["rss_per_session"] / 1e6:.1f} MB'
+        line += '）'
+    for error in level['errors'][:5]:
+        line += f'\n      !! {error}'
+    return line
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='多会话压测（模拟多个查看者同时浏览全部页面）')
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 5, 10, 20, 30], help='逐级的并发会话数')
+    parser.add_argument('--rounds', type=int, default=1, help='每个会话浏览全部页面的轮数')
+    parser.add_argument('--no-downloads', action='store_true', help='不点击下载按钮')
+    parser.add_argument('--url', help='连接已有服务（默认在本机启动一个）')
+    parser.add_argument('--pid', type=int, help='已有服务的进程号，用于读取内存')
+    parser.add_argument('--port', type=int, default=8599)
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        base_url, pid = args.url, args.pid
+    else:
+        server = start_server(args.port)
+        base_url, pid = f'http://127.0.0.1:{args.port}', server.pid
+    try:
+        report = asyncio.run(run_load_test(base_url, args.sessions, args.rounds, not args.no_downloads, pid))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    write_results(report, RESULTS_PATH)
+    print(f'结果已写入 {Path(RESULTS_PATH).relative_to(BASE_DIR)}')
+    if any(level['errors'] for level in report['levels']):
+        sys.exit(1)
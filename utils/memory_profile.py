@@ -0,0 +1,214 @@
+"""
+页面内存分析（tracemalloc）
+
+默认关闭。设置环境变量 PAGE_TRACEMALLOC 后启动页面即开启（值为记录的调用栈深度，默认 25；0 为关闭）：
+
+    PAGE_TRACEMALLOC=1 streamlit run app.py
+
+开启后 utils.profiling 在 start_run 和每个 mark 处各取一次 tracemalloc 快照：
+- 段落：新增的内存和段落内的峰值；数据加载、聚合段落另外列出新增最多的分配位置。
+  分配位置按调用栈中最内层的项目代码行归并（pandas 内部的分配记到调用它的页面 / utils 代码行）
+- 保留：每次执行开始时（先 gc）与同一会话上一次执行开始时的快照相比，
+  即上一次执行结束后仍然存活的内存（st.cache、session_state、数据集注册表里的数据，或泄漏的副本）
+结果附在 finish_run() 返回的记录中（'memory'），随 PAGE_METRICS_JSONL 写出，?debug=1 时在侧边栏显示。
+pandas / plotly 等大包在开始跟踪前导入，导入本身的分配不计入。
+快照与比较本身较慢（每次零点几秒到数秒，不计入段落耗时），只用于排查。
+tracemalloc 统计的是整个进程，多个会话同时执行时数字会互相混入，排查时最好只开一个会话。
+
+命令行模式在子进程中用 AppTest 把页面在同一会话中连续执行几次，输出各段落的分配与每次执行后的保留：
+
+    python -m utils.memory_profile                             # 全部页面
+    python -m utils.memory_profile streamlit_app.py --runs 3
+"""
+
+import gc
+import os
+import threading
+import tracemalloc
+from pathlib import Path
+
+PROJECT_DIR = str(Path(__file__).resolve().parent.parent)
+TOP_SITES = 10
+# 列出分配位置的段落类型（其余段落只记新增与峰值）
+SITE_KINDS = ('load', 'aggregate')
+# 开始跟踪前导入的包
+PRELOAD = ('numpy', 'pandas', 'plotly.express', 'plotly.graph_objects')
+# 保留快照的会话数上限，超出时丢弃最早的
+MAX_SESSIONS = 32
+
+# 这些文件中的分配（快照本身等）不计入分配位置
+_OWN_FILES = (tracemalloc.__file__, os.path.join(PROJECT_DIR, 'utils', 'profiling.py'),
+              os.path.join(PROJECT_DIR, 'utils', 'memory_profile.py'))
+# (会话, 页面) → 上一次执行开始时的快照
+_baselines = {}
+_lock = threading.Lock()
+
+
+def enabled():
+    """PAGE_TRACEMALLOC 为空、0 或 false / off / no 时关闭"""
+    value = os.environ.get('PAGE_TRACEMALLOC', '').strip().lower()
+    if value.isdigit():
+        return int(value) > 0
+    return value not in ('', 'false', 'off', 'no')
+
+
+def _frames():
+    value = os.environ.get('PAGE_TRACEMALLOC', '').strip()
+    return int(value) if value.isdigit() and int(value) > 1 else 25
+
+
+def _session():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+    except ImportError:
+        ctx = None
+    return ctx.session_id if ctx is not None else f'thread-{threading.get_ident()}'
+
+
+def _start():
+    import importlib
+
+    for module in PRELOAD:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+    tracemalloc.start(_frames())
+
+
+def _site(traceback):
+    """调用栈中最内层的项目代码行；没有项目代码时取最内层的一帧；分析本身的分配返回 None"""
+    if any(frame.filename in _OWN_FILES for frame in traceback):
+        return None
+    for frame in reversed(traceback):
+        if frame.filename.startswith(PROJECT_DIR):
+            return f'{os.path.relpath(frame.filename, PROJECT_DIR)}:{frame.lineno}'
+    frame = traceback[-1]
+    return f'{frame.filename}:{frame.lineno}'
+
+
+def top_sites(new, old, limit=TOP_SITES):
+    """new 相对 old 新增内存最多的分配位置 [(位置, 字节, 块数)]"""
+    sites = {}
+    for stat in new.compare_to(old, 'traceback'):
+        if stat.size_diff <= 0:
+            continue
+        site = _site(stat.traceback)
+        if site is None:
+            continue
+        size, count = sites.get(site, (0, 0))
+        sites[site] = (size + stat.size_diff, count + stat.count_diff)
+    ranked = sorted(sites.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+    return [(site, size, count) for site, (size, count) in ranked]
+
+
+class MemoryRun:
+    """一次页面执行的内存记录"""
+
+    def __init__(self, page):
+        if not tracemalloc.is_tracing():
+            _start()
+        gc.collect()
+        self.session = _session()
+        self.last = tracemalloc.take_snapshot()
+        self.last_bytes = tracemalloc.get_traced_memory()[0]
+        self.run_peak = self.last_bytes
+        tracemalloc.reset_peak()
+        key = (self.session, page)
+        with _lock:
+            previous = _baselines.pop(key, None)
+            _baselines[key] = (self.last, self.last_bytes)
+            while len(_baselines) > MAX_SESSIONS:
+                _baselines.pop(next(iter(_baselines)))
+        self.retained = None
+        if previous is not None:
+            snapshot, size = previous
+            self.retained = {'bytes': self.last_bytes - size, 'top': top_sites(self.last, snapshot)}
+        self.spans = []
+
+    def mark(self, name, kind=None):
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        self.spans.append({'name': name, 'kind': kind, 'bytes': current - self.last_bytes, 'peak': peak,
+                           'top': top_sites(snapshot, self.last) if kind in SITE_KINDS else []})
+        self.run_peak = max(self.run_peak, peak)
+        self.last, self.last_bytes = snapshot, current
+        # 快照本身的分配不计入下一段的峰值
+        tracemalloc.reset_peak()
+
+    def finish(self):
+        current, peak = tracemalloc.get_traced_memory()
+        return {'session': self.session, 'current': current, 'peak': max(self.run_peak, peak),
+                'retained': self.retained, 'spans': self.spans}
+
+
+def _mb(size):
+    return f'{size / 1e6:+.2f} MB'
+
+
+def format_memory(memory, top=5):
+    lines = [f'  已跟踪 {memory["current"] / 1e6:.1f} MB，本次峰值 {memory["peak"] / 1e6:.1f} MB']
+    if memory['retained'] is not None:
+        lines.append(f'  上次执行后保留 {_mb(memory["retained"]["bytes"])}：')
+        lines += [f'    {_mb(size):>12}  {count:+7d} 块  {site}' for site, size, count in memory['retained']['top'][:top]]
+    for span in memory['spans']:
+        if not span['top']:
+            continue
+        lines.append(f'  [{span["kind"] or "—"}] {span["name"]} {_mb(span["bytes"])}'
+                     f'（峰值 {span["peak"] / 1e6:.1f} MB）：')
+        lines += [f'    {_mb(size):>12}  {count:+7d} 块  {site}' for site, size, count in span['top'][:top]]
+    return '\n'.join(lines)
+
+
+# ===== 命令行：同一会话连续执行 =====
+
+_CHILD_SCRIPT = """
+import json, sys
+from streamlit.testing.v1 import AppTest
+from utils import profiling
+
+page, runs, timeout = sys.argv[1], int(sys.argv[2]), float(sys.argv[3])
+app = AppTest.from_file(page, default_timeout=timeout)
+records = []
+for _ in range(runs):
+    app.run()
+    record = profiling.latest_record()
+    records.append(record and record.get('memory'))
+print('__MEMORY__' + json.dumps(records, ensure_ascii=False))
+"""
+
+
+def profile_memory(page_path, base_dir=None, runs=3, timeout=600):
+    """在子进程中把页面在同一会话里执行 runs 次，返回每次的内存记录"""
+    import json
+    import subprocess
+    import sys
+
+    base_dir = Path(base_dir) if base_dir else Path(PROJECT_DIR)
+    env = dict(os.environ, PYTHONPATH=str(base_dir), PAGE_TRACEMALLOC=os.environ.get('PAGE_TRACEMALLOC') or '25')
+    result = subprocess.run([sys.executable, '-c', _CHILD_SCRIPT, str(page_path), str(runs), str(timeout)],
+                            cwd=base_dir, env=env, capture_output=True, text=True)
+    for line in result.stdout.splitlines():
+        if line.startswith('__MEMORY__'):
+            return json.loads(line[len('__MEMORY__'):])
+    raise RuntimeError(f'页面执行失败：{page_path}\n{result.stderr[-2000:]}')
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from utils.profiling import default_pages
+
+    parser = argparse.ArgumentParser(description='页面内存分析（tracemalloc，同一会话连续执行）')
+    parser.add_argument('pages', nargs='*', help='页面脚本路径，默认全部页面')
+    parser.add_argument('--runs', type=int, default=3, help='同一会话中执行的次数')
+    parser.add_argument('--top', type=int, default=5, help='每项列出的分配位置数')
+    args = parser.parse_args()
+
+    base_dir = Path(PROJECT_DIR)
+    pages = [Path(page).resolve() for page in args.pages] or default_pages(base_dir)
+    for page in pages:
+        for number, memory in enumerate(profile_memory(page, base_dir, runs=args.runs), 1):
+            print(f'== {page.relative_to(base_dir)} 第 {number} 次执行')
+            print(format_memory(memory, top=args.top) if memory else '  （没有内存记录）')
@@ -0,0 +1,282 @@
+"""
+页面耗时记录与冷启动分析
+
+页面脚本在开头调用 start_run()，在每个逻辑段落结束处调用 mark('段落名')，
+记录该段落（距上一个 mark）的耗时；记录按线程隔离，对应 streamlit 的每次脚本执行。
+mark 的第二个参数标明这一段的类型（load 数据加载 / aggregate 聚合 / figure 图表构建 /
+render 渲染），同一段落可以分几次 mark，按类型拆开耗时。
+
+脚本末尾调用 finish_run()，本次执行的耗时按环境变量写到本地：
+    PAGE_METRICS_JSONL=指标.jsonl    每次执行追加一行 JSON
+    PAGE_METRICS_PROM=指标.prom      Prometheus 文本格式（累计值，供 node_exporter 的 textfile 采集）
+页面地址加 ?debug=1（或设置 PAGE_DEBUG=1）时，debug_panel() 在侧边栏列出本次执行最慢的段落。
+设置 PAGE_TRACEMALLOC=1 时另外记录各段落的内存分配和每次执行后保留的内存（见 utils/memory_profile.py）。
+
+命令行模式在全新的子进程里（python -X importtime）执行页面脚本，
+输出每个导入模块的耗时和每个段落的耗时：
+
+    python -m utils.profiling                     # 全部页面
+    python -m utils.profiling streamlit_app.py    # 单个页面
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from utils import memory_profile
+
+KINDS = {'load': '数据加载', 'aggregate': '聚合', 'figure': '图表构建', 'render': '渲染'}
+
+_state = threading.local()
+# 最近一次开始的执行（供基准测试在脚本线程之外读取，见 utils/benchmark.py）
+_latest = {'page': None, 'spans': [], 'record': None}
+# Prometheus 累计值：{(指标, 标签...): 值}
+_totals = {}
+_sink_lock = threading.Lock()
+
+
+def start_run(page):
+    """开始记录一次页面执行"""
+    _state.memory = memory_profile.MemoryRun(page) if memory_profile.enabled() else None
+    _state.page = page
+    _state.started_at = time.perf_counter()
+    _state.last_mark = _state.started_at
+    _state.spans = []
+    _state.error = None
+    _latest.update(page=page, spans=_state.spans)
+
+
+def mark(name, kind=None):
+    """记录从上一个 mark（或 start_run）到现在的耗时，记为段落 name（类型 kind，见 KINDS）"""
+    if getattr(_state, 'spans', None) is None:
+        return
+    now = time.perf_counter()
+    _state.spans.append((name, kind, now - _state.last_mark))
+    if _state.memory is not None:
+        # 快照耗时不计入下一段
+        _state.memory.mark(name, kind)
+        now = time.perf_counter()
+    _state.last_mark = now
+
+
+def record_error(exc):
+    """记录本次执行中断的异常及中断所在的段落（最后一个 mark 之后的那一段）"""
+    if getattr(_state, 'spans', None) is None:
+        return
+    after = _state.spans[-1][0] if _state.spans else None
+    _state.error = {'type': type(exc).__name__, 'message': str(exc)[:500], 'after': after}
+
+
+def _merge(spans):
+    """同名段落的耗时相加，保持首次出现的顺序"""
+    merged = {}
+    for name, _kind, seconds in spans:
+        merged[name] = merged.get(name, 0.0) + seconds
+    return list(merged.items())
+
+
+def spans():
+    """当前线程本次执行记录的 [(段落名, 类型, 秒)]"""
+    return list(getattr(_state, 'spans', None) or [])
+
+
+def sections():
+    """当前线程本次执行记录的 [(段落名, 秒)]（同一段落分类型记录的耗时合计）"""
+    return _merge(spans())
+
+
+def latest_sections():
+    """进程内最近一次开始的执行记录的 [(段落名, 秒)]，不限线程"""
+    return _merge(_latest['spans'])
+
+
+def latest_record():
+    """进程内最近一次结束的执行记录（finish_run 的返回值），不限线程"""
+    return _latest['record']
+
+
+def _write_jsonl(path, record):
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def _write_prometheus(path, record):
+    page = record['page']
+    updates = [(('page_render_seconds_sum', page), record['total']), (('page_render_seconds_count', page), 1)]
+    for name, kind, seconds in record['spans']:
+        key = (page, name, kind or '')
+        updates += [(('page_section_seconds_sum',) + key, seconds), (('page_section_seconds_count',) + key, 1)]
+    if record['error']:
+        updates.append((('page_render_errors_total', page), 1))
+    for key, value in updates:
+        _totals[key] = _totals.get(key, 0) + value
+
+    lines = []
+    for key in sorted(_totals, key=lambda key: tuple(map(str, key))):
+        metric, *labels = key
+        names = ('page',) if metric.startswith('page_render') else ('page', 'section', 'kind')
+        label_text = ','.join(f'{n}="{_label(v)}"' for n, v in zip(names, labels))
+        lines.append(f'{metric}{{{label_text}}} {_totals[key]:g}')
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(tmp_path, path)
+
+
+def finish_run():
+    """结束本次执行：返回本次记录，并按环境变量写出指标（写出失败不影响页面）"""
+    if getattr(_state, 'spans', None) is None:
+        return None
+    record = {
+        'ts': datetime.now().isoformat(timespec='seconds'),
+        'page': _state.page,
+        'total': time.perf_counter() - _state.started_at,
+        'spans': spans(),
+        'error': _state.error,
+    }
+    if _state.memory is not None:
+        record['memory'] = _state.memory.finish()
+    _latest['record'] = record
+    jsonl_path, prom_path = os.environ.get('PAGE_METRICS_JSONL'), os.environ.get('PAGE_METRICS_PROM')
+    if jsonl_path or prom_path:
+        with _sink_lock:
+            try:
+                if jsonl_path:
+                    _write_jsonl(jsonl_path, record)
+                if prom_path:
+                    _write_prometheus(prom_path, record)
+            except OSError:
+                pass
+    return record
+
+
+def slowest(record, top=8):
+    """本次执行中最慢的几段 [(段落名, 类型, 秒)]"""
+    return sorted(record['spans'], key=lambda span: span[2], reverse=True)[:top]
+
+
+def debug_panel(record, top=8):
+    """?debug=1 或 PAGE_DEBUG=1 时在侧边栏显示本次执行最慢的段落"""
+    import streamlit as st
+
+    if record is None or not (st.query_params.get('debug') == '1' or os.environ.get('PAGE_DEBUG') == '1'):
+        return
+    with st.sidebar.expander(f"⏱️ 本次执行 {record['total'] * 1000:.0f} ms", expanded=True):
+        rows = [f"| {name} | {KINDS.get(kind, '—')} | {seconds * 1000:.1f} |"
+                for name, kind, seconds in slowest(record, top)]
+        st.markdown('\n'.join(['| 段落 | 类型 | 耗时 (ms) |', '|---|---|---:|'] + rows))
+        if record['error']:
+            st.caption(f"中断于「{record['error']['after'] or '开头'}」之后：{record['error']['type']}")
+    memory = record.get('memory')
+    if memory is None:
+        return
+    with st.sidebar.expander(f"🧠 内存 峰值 {memory['peak'] / 1e6:.1f} MB", expanded=False):
+        if memory['retained'] is not None:
+            st.caption(f"上次执行后保留 {memory['retained']['bytes'] / 1e6:+.2f} MB")
+            st.markdown(_sites_table(memory['retained']['top'][:top]))
+        spans = sorted(memory['spans'], key=lambda span: span['bytes'], reverse=True)[:3]
+        for span in spans:
+            st.caption(f"{span['name']}（{KINDS.get(span['kind'], '—')}）{span['bytes'] / 1e6:+.2f} MB")
+            st.markdown(_sites_table(span['top'][:3]))
+
+
+def _sites_table(sites):
+    rows = [f"| `{site}` | {size / 1e6:+.2f} | {count:+d} |" for site, size, count in sites]
+    return '\n'.join(['| 分配位置 | MB | 块数 |', '|---|---:|---:|'] + rows)
+
+
+# ===== 命令行：子进程冷启动分析 =====
+
+_CHILD_SCRIPT = """
+import json, runpy, sys, time
+import streamlit
+sys.stderr.write('__PAGE_START__\\n')
+sys.stderr.flush()
+started = time.perf_counter()
+runpy.run_path(sys.argv[1], run_name='__main__')
+total = time.perf_counter() - started
+from utils import profiling
+print('__PROFILE__' + json.dumps({'total': total, 'sections': profiling.sections()}, ensure_ascii=False))
+"""
+
+
+def parse_importtime(stderr):
+    """解析 -X importtime 输出中页面开始之后的部分
+
+    按顶层包汇总各模块自身耗时（不含依赖），返回 [(包名, 秒, 模块数)]，按耗时降序。
+    """
+    packages = {}
+    started = False
+    for line in stderr.splitlines():
+        if line.startswith('__PAGE_START__'):
+            started = True
+            continue
+        if not started or not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        # 形如 "import time:       123 |       4567 |   pandas.core"
+        self_us, _cumulative_us, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        seconds, modules = packages.get(package, (0.0, 0))
+        packages[package] = (seconds + int(self_us) / 1e6, modules + 1)
+    return sorted(((package, seconds, modules) for package, (seconds, modules) in packages.items()),
+                  key=lambda item: item[1], reverse=True)
+
+
+def profile_page(page_path, base_dir=None):
+    """在子进程中冷启动执行一个页面，返回 {'total', 'sections', 'imports'}"""
+    import os
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    base_dir = Path(base_dir) if base_dir else Path(__file__).parent.parent
+    env = dict(os.environ, PYTHONPATH=str(base_dir))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _CHILD_SCRIPT, str(page_path)],
+        cwd=base_dir, env=env, capture_output=True, text=True,
+    )
+    profile = None
+    for line in result.stdout.splitlines():
+        if line.startswith('__PROFILE__'):
+            profile = json.loads(line[len('__PROFILE__'):])
+    if profile is None:
+        raise RuntimeError(f'页面执行失败：{page_path}\n{result.stderr[-2000:]}')
+    profile['imports'] = parse_importtime(result.stderr)
+    return profile
+
+
+def format_profile(page, profile, top=10):
+    lines = [f'== {page}  总耗时 {profile["total"] * 1000:.0f} ms']
+    lines.append('  导入（页面执行期间新导入的模块，按顶层包汇总）：')
+    for package, seconds, modules in profile['imports'][:top]:
+        lines.append(f'    {seconds * 1000:8.1f} ms  {package} ({modules} 个模块)')
+    if profile['sections']:
+        lines.append('  段落：')
+        for name, seconds in profile['sections']:
+            lines.append(f'    {seconds * 1000:8.1f} ms  {name}')
+    return '\n'.join(lines)
+
+
+def default_pages(base_dir):
+    return [base_dir / 'streamlit_app.py', base_dir / 'app.py'] + sorted((base_dir / 'pages').glob('*.py'))
+
+
+if __name__ == '__main__':
+    import argparse
+    from pathlib import Path
+
+    parser = argparse.ArgumentParser(description='页面冷启动分析（导入与段落耗时）')
+    parser.add_argument('pages', nargs='*', help='页面脚本路径，默认全部页面')
+    parser.add_argument('--top', type=int, default=10, help='显示耗时最高的前 N 个导入')
+    args = parser.parse_args()
+
+    base_dir = Path(__file__).parent.parent
+    pages = [Path(page).resolve() for page in args.pages] or default_pages(base_dir)
+    for page in pages:
+        print(format_profile(page.relative_to(base_dir), profile_page(page, base_dir), top=args.top))
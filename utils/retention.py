@@ -0,0 +1,233 @@
+"""
+使用频次与留存计算
+
+从逐用户、逐天的使用日志直接计算「使用次数摸排」表（与 new拍照翻译)使用次数摸排.csv 列一致），
+可以指定任意统计时间窗口。全部计算为 NumPy 向量运算，千万行日志单机几十秒内完成。
+
+使用日志（Parquet 或 CSV）每行一个用户一天：
+    user_id          用户 ID
+    event_date       日期，如 2025-10-01
+    translate_count  当天拍照翻译张数；0 表示当天活跃但未使用拍照翻译
+
+口径：
+    翻译使用天数      窗口内 translate_count > 0 的天数
+    app 活跃天数      窗口内有记录的天数（≥10 天为「活跃10天及以上」）
+    日人均翻译张数    翻译张数合计 / 使用天数合计
+    平均使用间隔      (最后使用日 - 首次使用日) / (使用天数 - 1)，只统计使用 2 天及以上的用户
+    平均功能次留/七留率  每天使用用户中第 1 / 7 天再次使用的比例，再按天平均；
+                      窗口后的日志用于判断窗口末尾的留存，日志不足 k 天的日期不参与
+    异常值            去除窗口内单日翻译超过 50 张的用户
+
+命令行：
+    python -m utils.retention 日志.parquet --start 2025-10-01 --end 2025-11-30 [--output 表.csv]
+"""
+
+from pathlib import Path
+
+from utils.data_store import CSV_ENCODING, read_dataset
+from utils.lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+USER_COLUMN = 'user_id'
+DATE_COLUMN = 'event_date'
+COUNT_COLUMN = 'translate_count'
+EVENT_COLUMNS = [USER_COLUMN, DATE_COLUMN, COUNT_COLUMN]
+
+TOTAL_LABEL = '合计'
+# 翻译使用天数分层：(名称, 最少天数, 最多天数)
+USAGE_BUCKETS = [
+    ('使用1天', 1, 1),
+    ('使用2天', 2, 2),
+    ('使用3天', 3, 3),
+    ('使用4-5天', 4, 5),
+    ('使用6-10天', 6, 10),
+    ('使用10天以上', 11, None),
+]
+# 与原导出表一致的行顺序
+BUCKET_ORDER = ['使用10天以上', '使用1天', '使用2天', '使用3天', '使用4-5天', '使用6-10天']
+ACTIVE_LAYERS = [('活跃10天及以上', True), ('活跃10天以下', False)]
+ACTIVE_DAYS_THRESHOLD = 10
+RETENTION_DAYS = (1, 7)
+MAX_DAILY_COUNT = 50
+
+TABLE_COLUMNS = ['app活跃天数分层', '翻译使用天数分层', '翻译uv', '占比', '日人均翻译张数',
+                 '平均使用间隔(天)(剔除1次的)', '平均功能次留率', '平均功能七留率']
+
+
+def load_events(path, columns=EVENT_COLUMNS):
+    """读取使用日志（Parquet 直接读取，CSV 经 read_dataset 优先走 Parquet 缓存）"""
+    path = Path(path)
+    if path.suffix == '.parquet':
+        return pd.read_parquet(path, columns=columns)
+    return read_dataset(path, columns=columns)
+
+
+def _day_offsets(dates, start):
+    """日期列转为相对 start 的天数；日期先去重再解析，千万行也只解析几百个日期"""
+    codes, uniques = pd.factorize(dates)
+    offsets = (pd.to_datetime(uniques) - start).days.to_numpy()
+    return offsets[codes]
+
+
+def _bucket_codes(use_days):
+    codes = np.full(len(use_days), -1, dtype=np.int8)
+    for i, (_name, low, high) in enumerate(USAGE_BUCKETS):
+        hit = use_days >= low if high is None else (use_days >= low) & (use_days <= high)
+        codes[hit] = i
+    return codes
+
+
+def _percent(value):
+    return '' if np.isnan(value) else f'{value * 100:.2f}%'
+
+
+def _group_metrics(groups, n_groups, users, row_group_users):
+    """按用户分组汇总；groups 为每个用户的组号（-1 表示不参与）"""
+    valid = groups >= 0
+    g = groups[valid]
+    uv = np.bincount(g, minlength=n_groups)
+    use_days = np.bincount(g, weights=users['use_days'][valid], minlength=n_groups)
+    count = np.bincount(g, weights=users['count'][valid], minlength=n_groups)
+
+    repeat = valid & (users['use_days'] >= 2)
+    gr = groups[repeat]
+    interval_sum = np.bincount(gr, weights=users['interval'][repeat], minlength=n_groups)
+    interval_n = np.bincount(gr, minlength=n_groups)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        metrics = {
+            'uv': uv,
+            'daily_count': count / use_days,
+            'interval': interval_sum / interval_n,
+        }
+
+    # 留存：先按 (组, 日期) 求当天留存率，再按天平均
+    rows = users['rows']
+    row_groups = groups[row_group_users]
+    for k, retained in rows['retained'].items():
+        eligible = (row_groups >= 0) & rows['eligible'][k]
+        index = row_groups[eligible].astype(np.int64) * users['n_days'] + rows['day'][eligible]
+        size = n_groups * users['n_days']
+        hits = np.bincount(index, weights=retained[eligible], minlength=size)
+        base = np.bincount(index, minlength=size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            daily = (hits / base).reshape(n_groups, users['n_days'])
+            has_days = (base.reshape(n_groups, users['n_days']) > 0).sum(axis=1)
+            metrics[k] = np.where(has_days > 0, np.nansum(daily, axis=1) / has_days, np.nan)
+    return metrics
+
+
+def compute_usage_table(events, start, end, max_daily_count=MAX_DAILY_COUNT):
+    """计算 [start, end] 窗口的使用次数摸排表（DataFrame，列同原导出表）"""
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    n_days = (end - start).days + 1
+    horizon = max(RETENTION_DAYS)
+
+    day = _day_offsets(events[DATE_COLUMN], start)
+    keep = (day >= 0) & (day < n_days + horizon)
+    day = day[keep].astype(np.int64)
+    user, _ = pd.factorize(events[USER_COLUMN].to_numpy()[keep])
+    count = events[COUNT_COLUMN].to_numpy()[keep]
+    span = n_days + horizon
+
+    # 同一用户同一天多条记录先合并；key 按 (用户, 日期) 排序
+    keys, inverse = np.unique(user.astype(np.int64) * span + day, return_inverse=True)
+    count = np.bincount(inverse, weights=count, minlength=len(keys))
+    user, day = keys // span, keys % span
+    n_users = int(user.max()) + 1 if len(user) else 0
+
+    in_window = day < n_days
+    used = count > 0
+
+    # 异常值：窗口内单日翻译超过 max_daily_count 张的用户
+    outlier = np.zeros(n_users, dtype=bool)
+    outlier[user[in_window & (count > max_daily_count)]] = True
+
+    # 用户级指标
+    active_days = np.bincount(user[in_window], minlength=n_users)
+    window_use = in_window & used
+    use_user, use_day = user[window_use], day[window_use]
+    use_days = np.bincount(use_user, minlength=n_users)
+    total_count = np.bincount(use_user, weights=count[window_use], minlength=n_users)
+    interval = np.zeros(n_users)
+    if len(use_user):
+        first_index = np.flatnonzero(np.r_[True, use_user[1:] != use_user[:-1]])
+        last_index = np.r_[first_index[1:] - 1, len(use_user) - 1]
+        owners = use_user[first_index]
+        span_days = use_day[last_index] - use_day[first_index]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            interval[owners] = span_days / (use_days[owners] - 1)
+
+    # 留存：窗口内每个使用日，检查第 k 天是否也有使用
+    use_keys = keys[used]
+    last_day = int(day.max()) if len(day) else -1
+    retained, eligible = {}, {}
+    for k in RETENTION_DAYS:
+        target = use_keys[in_window[used]] + k
+        position = np.searchsorted(use_keys, target)
+        position[position >= len(use_keys)] = 0
+        retained[k] = (use_keys[position] == target) if len(use_keys) else np.zeros(0, dtype=bool)
+        eligible[k] = use_day + k <= last_day
+
+    users = {
+        'use_days': use_days, 'count': total_count, 'interval': interval, 'n_days': n_days,
+        'rows': {'day': use_day, 'retained': retained, 'eligible': eligible},
+    }
+    selected = (use_days > 0) & ~outlier
+    total_uv = int(selected.sum())
+    buckets = _bucket_codes(use_days)
+    active = active_days >= ACTIVE_DAYS_THRESHOLD
+
+    records = []
+    layers = [(TOTAL_LABEL, selected)] + [(name, selected & (active == flag)) for name, flag in ACTIVE_LAYERS]
+    for layer_name, layer_users in layers:
+        total = _group_metrics(np.where(layer_users, 0, -1), 1, users, use_user)
+        by_bucket = _group_metrics(np.where(layer_users, buckets, -1), len(USAGE_BUCKETS), users, use_user)
+        parts = [(TOTAL_LABEL, total, 0)]
+        parts += [(name, by_bucket, [b[0] for b in USAGE_BUCKETS].index(name)) for name in BUCKET_ORDER]
+        for bucket_name, metrics, i in parts:
+            uv = int(metrics['uv'][i])
+            if uv == 0:
+                continue
+            records.append({
+                'app活跃天数分层': layer_name,
+                '翻译使用天数分层': bucket_name,
+                '翻译uv': uv,
+                '占比': _percent(uv / total_uv),
+                '日人均翻译张数': round(float(metrics['daily_count'][i]), 2),
+                '平均使用间隔(天)(剔除1次的)': round(float(metrics['interval'][i]), 2),
+                '平均功能次留率': _percent(metrics[1][i]),
+                '平均功能七留率': _percent(metrics[7][i]),
+            })
+    return pd.DataFrame(records, columns=TABLE_COLUMNS)
+
+
+def event_date_range(events):
+    """日志覆盖的 (最早日期, 最晚日期)"""
+    dates = pd.to_datetime(pd.unique(events[DATE_COLUMN]))
+    return dates.min().date(), dates.max().date()
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='从使用日志计算使用次数摸排表')
+    parser.add_argument('events', help='使用日志（Parquet 或 CSV）')
+    parser.add_argument('--start', required=True, help='窗口开始日期，如 2025-10-01')
+    parser.add_argument('--end', required=True, help='窗口结束日期（含），如 2025-11-30')
+    parser.add_argument('--output', help='输出 CSV 路径，不指定时打印到终端')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    events = load_events(args.events)
+    loaded = time.perf_counter()
+    table = compute_usage_table(events, args.start, args.end)
+    finished = time.perf_counter()
+    if args.output:
+        table.to_csv(args.output, index=False, encoding=CSV_ENCODING)
+    else:
+        print(table.to_string(index=False))
+    print(f'{len(events)} 行日志，读取 {loaded - started:.1f}s，计算 {finished - loaded:.1f}s')
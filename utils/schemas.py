@@ -0,0 +1,135 @@
+"""
+数据集列与类型声明
+
+data/ 下每个 CSV 在这里声明：不读取的列、整数列、分类列、日期列及其格式。
+utils/data_store.py 的 read_dataset / iter_chunks / convert_csv 都按声明读取，
+不再由 pandas 推断类型：ID 不再变成 float64，低基数的字符串列存为 category，
+日期解析为 datetime64，从未使用且全部为空的列不读入内存。
+
+未声明的文件按 pandas 默认推断读取。查看各数据集内存占用：
+    python -m utils.schemas
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from utils.lazy_imports import lazy_import
+
+pd = lazy_import('pandas')
+
+
+@dataclass(frozen=True)
+class Schema:
+    """单个 CSV 的读取声明；未列出的列保持 pandas 默认类型"""
+    drop: tuple = ()                              # 不读取的列
+    integers: tuple = ()                          # 可空整数（Int64）
+    categories: tuple = ()                        # 分类（category）
+    booleans: tuple = ()
+    dates: dict = field(default_factory=dict)     # 列名 → 日期格式
+    drop_unnamed: bool = False                    # 丢弃导出时多出的 "Unnamed: N" 空列
+
+    def keeps(self, column):
+        return column not in self.drop and not (self.drop_unnamed and column.startswith('Unnamed:'))
+
+    def usecols(self, columns=None):
+        """read_csv 的 usecols：指定列时原样使用，否则排除不读取的列"""
+        if columns is not None:
+            return columns
+        return self.keeps if (self.drop or self.drop_unnamed) else None
+
+    def csv_dtypes(self):
+        """可以在解析 CSV 时直接指定的类型（日期在读取后按格式解析）"""
+        dtypes = {column: 'Int64' for column in self.integers}
+        dtypes.update({column: 'category' for column in self.categories})
+        dtypes.update({column: 'boolean' for column in self.booleans})
+        return dtypes
+
+    def apply(self, df, columns=None):
+        """把读入的 DataFrame 转为声明的列与类型（Parquet 读入、旧格式文件均可重复调用）"""
+        if columns is None:
+            df = df[[column for column in df.columns if self.keeps(column)]]
+        casts = {}
+        for column in df.columns:
+            if column in self.integers and df[column].dtype != 'Int64':
+                casts[column] = 'Int64'
+            elif column in self.categories and df[column].dtype != 'category':
+                casts[column] = 'category'
+            elif column in self.booleans and df[column].dtype != 'boolean':
+                casts[column] = 'boolean'
+        if casts:
+            df = df.astype(casts)
+        for column, date_format in self.dates.items():
+            if column in df.columns and not pd.api.types.is_datetime64_any_dtype(df[column]):
+                df[column] = pd.to_datetime(df[column], format=date_format)
+        return df
+
+
+FEEDBACK_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 原始反馈导出；反馈图片url、反馈题目id、联系方式在导出中全部为空，页面从未使用
+FEEDBACK_RAW = Schema(
+    drop=('反馈图片url', '反馈题目id', '联系方式'),
+    integers=('feedback_id', '设备id', 'user_id'),
+    categories=('version', 'brand', 'device_model', 'app_name', '反馈来源', 'feedback_type'),
+    dates={'feedback_date': FEEDBACK_DATE_FORMAT},
+)
+FEEDBACK_LABELED = Schema(
+    drop=FEEDBACK_RAW.drop,
+    integers=FEEDBACK_RAW.integers,
+    categories=FEEDBACK_RAW.categories + ('label', 'api_error'),
+    booleans=('api_success',),
+    dates=FEEDBACK_RAW.dates,
+)
+FEEDBACK_DETAIL = Schema(categories=('label',), dates={'feedback_date': FEEDBACK_DATE_FORMAT})
+IMAGE_LABELS = Schema(
+    categories=('content_type', 'material_source', 'subject', 'grade_level', 'usage_scenario',
+                'confidence', 'time_period'),
+    dates={'labeled_at': 'ISO8601'},
+)
+USAGE_TABLE = Schema(drop_unnamed=True)
+
+# 按文件名登记（同名文件复制到别处、或新导出的同格式文件也按同一声明读取）
+SCHEMAS = {
+    '用户反馈数据_抽样8000条.csv': FEEDBACK_RAW,
+    '用户反馈数据_已打标_8000条_20并发.csv': FEEDBACK_LABELED,
+    '发音朗读问题详细数据.csv': FEEDBACK_DETAIL,
+    '产品建议详细数据.csv': FEEDBACK_DETAIL,
+    '工作日标签.csv': IMAGE_LABELS,
+    '周末标签.csv': IMAGE_LABELS,
+    'new拍照翻译)使用次数摸排.csv': USAGE_TABLE,
+}
+
+
+def schema_for(csv_path):
+    """文件对应的声明；未登记的文件返回 None"""
+    return SCHEMAS.get(Path(csv_path).name)
+
+
+def memory_report():
+    """各数据集按 pandas 默认推断读取与按声明读取的内存占用（MB）"""
+    from utils.data_store import CSV_ENCODING, DATA_DIR, read_dataset
+
+    records = []
+    for csv_path in sorted(DATA_DIR.rglob('*.csv')):
+        if schema_for(csv_path) is None or DATA_DIR / '.parquet' in csv_path.parents:
+            continue
+        inferred = pd.read_csv(csv_path, encoding=CSV_ENCODING)
+        declared = read_dataset(csv_path)
+        before = inferred.memory_usage(deep=True).sum() / 1e6
+        after = declared.memory_usage(deep=True).sum() / 1e6
+        records.append({
+            '数据集': str(csv_path.relative_to(DATA_DIR)),
+            '行数': len(declared),
+            '列数': f'{inferred.shape[1]} → {declared.shape[1]}',
+            '默认推断 (MB)': round(before, 3),
+            '按声明 (MB)': round(after, 3),
+            '压缩比': round(before / after, 2) if after else None,
+        })
+    return pd.DataFrame(records)
+
+
+if __name__ == '__main__':
+    report = memory_report()
+    print(report.to_string(index=False))
+    total_before, total_after = report['默认推断 (MB)'].sum(), report['按声明 (MB)'].sum()
+    print(f'合计 {total_before:.2f} MB → {total_after:.2f} MB（{total_before / total_after:.2f}x）')
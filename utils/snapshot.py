@@ -0,0 +1,202 @@
+"""
+聚合快照
+
+构建阶段把各页面需要的统计结果一次性算好，写入 data/.snapshot/aggregates.json，
+页面渲染时只读快照，不再接触原始行。快照带版本号和源文件指纹，
+版本不符或源文件变化时自动重建。
+
+构建命令：
+    python -m utils.snapshot
+"""
+
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+from utils.data_store import (
+    BASE_DIR, DATA_DIR, USAGE_PATH, WEEKDAY_LABELS_PATH, WEEKEND_LABELS_PATH,
+    FEEDBACK_LABELED_PATH, file_fingerprint, fingerprint_matches, read_dataset, source_files,
+)
+from utils.feedback_rollup import encode_cube
+from utils.feedback_stream import aggregate_feedback
+from utils.lazy_imports import lazy_import
+
+pd = lazy_import('pandas')
+
+# 快照结构变化时递增
+SNAPSHOT_VERSION = 3
+SNAPSHOT_PATH = DATA_DIR / ".snapshot" / "aggregates.json"
+
+SOURCES = {
+    'usage': USAGE_PATH,
+    'weekday_labels': WEEKDAY_LABELS_PATH,
+    'weekend_labels': WEEKEND_LABELS_PATH,
+    'feedback': FEEDBACK_LABELED_PATH,
+}
+
+USAGE_COLUMNS = ['app活跃天数分层', '翻译使用天数分层', '翻译uv', '占比', '日人均翻译张数',
+                 '平均使用间隔(天)(剔除1次的)', '平均功能次留率', '平均功能七留率']
+IMAGE_LABEL_COLUMNS = ['content_type', 'material_source', 'grade_level']
+
+
+def usage_aggregates(df):
+    """使用频次页：关键数据表与使用天数分布"""
+    # 提取关键数据行
+    key_rows_all = df[df['app活跃天数分层'] == '合计'].iloc[:8].copy()
+
+    # 调整顺序：按天数排序，合计放最后
+    order_map = {
+        '合计': 0,
+        '使用1天': 1,
+        '使用2天': 2,
+        '使用3天': 3,
+        '使用4-5天': 4,
+        '使用6-10天': 5,
+        '使用10天以上': 6
+    }
+    key_rows_all['sort_order'] = key_rows_all['翻译使用天数分层'].map(order_map)
+    key_rows_sorted = key_rows_all.sort_values('sort_order')
+
+    # 将使用1天的次留和七留改为0
+    key_rows_sorted.loc[key_rows_sorted['翻译使用天数分层'] == '使用1天', '平均功能次留率'] = '0%'
+    key_rows_sorted.loc[key_rows_sorted['翻译使用天数分层'] == '使用1天', '平均功能七留率'] = '0%'
+
+    display_data = key_rows_sorted[['翻译使用天数分层', '翻译uv', '占比', '平均功能次留率',
+                                     '平均功能七留率', '平均使用间隔(天)(剔除1次的)', '日人均翻译张数']].copy()
+    display_data.rename(columns={'平均使用间隔(天)(剔除1次的)': '平均使用间隔(天)'}, inplace=True)
+
+    # 将合计行移到最后
+    summary_row = display_data[display_data['翻译使用天数分层'] == '合计']
+    other_rows = display_data[display_data['翻译使用天数分层'] != '合计']
+    display_data = pd.concat([other_rows, summary_row])
+
+    # 饼图：各使用天数分层的uv
+    usage_data = df[df['app活跃天数分层'] == '合计'].iloc[1:8]
+    usage_data = usage_data[usage_data['翻译使用天数分层'] != '合计']
+
+    return {
+        # 按列存储，页面直接交给表格渲染
+        'table': display_data.to_dict(orient='list'),
+        'distribution': {
+            'labels': usage_data['翻译使用天数分层'].tolist(),
+            'values': usage_data['翻译uv'].tolist(),
+        },
+    }
+
+
+def image_aggregates(df_weekday, df_weekend):
+    """用户画像页：年级、内容类型、工作日/周末材料来源分布"""
+    df_all = pd.concat([df_weekday, df_weekend])
+
+    def counts(series):
+        return {key: int(value) for key, value in series.astype('string').value_counts().items()}
+
+    return {
+        'weekday_total': len(df_weekday),
+        'weekend_total': len(df_weekend),
+        'grade_counts': counts(df_all['grade_level']),
+        'content_counts': counts(df_all['content_type']),
+        'weekday_material': counts(df_weekday['material_source']),
+        'weekend_material': counts(df_weekend['material_source']),
+        'weekday_writing': int((df_weekday['content_type'] == 'writing_assignment').sum()),
+        'weekend_writing': int((df_weekend['content_type'] == 'writing_assignment').sum()),
+    }
+
+
+def feedback_aggregates(feedback_path):
+    """用户反馈：标签计数、分组合计、每日计数"""
+    return summary_aggregates(aggregate_feedback(feedback_path))
+
+
+def summary_aggregates(summary):
+    """FeedbackSummary 转为快照中的 feedback 结构"""
+    return {
+        'total': summary.total,
+        'label_counts': {label: int(count) for label, count in summary.label_series().items()},
+        'group_counts': summary.group_counts,
+        'daily_counts': {day: int(count) for day, count in summary.daily_series().items()},
+        'label_days': encode_cube(summary.label_daily_counts),
+        'version_counts': {version: int(count) for version, count in summary.version_counts.most_common()},
+        'version_first_seen': dict(sorted(summary.version_first_seen.items())),
+    }
+
+
+def is_snapshot_fresh(snapshot):
+    """快照版本一致且所有源文件未变化"""
+    if snapshot.get('version') != SNAPSHOT_VERSION:
+        return False
+    sources = snapshot.get('sources', {})
+    for name, path in SOURCES.items():
+        fingerprint = sources.get(name)
+        # 由标签库拼接读取的已打标 CSV 本身可以不存在，检查实际读取的文件
+        if fingerprint is None or not all(f.exists() for f in source_files(path)):
+            return False
+        if not fingerprint_matches(path, fingerprint):
+            return False
+    return True
+
+
+def build_snapshot():
+    """从原始数据计算全部聚合结果"""
+    df_weekday = read_dataset(WEEKDAY_LABELS_PATH, columns=IMAGE_LABEL_COLUMNS)
+    df_weekend = read_dataset(WEEKEND_LABELS_PATH, columns=IMAGE_LABEL_COLUMNS)
+    return {
+        'version': SNAPSHOT_VERSION,
+        'built_at': datetime.now().isoformat(timespec='seconds'),
+        'sources': {name: file_fingerprint(path) for name, path in SOURCES.items()},
+        'usage': usage_aggregates(read_dataset(USAGE_PATH, columns=USAGE_COLUMNS)),
+        'images': image_aggregates(df_weekday, df_weekend),
+        'feedback': feedback_aggregates(FEEDBACK_LABELED_PATH),
+    }
+
+
+def write_snapshot(snapshot, path=SNAPSHOT_PATH):
+    """原子写入快照文件"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.json.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False, indent=1)
+    tmp_path.replace(path)
+    return path
+
+
+def snapshot_version(path=SNAPSHOT_PATH):
+    """快照及各源文件的大小与修改时间，用作页面缓存键；增量导入改写快照或源文件被替换时都会变化"""
+    from utils.exports import dataset_version
+
+    versions = []
+    for source in [Path(path), *SOURCES.values()]:
+        try:
+            versions.append(dataset_version(source))
+        except OSError:
+            versions.append('')
+    return '|'.join(versions)
+
+
+def load_snapshot(path=SNAPSHOT_PATH):
+    """读取快照；缺失或过期时重新构建并尽量写回"""
+    path = Path(path)
+    if path.exists():
+        try:
+            with open(path, encoding='utf-8') as f:
+                snapshot = json.load(f)
+            if is_snapshot_fresh(snapshot):
+                return snapshot
+        except (OSError, ValueError, KeyError, sqlite3.Error):
+            # 快照损坏或标签库暂时无法读取时重新构建
+            pass
+
+    snapshot = build_snapshot()
+    try:
+        write_snapshot(snapshot, path)
+    except OSError:
+        # 只读部署环境下仍可使用内存中的快照
+        pass
+    return snapshot
+
+
+if __name__ == '__main__':
+    written = write_snapshot(build_snapshot())
+    print(written.relative_to(BASE_DIR))